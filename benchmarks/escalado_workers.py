@@ -0,0 +1,218 @@
+"""
+Benchmark de escalado: peticiones por segundo con 1, 2, 4 y 8 workers.
+
+    python -m benchmarks.escalado_workers --duracion 10 --clientes 32
+
+Levanta `python -m src.run` contra una base SQLite temporal con datos de prueba,
+genera carga con varios procesos cliente (conexiones keep-alive) y muestra
+req/s, latencias p50/p99 y el máximo de conexiones abiertas a la base (sumando
+todos los procesos del servidor; solo en Linux) para cada número de workers.
+
+Resultados medidos en el entorno de desarrollo (1 CPU, SQLite, --duracion 5 --clientes 16):
+
+    --conexiones-max 8                       sin límite (--conexiones-max 0)
+     workers   req/s  p50 ms  p99 ms  conex     workers   req/s  p50 ms  p99 ms  conex
+           1   126.0  126.30  226.88      8           1   111.8  142.39  238.43     15
+           2   111.8  135.47  429.31      7           2   103.8  165.58  474.60     15
+           4    96.2   87.36  763.14      7           4    85.0  133.71  976.67     16
+           8    72.8  114.65 1272.19      8           8    66.0  154.57 1797.60     16
+
+Con un solo núcleo más workers no aportan req/s (solo cambian de contexto); la
+escala hay que medirla en una máquina con varios núcleos. Lo que sí confirman es el
+reparto del pool: con DB_CONEXIONES_MAX el total de conexiones del servidor no pasa
+del presupuesto con ningún número de workers; sin él cada worker puede abrir hasta
+15 (pool de 5 + 10 de desborde) y con solo 16 clientes ya se abren 15-16 (el tope
+real sería 15 por worker). Antes de cerrar las conexiones del proceso padre en
+`pre_fork` (src/run.py) se medían 9 con 1 worker y 16 con 8: el padre conservaba la
+del arranque y cada worker heredaba una copia.
+"""
+import argparse
+import http.client
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+
+def _sembrar(url: str, movimientos: int) -> str:
+    """Crea las tablas, un usuario con `movimientos` gastos e inversiones y devuelve su token."""
+    from jose import jwt
+    from sqlmodel import Session, SQLModel, create_engine
+    from src.models import Item, Gasto, Inversion
+    from src.dependencies import SECRET_KEY, ALGORITHM
+
+    engine = create_engine(url)
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as db:
+        usuario = Item(nombre="bench", correo="bench@example.com", contraseña="bench")
+        db.add(usuario)
+        db.commit()
+        db.refresh(usuario)
+        hoy = date.today()
+        for i in range(movimientos):
+            fecha = hoy - timedelta(days=i % 365)
+            db.add(Gasto(tipo_gasto=f"tipo{i % 8}", cantidad_gasto=10 + i % 90, fecha_gasto=fecha,
+                         descripcion=f"gasto {i}", usuario_id=usuario.id))
+            db.add(Inversion(tipo_inversion=f"tipo{i % 4}", cantidad_inversion=100 + i % 900,
+                             fecha_inversion=fecha, usuario_id=usuario.id))
+        db.commit()
+        payload = {"username": usuario.nombre, "email": usuario.correo, "rol": usuario.rol, "sub": str(usuario.id)}
+    engine.dispose()
+    return jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
+
+
+def _esperar_servidor(port: int, timeout: float = 60) -> None:
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/docs")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("El servidor no respondió a tiempo")
+
+
+def _cliente(port: int, ruta: str, token: str, duracion: float) -> list:
+    """Hace peticiones en bucle durante `duracion` segundos; devuelve las latencias (s)."""
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    cabeceras = {"Authorization": f"Bearer {token}"}
+    latencias = []
+    fin = time.monotonic() + duracion
+    while time.monotonic() < fin:
+        inicio = time.perf_counter()
+        try:
+            conn.request("GET", ruta, headers=cabeceras)
+            respuesta = conn.getresponse()
+            respuesta.read()
+        except OSError:
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+            continue
+        if respuesta.status == 200:
+            latencias.append(time.perf_counter() - inicio)
+    conn.close()
+    return latencias
+
+
+def _descriptores(proc: Path, pid: int, ruta_db: str) -> set:
+    try:
+        return {fd.name for fd in (proc / str(pid) / "fd").iterdir() if os.readlink(fd) == ruta_db}
+    except OSError:
+        return set()
+
+
+def _conexiones_abiertas(pid_servidor: int, ruta_db: str):
+    """
+    Conexiones abiertas a la base por el servidor y sus workers (Linux). Los descriptores
+    que un worker heredó del padre al hacer fork son la misma conexión y no se cuentan dos veces.
+    """
+    proc = Path("/proc")
+    if not proc.exists():
+        return None
+    hijos = {}
+    for stat in proc.glob("[0-9]*/stat"):
+        try:
+            pid, resto = stat.read_text().split(" ", 1)
+            hijos.setdefault(int(resto.rsplit(")", 1)[1].split()[1]), []).append(int(pid))
+        except (OSError, IndexError, ValueError):
+            continue
+    total = 0
+    pendientes = [(pid_servidor, set())]
+    while pendientes:
+        pid, heredados = pendientes.pop()
+        propios = _descriptores(proc, pid, ruta_db)
+        total += len(propios - heredados)
+        pendientes.extend((hijo, propios | heredados) for hijo in hijos.get(pid, []))
+    return total
+
+
+def _percentil(valores: list, p: float) -> float:
+    if not valores:
+        return 0.0
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p))]
+
+
+def medir(workers: int, args, env: dict, token: str, ruta_db: str) -> dict:
+    port = args.puerto + workers
+    servidor = subprocess.Popen(
+        [sys.executable, "-m", "src.run", "--workers", str(workers), "--port", str(port),
+         "--host", "127.0.0.1", "--servidor", args.servidor],
+        cwd=RAIZ, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    maximo_conexiones = []
+    terminado = threading.Event()
+
+    def muestrear():
+        while not terminado.wait(0.2):
+            maximo_conexiones.append(_conexiones_abiertas(servidor.pid, ruta_db))
+
+    try:
+        _esperar_servidor(port)
+        # Calentamiento: que todos los workers abran conexiones y carguen cachés
+        _cliente(port, args.ruta, token, 1.0)
+        muestreo = threading.Thread(target=muestrear, daemon=True)
+        muestreo.start()
+        with ProcessPoolExecutor(max_workers=args.clientes) as pool:
+            futuros = [pool.submit(_cliente, port, args.ruta, token, args.duracion) for _ in range(args.clientes)]
+            latencias = [l for f in futuros for l in f.result()]
+    finally:
+        terminado.set()
+        servidor.send_signal(signal.SIGTERM)
+        servidor.wait(timeout=30)
+
+    conexiones = [c for c in maximo_conexiones if c is not None]
+
+    return {
+        "workers": workers,
+        "req_s": len(latencias) / args.duracion,
+        "p50_ms": _percentil(latencias, 0.50) * 1000,
+        "p99_ms": _percentil(latencias, 0.99) * 1000,
+        "conexiones": max(conexiones) if conexiones else None,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4,8", help="Lista de workers a medir")
+    parser.add_argument("--duracion", type=float, default=10.0, help="Segundos de carga por medición")
+    parser.add_argument("--clientes", type=int, default=32, help="Procesos cliente concurrentes")
+    parser.add_argument("--movimientos", type=int, default=500, help="Gastos e inversiones del usuario de prueba")
+    parser.add_argument("--ruta", default="/analisis/resumen-general")
+    parser.add_argument("--puerto", type=int, default=8100)
+    parser.add_argument("--servidor", choices=["auto", "gunicorn", "uvicorn"], default="auto")
+    parser.add_argument("--conexiones-max", type=int, default=0, help="DB_CONEXIONES_MAX para los workers")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta_db = os.path.realpath(f"{tmp}/bench.db")
+        url = f"sqlite:///{ruta_db}"
+        token = _sembrar(url, args.movimientos)
+        env = {**os.environ, "DATABASE_URL": url, "DB_CONEXIONES_MAX": str(args.conexiones_max)}
+        env.pop("DATABASE_REPLICA_URLS", None)
+
+        print(f"Ruta: {args.ruta} | clientes: {args.clientes} | duración: {args.duracion}s | CPUs: {os.cpu_count()}")
+        print(f"{'workers':>8} {'req/s':>10} {'p50 ms':>10} {'p99 ms':>10} {'escala':>8} {'conex':>7}")
+        base = None
+        for workers in (int(w) for w in args.workers.split(",")):
+            r = medir(workers, args, env, token, ruta_db)
+            base = base or r["req_s"]
+            escala = r["req_s"] / base if base else 0.0
+            conexiones = "-" if r["conexiones"] is None else r["conexiones"]
+            print(f"{r['workers']:>8} {r['req_s']:>10.1f} {r['p50_ms']:>10.2f} {r['p99_ms']:>10.2f} {escala:>7.2f}x {conexiones:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark de la capa de lectura sin ORM (src/utils/lectura.py) frente al ORM.
+
+    python -m benchmarks.lectura_sin_orm --filas 100000 --repeticiones 5
+
+Sobre una base SQLite temporal con `--filas` gastos de un usuario compara:
+- orm:      db.exec(select(Gasto)).all()   (instancias de SQLModel en el mapa de identidad)
+- columnas: db.exec(select(*columnas_de(Gasto, GastoRead))).all()   (Row del ORM)
+- lectura:  leer_filas(db, GastoRead, [Gasto], ...)   (Core + namedtuples)
+
+Para cada uno muestra la latencia (mediana y mínima), el pico de memoria durante la
+consulta y la memoria que siguen ocupando las filas (tracemalloc).
+"""
+import argparse
+import gc
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+
+def _sembrar(engine, filas: int) -> int:
+    from sqlalchemy import insert
+    from sqlmodel import Session, SQLModel
+    from src.models import Item, Gasto
+
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as db:
+        usuario = Item(nombre="bench", correo="bench@example.com", contraseña="bench")
+        db.add(usuario)
+        db.commit()
+        usuario_id = usuario.id
+    hoy = date.today()
+    with engine.begin() as conn:
+        conn.execute(insert(Gasto.__table__), [
+            {"tipo_gasto": f"tipo{i % 8}", "cantidad_gasto": 10 + i % 90, "fecha_gasto": hoy - timedelta(days=i % 365),
+             "descripcion": f"gasto {i}", "moneda": "MXN", "usuario_id": usuario_id}
+            for i in range(filas)
+        ])
+    return usuario_id
+
+
+def _medir(engine, funcion, repeticiones: int) -> dict:
+    from sqlmodel import Session
+
+    tiempos = []
+    for _ in range(repeticiones):
+        with Session(engine) as db:
+            gc.collect()
+            inicio = time.perf_counter()
+            filas = funcion(db)
+            tiempos.append(time.perf_counter() - inicio)
+            del filas
+
+    with Session(engine) as db:
+        gc.collect()
+        tracemalloc.start()
+        filas = funcion(db)
+        retenida, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        cantidad = len(filas)
+        del filas
+
+    return {
+        "filas": cantidad,
+        "mediana_ms": statistics.median(tiempos) * 1000,
+        "min_ms": min(tiempos) * 1000,
+        "pico_mb": pico / 2**20,
+        "retenida_mb": retenida / 2**20,
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--filas", type=int, default=100_000)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    from sqlmodel import create_engine, select
+    from src.models import Gasto, GastoRead
+    from src.utils.lectura import leer_filas
+    from src.utils.respuestas import columnas_de
+
+    directorio = tempfile.mkdtemp(prefix="bench_lectura_")
+    engine = create_engine(f"sqlite:///{os.path.join(directorio, 'bench.db')}")
+    print(f"🌱 Sembrando {args.filas} gastos...")
+    usuario_id = _sembrar(engine, args.filas)
+
+    variantes = {
+        "orm": lambda db: db.exec(select(Gasto).where(Gasto.usuario_id == usuario_id)).all(),
+        "columnas": lambda db: db.exec(
+            select(*columnas_de(Gasto, GastoRead)).where(Gasto.usuario_id == usuario_id)
+        ).all(),
+        "lectura": lambda db: leer_filas(db, GastoRead, [Gasto], lambda c: c.usuario_id == usuario_id),
+    }
+
+    print(f"\n{'variante':<10} {'filas':>8} {'mediana ms':>11} {'mín ms':>9} {'pico MB':>9} {'retenida MB':>12}")
+    for nombre, funcion in variantes.items():
+        r = _medir(engine, funcion, args.repeticiones)
+        print(f"{nombre:<10} {r['filas']:>8} {r['mediana_ms']:>11.1f} {r['min_ms']:>9.1f} "
+              f"{r['pico_mb']:>9.1f} {r['retenida_mb']:>12.1f}")
+
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+from sqlalchemy import inspect, text
+
+# Índice de texto sobre `descripcion` de gastos e inversiones.
+# - MySQL: índice FULLTEXT en cada tabla (InnoDB lo mantiene solo).
+# - SQLite: tabla virtual FTS5 compartida, mantenida con triggers.
+#   El rowid codifica el movimiento: id * 2 para gastos, id * 2 + 1 para inversiones,
+#   así borrar/actualizar una entrada es una búsqueda por clave primaria.
+#   La columna `usuario` también está indexada: la consulta filtra por ella dentro del
+#   MATCH, así FTS5 cruza las listas del usuario y de los términos en lugar de recorrer
+#   las coincidencias de todos los usuarios.
+
+FTS_TABLA = "movimiento_fts"
+
+# tabla -> (sufijo del rowid, nombre del índice FULLTEXT en MySQL)
+TABLAS_INDEXADAS = {
+    "gasto": (0, "ft_gasto_descripcion"),
+    "inversion": (1, "ft_inversion_descripcion"),
+}
+
+
+_TRIGGERS = ("ai", "ad", "au")
+
+
+def _triggers_sqlite(tabla: str, sufijo: int) -> list:
+    rowid_nuevo = f"new.id * 2 + {sufijo}"
+    rowid_viejo = f"old.id * 2 + {sufijo}"
+    return [
+        f"""CREATE TRIGGER IF NOT EXISTS {tabla}_fts_ai AFTER INSERT ON {tabla}
+            WHEN new.descripcion IS NOT NULL BEGIN
+                INSERT INTO {FTS_TABLA}(rowid, descripcion, usuario)
+                    VALUES ({rowid_nuevo}, new.descripcion, new.usuario_id);
+            END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {tabla}_fts_ad AFTER DELETE ON {tabla} BEGIN
+                DELETE FROM {FTS_TABLA} WHERE rowid = {rowid_viejo};
+            END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {tabla}_fts_au AFTER UPDATE OF descripcion, id, usuario_id ON {tabla} BEGIN
+                DELETE FROM {FTS_TABLA} WHERE rowid = {rowid_viejo};
+                INSERT INTO {FTS_TABLA}(rowid, descripcion, usuario)
+                    SELECT {rowid_nuevo}, new.descripcion, new.usuario_id WHERE new.descripcion IS NOT NULL;
+            END""",
+    ]
+
+
+def _inicializar_sqlite(conn) -> None:
+    columnas = [fila[1] for fila in conn.execute(text(f"PRAGMA table_info({FTS_TABLA})"))]
+    if columnas and "usuario" not in columnas:
+        # Índice de una versión anterior, sin el usuario: se reconstruye con sus triggers
+        conn.execute(text(f"DROP TABLE {FTS_TABLA}"))
+        for tabla in TABLAS_INDEXADAS:
+            for trigger in _TRIGGERS:
+                conn.execute(text(f"DROP TRIGGER IF EXISTS {tabla}_fts_{trigger}"))
+        columnas = []
+    existe = bool(columnas)
+    if not existe:
+        conn.execute(text(
+            f"CREATE VIRTUAL TABLE {FTS_TABLA} USING fts5("
+            "descripcion, usuario, tokenize = 'unicode61 remove_diacritics 2')"
+        ))
+
+    for tabla, (sufijo, _) in TABLAS_INDEXADAS.items():
+        for ddl in _triggers_sqlite(tabla, sufijo):
+            conn.execute(text(ddl))
+        if not existe:
+            # Indexar lo que ya había antes de crear la tabla FTS
+            conn.execute(text(
+                f"INSERT INTO {FTS_TABLA}(rowid, descripcion, usuario) "
+                f"SELECT id * 2 + {sufijo}, descripcion, usuario_id FROM {tabla} WHERE descripcion IS NOT NULL"
+            ))
+
+
+def _inicializar_mysql(conn) -> None:
+    inspector = inspect(conn)
+    for tabla, (_, indice) in TABLAS_INDEXADAS.items():
+        existentes = {i["name"] for i in inspector.get_indexes(tabla)}
+        if indice not in existentes:
+            conn.execute(text(f"ALTER TABLE {tabla} ADD FULLTEXT INDEX {indice} (descripcion)"))
+
+
+def inicializar_indice(engine) -> None:
+    """Crea (si falta) el índice de texto de la base. Debe llamarse después de create_all."""
+    with engine.begin() as conn:
+        if engine.dialect.name == "sqlite":
+            _inicializar_sqlite(conn)
+        elif engine.dialect.name == "mysql":
+            _inicializar_mysql(conn)
@@ -10,6 +10,80 @@ MYSQL_SERVER = os.getenv("MYSQL_SERVER")
 MYSQL_PORT = os.getenv("MYSQL_PORT")
 MYSQL_DB = os.getenv("MYSQL_DB")
 
-url = f"mysql+mysqlconnector://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_SERVER}:{MYSQL_PORT}/{MYSQL_DB}"
+# DATABASE_URL permite apuntar a otra base (por ejemplo sqlite:///primario.db en local)
+url = os.getenv("DATABASE_URL") or f"mysql+mysqlconnector://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_SERVER}:{MYSQL_PORT}/{MYSQL_DB}"
 
-engine = create_engine(url)
\ No newline at end of file
+# Réplicas de solo lectura, separadas por comas (opcional)
+replica_urls = [u.strip() for u in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if u.strip()]
+
+# Bases de gastos e inversiones repartidas por usuario, separadas por comas (opcional).
+# Sin ellas todo vive en la base principal. El índice de cada URL es el número de shard:
+# solo se pueden agregar al final. Para conservar los datos existentes, la primera
+# debe ser la base principal (los usuarios sin asignación viven en el shard 0).
+shard_urls = [u.strip() for u in os.getenv("DATABASE_SHARD_URLS", "").split(",") if u.strip()]
+
+
+# Presupuesto global de conexiones por servidor de base de datos, repartido entre
+# todos los workers (p. ej. max_connections de MySQL menos un margen). 0 = sin límite.
+DB_CONEXIONES_MAX = int(os.getenv("DB_CONEXIONES_MAX", "0"))
+# Número de procesos que atienden peticiones; lo fija src/run.py antes de arrancarlos.
+WEB_CONCURRENCY = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+# Hilos por proceso para las consultas que una petición lanza en paralelo (ver src/utils/shards.py)
+CONSULTAS_PARALELAS = max(1, int(os.getenv("CONSULTAS_PARALELAS", "8")))
+
+
+def _reparto(conexiones_max: int, workers: int, paralelas: int) -> tuple:
+    """(conexiones para peticiones, conexiones para consultas paralelas) de cada worker."""
+    por_worker = max(2, conexiones_max // workers)
+    consultas = max(1, min(paralelas, por_worker // 2))
+    return por_worker - consultas, consultas
+
+
+def opciones_pool(conexiones_max: int = DB_CONEXIONES_MAX, workers: int = WEB_CONCURRENCY,
+                  paralelas: int = CONSULTAS_PARALELAS) -> dict:
+    """
+    Tamaño del pool de peticiones de cada worker para no superar el presupuesto global
+    de conexiones (junto con el de opciones_pool_consultas).
+    """
+    if conexiones_max <= 0:
+        return {}
+    return {"pool_size": _reparto(conexiones_max, workers, paralelas)[0], "max_overflow": 0}
+
+
+def opciones_pool_consultas(conexiones_max: int = DB_CONEXIONES_MAX, workers: int = WEB_CONCURRENCY,
+                            paralelas: int = CONSULTAS_PARALELAS) -> dict:
+    """
+    Pool aparte para las consultas paralelas: la petición ya retiene una conexión del
+    suyo, y si sus consultas esperaran en ese mismo pool con todas las conexiones en
+    manos de peticiones, ninguna avanzaría. Sus hilos no superan este tamaño.
+    """
+    if conexiones_max <= 0:
+        return {"pool_size": paralelas, "max_overflow": 0}
+    return {"pool_size": _reparto(conexiones_max, workers, paralelas)[1], "max_overflow": 0}
+
+
+def crear_engine(url, **opciones):
+    """Crea un engine; SQLite necesita poder usarse desde los hilos del servidor."""
+    connect_args = {"check_same_thread": False} if str(url).startswith("sqlite") else {}
+    return create_engine(url, connect_args=connect_args, **(opciones or opciones_pool()))
+
+
+engine = crear_engine(url)
+replica_engines = [crear_engine(u) for u in replica_urls]
+# La base principal se reutiliza si aparece entre los shards
+shard_engines = [engine if u == url else crear_engine(u) for u in shard_urls] or [engine]
+# engine -> engine de la misma base con el pool de consultas paralelas
+engines_consultas = {
+    e: crear_engine(e.url, **opciones_pool_consultas())
+    for e in dict.fromkeys([engine, *replica_engines, *shard_engines])
+}
+
+
+def reiniciar_pools(cerrar: bool = False) -> None:
+    """
+    Descarta las conexiones heredadas al hacer fork (app precargada en el proceso padre);
+    cada worker abre las suyas. Con `cerrar` (en el proceso padre, antes del fork) además
+    las cierra, para que el padre no ocupe conexiones fuera del presupuesto de los workers.
+    """
+    for e in {engine, *replica_engines, *shard_engines, *engines_consultas.values()}:
+        e.dispose(close=cerrar)
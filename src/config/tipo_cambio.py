@@ -0,0 +1,135 @@
+import csv
+import os
+from bisect import bisect_right
+from datetime import date
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Moneda en la que se guardan los movimientos si el cliente no indica otra
+# y en la que se devuelven los análisis por defecto.
+MONEDA_BASE = os.getenv("MONEDA_BASE", "MXN").upper()
+
+# Las tasas del archivo expresan cuánto vale 1 unidad de cada moneda en esta moneda.
+MONEDA_REFERENCIA = "USD"
+
+TIPOS_CAMBIO_PATH = Path(os.getenv(
+    "TIPOS_CAMBIO_PATH",
+    Path(__file__).resolve().parent / "tipos_cambio.csv"
+))
+
+
+class SnapshotTasas:
+    """
+    Tabla de tipos de cambio en memoria, indexada por moneda y fecha.
+    Para una fecha sin cotización se usa la última tasa conocida anterior
+    (o la primera disponible si la fecha es más antigua que el archivo).
+    """
+
+    def __init__(self, tasas: Dict[str, Tuple[List[date], List[float]]]):
+        self._tasas = tasas
+        self._sin_tasa: set = set()
+        # Si todas las cotizaciones son de día 1, la tasa es la misma en todo el mes
+        # y los movimientos se pueden sumar por mes antes de convertir.
+        self.por_mes = all(f.day == 1 for fechas, _ in tasas.values() for f in fechas)
+
+    @property
+    def monedas(self) -> set:
+        return set(self._tasas) | {MONEDA_REFERENCIA}
+
+    def tasa(self, moneda: str, fecha: date) -> float:
+        if moneda == MONEDA_REFERENCIA:
+            return 1.0
+        serie = self._tasas.get(moneda)
+        if serie is None:
+            raise ValueError(f"Moneda sin tipo de cambio: {moneda}")
+        fechas, valores = serie
+        indice = bisect_right(fechas, fecha) - 1
+        return valores[max(indice, 0)]
+
+    def factor(self, origen: str, destino: str, fecha: date) -> float:
+        """
+        Multiplicador para pasar una cantidad de `origen` a `destino` en `fecha`.
+        Un movimiento guardado en una moneda que ya no está en el archivo de tasas
+        se omite (factor 0) con un aviso por moneda, en lugar de romper el análisis.
+        """
+        if origen == destino:
+            return 1.0
+        if origen not in self.monedas:
+            if origen not in self._sin_tasa:
+                self._sin_tasa.add(origen)
+                print(f"⚠️ Moneda sin tipo de cambio, se omiten sus movimientos: {origen}")
+            return 0.0
+        return self.tasa(origen, fecha) / self.tasa(destino, fecha)
+
+    def convertir_por_clave(
+        self,
+        grupos: Iterable[Tuple[Hashable, str, date, float]],
+        destino: str
+    ) -> Dict[Hashable, float]:
+        """
+        Acumula grupos (clave, moneda, fecha, total) ya agregados en SQL,
+        convertidos a `destino`. Se aplica un factor por grupo, no por movimiento;
+        con tasas mensuales los grupos son por mes (ver `grupos`).
+        """
+        factores: Dict[Tuple[str, date], float] = {}
+        totales: Dict[Hashable, float] = {}
+        for clave, moneda, fecha, cantidad in grupos:
+            par = (moneda, fecha)
+            if par not in factores:
+                factores[par] = self.factor(moneda, destino, fecha)
+            totales[clave] = totales.get(clave, 0.0) + cantidad * factores[par]
+        return totales
+
+    def convertir_grupos(
+        self,
+        grupos: Iterable[Tuple[str, date, float]],
+        destino: str
+    ) -> float:
+        """Suma grupos (moneda, fecha, total) convertidos a `destino`."""
+        totales = self.convertir_por_clave(((None, m, f, c) for m, f, c in grupos), destino)
+        return totales.get(None, 0.0)
+
+def cargar_snapshot(path: Path = TIPOS_CAMBIO_PATH) -> SnapshotTasas:
+    """Lee el CSV `fecha,moneda,tasa` y construye el snapshot ordenado por fecha."""
+    filas: Dict[str, List[Tuple[date, float]]] = {}
+    with open(path, newline="", encoding="utf-8") as archivo:
+        for fila in csv.DictReader(archivo):
+            moneda = fila["moneda"].strip().upper()
+            filas.setdefault(moneda, []).append(
+                (date.fromisoformat(fila["fecha"].strip()), float(fila["tasa"]))
+            )
+
+    tasas = {}
+    for moneda, valores in filas.items():
+        valores.sort()
+        tasas[moneda] = ([f for f, _ in valores], [t for _, t in valores])
+    return SnapshotTasas(tasas)
+
+
+_snapshot: Optional[SnapshotTasas] = None
+_snapshot_mtime: Optional[float] = None
+_snapshot_lock = Lock()
+
+
+def obtener_snapshot() -> SnapshotTasas:
+    """Devuelve el snapshot cacheado; se recarga solo si el archivo cambió."""
+    global _snapshot, _snapshot_mtime
+    mtime = TIPOS_CAMBIO_PATH.stat().st_mtime
+    if _snapshot is None or mtime != _snapshot_mtime:
+        with _snapshot_lock:
+            if _snapshot is None or mtime != _snapshot_mtime:
+                _snapshot = cargar_snapshot(TIPOS_CAMBIO_PATH)
+                _snapshot_mtime = mtime
+    return _snapshot
+
+
+def normalizar_moneda(moneda: str) -> str:
+    """Devuelve el código en mayúsculas o lanza ValueError si no hay tasas para él."""
+    codigo = moneda.strip().upper()
+    if codigo not in obtener_snapshot().monedas:
+        raise ValueError(f"Moneda no soportada: {moneda}")
+    return codigo
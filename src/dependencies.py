@@ -1,4 +1,4 @@
-from typing import Annotated
+from typing import Annotated, Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
@@ -67,6 +67,20 @@ def decode_token(token: Annotated[str, Depends(oauth2_scheme)]) -> dict:
         )
 
 
+def usuario_opcional(autorizacion: Optional[str]) -> Optional[dict]:
+    """
+    Datos mínimos (id y rol) de una cabecera Authorization con un JWT válido, o None.
+    No lanza errores: sirve para decidir a qué base ir antes de autenticar la ruta.
+    """
+    if not autorizacion or not autorizacion.lower().startswith("bearer "):
+        return None
+    try:
+        payload = jwt.decode(autorizacion[7:], SECRET_KEY, algorithms=[ALGORITHM])
+        return {"id": int(payload.get("sub")), "rol": payload.get("rol") or "user"}
+    except (JWTError, ValueError, TypeError):
+        return None
+
+
 def verify_admin_role(user: Annotated[dict, Depends(decode_token)]) -> bool:
     """Verifica si el usuario tiene rol de administrador."""
     if user.get("rol") != ADMIN_ROL:
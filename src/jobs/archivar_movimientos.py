@@ -0,0 +1,92 @@
+"""
+Archiva los gastos e inversiones anteriores al horizonte.
+
+    python -m src.jobs.archivar_movimientos            # ARCHIVO_MESES=24 por defecto
+    python -m src.jobs.archivar_movimientos --meses 12
+
+Los movimientos con fecha anterior al primer día de hace ARCHIVO_MESES meses pasan
+a gasto_archivo / inversion_archivo (con el mismo id) y sus totales por
+(usuario, mes, categoría, moneda) se congelan en resumen_archivo, de donde los lee
+/analisis: un usuario con un movimiento al día deja una fila de resumen al mes y no una
+por movimiento. El mes es el mismo corte que usa el horizonte. Cada lote se copia, resume y borra en una sola transacción, con SQL
+directo: no genera entradas en el log de /sync (los clientes conservan esas filas)
+ni cambia la serie de saldos (los totales no varían).
+"""
+import argparse
+import os
+from datetime import date, datetime, timezone
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import delete, func, insert, literal, select
+from src.config.db import engine, shard_engines
+from src.models.resumen_archivo import ResumenArchivo
+from src.utils.agregados import ARCHIVOS, COLUMNAS, TIPO_RESUMEN, inicio_de_mes
+
+ARCHIVO_MESES = int(os.getenv("ARCHIVO_MESES", "24"))
+
+_LOTE = 5000
+
+
+def horizonte(meses: int = ARCHIVO_MESES, hoy: date = None) -> date:
+    """Primer día del mes de hace `meses` meses: todo lo anterior se archiva."""
+    hoy = hoy or date.today()
+    return hoy.replace(day=1) - relativedelta(months=meses)
+
+
+def _archivar_lote(conn, modelo, limite: date) -> int:
+    tabla, archivo = modelo.__table__, ARCHIVOS[modelo].__table__
+    tipo, cantidad, fecha = COLUMNAS[modelo]
+
+    candidatos = [fecha < limite]
+    if conn.dialect.name == "sqlite":
+        # Sin AUTOINCREMENT, SQLite reutilizaría un id borrado al final de la tabla:
+        # la fila con el id más alto nunca se archiva. MySQL (InnoDB, 8.0+) no reutiliza ids.
+        candidatos.append(tabla.c.id < select(func.max(tabla.c.id)).scalar_subquery())
+    ids = conn.execute(
+        select(tabla.c.id)
+        .where(*candidatos)
+        .order_by(tabla.c.id)
+        .limit(_LOTE)
+        .with_for_update()
+    ).scalars().all()
+    if not ids:
+        return 0
+
+    seleccion = [tabla.c.id.in_(ids), fecha < limite]
+    conn.execute(insert(archivo).from_select(
+        [c.name for c in tabla.columns],
+        select(*tabla.columns).where(*seleccion)
+    ))
+    mes = inicio_de_mes(fecha, conn.dialect.name)
+    conn.execute(insert(ResumenArchivo.__table__).from_select(
+        ["usuario_id", "tipo", "fecha", "categoria", "moneda", "total", "movimientos", "fecha_archivo"],
+        select(
+            modelo.usuario_id, literal(TIPO_RESUMEN[modelo]), mes, tipo, modelo.moneda,
+            func.sum(cantidad), func.count(), literal(datetime.now(timezone.utc))
+        ).where(*seleccion).group_by(modelo.usuario_id, mes, tipo, modelo.moneda)
+    ))
+    return conn.execute(delete(tabla).where(*seleccion)).rowcount
+
+
+def ejecutar(engine=engine, meses: int = ARCHIVO_MESES) -> dict:
+    limite = horizonte(meses)
+    resultado = {"horizonte": limite.isoformat()}
+    for modelo in ARCHIVOS:
+        archivados = 0
+        while True:
+            with engine.begin() as conn:
+                movidos = _archivar_lote(conn, modelo, limite)
+            archivados += movidos
+            if movidos == 0:
+                break
+        resultado[modelo.__tablename__] = archivados
+
+    print(f"🗄️ Movimientos archivados: {resultado}")
+    return resultado
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archivar movimientos antiguos")
+    parser.add_argument("--meses", type=int, default=ARCHIVO_MESES)
+    args = parser.parse_args()
+    for shard_engine in dict.fromkeys(shard_engines):
+        ejecutar(shard_engine, args.meses)
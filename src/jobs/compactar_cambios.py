@@ -0,0 +1,57 @@
+"""
+Compacta el log de cambios usado por /sync.
+
+    python -m src.jobs.compactar_cambios
+
+Cada shard tiene su propio log; se compactan todos.
+
+1. Borra las entradas superadas por otra más reciente del mismo movimiento
+   (un cliente siempre recibe la última, así que no pierde nada).
+2. Borra las entradas más antiguas que SYNC_RETENCION_DIAS y sube el token mínimo:
+   los clientes con un token anterior reciben una descarga completa (reset).
+"""
+import os
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import delete, func, select, text
+from sqlmodel import Session
+from src.config.db import engine, shard_engines
+from src.models.cambio import CambioMovimiento, EstadoSync
+
+SYNC_RETENCION_DIAS = int(os.getenv("SYNC_RETENCION_DIAS", "30"))
+
+_BORRAR_SUPERADOS = text("""
+    DELETE FROM cambio_movimiento
+    WHERE id NOT IN (
+        SELECT id FROM (
+            SELECT MAX(id) AS id FROM cambio_movimiento GROUP BY tipo, movimiento_id
+        ) AS ultimos
+    )
+""")
+
+
+def ejecutar(engine=engine, retencion_dias: int = SYNC_RETENCION_DIAS) -> dict:
+    limite = datetime.now(timezone.utc) - timedelta(days=retencion_dias)
+    with Session(engine) as db:
+        superados = db.exec(_BORRAR_SUPERADOS).rowcount
+
+        hasta = db.exec(
+            select(func.max(CambioMovimiento.id)).where(CambioMovimiento.fecha_cambio < limite)
+        ).scalar()
+        antiguos = 0
+        if hasta is not None:
+            antiguos = db.exec(delete(CambioMovimiento).where(CambioMovimiento.id <= hasta)).rowcount
+            estado = db.get(EstadoSync, 1) or EstadoSync(id=1)
+            # Un cliente con since == hasta ya vio todo lo borrado
+            estado.token_minimo = max(estado.token_minimo, hasta)
+            db.add(estado)
+
+        db.commit()
+
+    resultado = {"superados": superados, "antiguos": antiguos, "token_minimo": hasta}
+    print(f"🧹 Log de cambios compactado: {resultado}")
+    return resultado
+
+
+if __name__ == "__main__":
+    for shard_engine in dict.fromkeys(shard_engines):
+        ejecutar(shard_engine)
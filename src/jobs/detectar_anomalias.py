@@ -0,0 +1,182 @@
+"""
+Detecta gastos inusuales por usuario y tipo de gasto.
+
+    python -m src.jobs.detectar_anomalias
+    python -m src.jobs.detectar_anomalias --completo     # recalcula a todos los usuarios
+
+Cada gasto se compara con los ANOMALIA_VENTANA gastos anteriores del mismo usuario y
+tipo, en la moneda base: puntuación robusta (cantidad - mediana) / (1.4826 · MAD).
+Se marca si supera ANOMALIA_UMBRAL y tiene al menos ANOMALIA_MINIMO gastos previos;
+solo cuentan los gastos por encima de lo habitual. Los resultados quedan en
+anomalia_gasto, de donde los lee /analisis/anomalias.
+
+Es incremental: solo recalcula a los usuarios con cambios de gastos en cambio_movimiento
+posteriores a la última ejecución (estado_anomalias). Como /sync, el cursor no avanza
+sobre los cambios de los últimos SYNC_MARGEN_SEGUNDOS: uno de id menor puede confirmarse
+después de leer el log, y esos usuarios se vuelven a recalcular en la siguiente ejecución.
+Si el log ya se compactó más allá de ese punto, recalcula a todos. Cada shard tiene su log y su estado: se procesan todos.
+"""
+import argparse
+import os
+import warnings
+from datetime import datetime, timezone
+from typing import List, Sequence
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from sqlalchemy import delete, func, insert, select, union
+from sqlmodel import Session
+from src.config.db import engine, shard_engines
+from src.config.tipo_cambio import MONEDA_BASE, obtener_snapshot
+from src.models.anomalia import AnomaliaGasto, EstadoAnomalias
+from src.models.cambio import CambioMovimiento, EstadoSync
+from src.models.gasto import Gasto
+from src.utils.cambios import TIPOS, limite_confirmado
+
+ANOMALIA_VENTANA = int(os.getenv("ANOMALIA_VENTANA", "30"))
+ANOMALIA_MINIMO = int(os.getenv("ANOMALIA_MINIMO", "8"))
+ANOMALIA_UMBRAL = float(os.getenv("ANOMALIA_UMBRAL", "3.5"))
+
+_LOTE_USUARIOS = 500
+_ESCALA_MAD = 1.4826
+# Si los gastos previos son todos iguales la MAD es 0: la desviación nunca baja
+# de esta fracción de la mediana
+_DESVIACION_MINIMA = 0.05
+
+
+def puntuaciones(cantidades: np.ndarray, inicios: np.ndarray, ventana: int = ANOMALIA_VENTANA):
+    """
+    Para `cantidades` ordenadas por grupo y fecha, donde cada grupo empieza en un índice
+    de `inicios`, devuelve arrays (previos, mediana, desviacion, puntuacion) de cada
+    elemento frente a los `ventana` elementos anteriores de su mismo grupo.
+
+    Todos los grupos se calculan a la vez: delante de cada grupo se insertan `ventana`
+    NaN, de modo que la ventana deslizante de un elemento nunca toma valores de otro grupo.
+    """
+    grupo = np.zeros(len(cantidades), dtype=np.int64)
+    grupo[inicios] = 1
+    grupo = np.cumsum(grupo) - 1
+    relleno = np.insert(cantidades, np.repeat(inicios, ventana), np.nan)
+    # La ventana que termina justo antes del elemento k empieza en k + ventana * grupo
+    previas = sliding_window_view(relleno, ventana)[np.arange(len(cantidades)) + ventana * grupo]
+
+    previos = np.count_nonzero(~np.isnan(previas), axis=1)
+    with warnings.catch_warnings():
+        # Las primeras filas de cada grupo no tienen previos (todo NaN)
+        warnings.simplefilter("ignore", RuntimeWarning)
+        mediana = np.nanmedian(previas, axis=1)
+        mad = np.nanmedian(np.abs(previas - mediana[:, None]), axis=1)
+    desviacion = np.maximum(_ESCALA_MAD * mad, _DESVIACION_MINIMA * np.abs(mediana))
+    puntuacion = np.divide(
+        cantidades - mediana, desviacion,
+        out=np.zeros_like(cantidades), where=(previos > 0) & (desviacion > 0)
+    )
+    return previos, mediana, desviacion, puntuacion
+
+
+def recalcular(conexion, usuarios: Sequence[int], snapshot=None) -> int:
+    """Reemplaza las anomalías de `usuarios` recalculándolas con todos sus gastos."""
+    snapshot = snapshot or obtener_snapshot()
+    conexion.execute(delete(AnomaliaGasto.__table__).where(AnomaliaGasto.usuario_id.in_(usuarios)))
+    filas = conexion.execute(
+        select(Gasto.id, Gasto.usuario_id, Gasto.tipo_gasto, Gasto.fecha_gasto, Gasto.cantidad_gasto, Gasto.moneda)
+        .where(Gasto.usuario_id.in_(usuarios))
+        .order_by(Gasto.usuario_id, Gasto.tipo_gasto, Gasto.fecha_gasto, Gasto.id)
+    ).all()
+    if not filas:
+        return 0
+
+    ids, usuarios_fila, tipos, fechas, cantidades, monedas = zip(*filas)
+    # Un factor por (moneda, fecha), como en agregados
+    factores = {}
+    for par in zip(monedas, fechas):
+        if par not in factores:
+            factores[par] = snapshot.factor(par[0], MONEDA_BASE, par[1])
+    cantidades = np.array(cantidades, dtype=float) * np.array([factores[p] for p in zip(monedas, fechas)])
+
+    usuarios_fila = np.array(usuarios_fila)
+    tipos = np.array(tipos, dtype=object)
+    cambio_grupo = np.ones(len(filas), dtype=bool)
+    cambio_grupo[1:] = (usuarios_fila[1:] != usuarios_fila[:-1]) | (tipos[1:] != tipos[:-1])
+
+    previos, mediana, desviacion, puntuacion = puntuaciones(cantidades, np.flatnonzero(cambio_grupo))
+    marcadas = np.flatnonzero((previos >= ANOMALIA_MINIMO) & (puntuacion > ANOMALIA_UMBRAL))
+    if len(marcadas) == 0:
+        return 0
+
+    ahora = datetime.now(timezone.utc)
+    conexion.execute(insert(AnomaliaGasto.__table__), [
+        {
+            "gasto_id": ids[i],
+            "usuario_id": int(usuarios_fila[i]),
+            "tipo_gasto": tipos[i],
+            "fecha_gasto": fechas[i],
+            "cantidad": float(cantidades[i]),
+            "mediana": float(mediana[i]),
+            "desviacion": float(desviacion[i]),
+            "puntuacion": float(puntuacion[i]),
+            "fecha_deteccion": ahora,
+        }
+        for i in marcadas
+    ])
+    return len(marcadas)
+
+
+def _usuarios_pendientes(db, desde: int, hasta: int, completo: bool) -> List[int]:
+    if completo:
+        # También los que tenían anomalías y ya no tienen gastos
+        statement = union(select(Gasto.usuario_id), select(AnomaliaGasto.usuario_id))
+    else:
+        statement = select(CambioMovimiento.usuario_id).distinct().where(
+            CambioMovimiento.tipo == TIPOS[Gasto],
+            CambioMovimiento.id > desde,
+            CambioMovimiento.id <= hasta
+        )
+    return sorted(db.exec(statement).scalars().all())
+
+
+def _cursor_confirmado(db, desde: int) -> int:
+    """Último id del log hasta el que todo está confirmado: antes del primer cambio reciente."""
+    limite = limite_confirmado()
+    primero_reciente = db.exec(
+        select(func.min(CambioMovimiento.id))
+        .where(CambioMovimiento.id > desde, CambioMovimiento.fecha_cambio > limite)
+    ).scalar()
+    statement = select(func.max(CambioMovimiento.id)).where(CambioMovimiento.fecha_cambio <= limite)
+    if primero_reciente is not None:
+        statement = statement.where(CambioMovimiento.id < primero_reciente)
+    return max(db.exec(statement).scalar() or 0, desde)
+
+
+def ejecutar(engine=engine, completo: bool = False) -> dict:
+    snapshot = obtener_snapshot()
+    with Session(engine) as db:
+        estado = db.get(EstadoAnomalias, 1)
+        desde = estado.ultimo_cambio if estado else 0
+        hasta = _cursor_confirmado(db, desde)
+        token_minimo = db.exec(select(EstadoSync.token_minimo).where(EstadoSync.id == 1)).scalar() or 0
+        # Primera ejecución, o el log ya no tiene todos los cambios desde la última
+        completo = completo or estado is None or desde < token_minimo
+
+        usuarios = _usuarios_pendientes(db, desde, hasta, completo)
+        anomalias = 0
+        for i in range(0, len(usuarios), _LOTE_USUARIOS):
+            anomalias += recalcular(db.connection(), usuarios[i:i + _LOTE_USUARIOS], snapshot)
+            db.commit()
+
+        estado = db.get(EstadoAnomalias, 1) or EstadoAnomalias(id=1)
+        estado.ultimo_cambio = max(estado.ultimo_cambio, hasta)
+        estado.fecha_ejecucion = datetime.now(timezone.utc)
+        db.add(estado)
+        db.commit()
+
+    resultado = {"completo": completo, "usuarios": len(usuarios), "anomalias": anomalias, "ultimo_cambio": hasta}
+    print(f"🚨 Anomalías de gasto recalculadas: {resultado}")
+    return resultado
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Detectar gastos inusuales")
+    parser.add_argument("--completo", action="store_true", help="Recalcular a todos los usuarios")
+    args = parser.parse_args()
+    for shard_engine in dict.fromkeys(shard_engines):
+        ejecutar(shard_engine, args.completo)
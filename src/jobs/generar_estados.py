@@ -0,0 +1,119 @@
+"""
+Genera los estados de cuenta mensuales de todos los usuarios.
+
+    python -m src.jobs.generar_estados                       # el mes anterior
+    python -m src.jobs.generar_estados --anio 2026 --mes 9 --procesos 8
+
+Pensado para correr a inicio de mes, p. ej. con cron: `10 0 1 * * python -m src.jobs.generar_estados`.
+
+1. Los totales salen de dos consultas agrupadas por (usuario, tipo, moneda, fecha) por
+   shard, lanzadas en paralelo: los mismos grupos que usan /analisis/resumen-mensual y
+   /analisis/gastos-por-tipo (incluidos los archivados), convertidos a la moneda base.
+2. Los usuarios se reparten en lotes entre ESTADOS_PROCESOS procesos, que escriben un CSV
+   y un HTML imprimible por usuario en ESTADOS_DIR/<aaaa-mm>/ (ver src/utils/estados.py).
+"""
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from typing import Dict, Iterator, List, Tuple
+from dateutil.relativedelta import relativedelta
+from sqlmodel import Session, select
+from src.config.db import engine
+from src.config.tipo_cambio import MONEDA_BASE, obtener_snapshot
+from src.models.gasto import Gasto
+from src.models.inversion import Inversion
+from src.models.item import Item
+from src.models.shard import ShardUsuario
+from src.utils.agregados import grupos
+from src.utils.estados import DatosEstado, escribir_lote
+from src.utils.shards import SHARDING, en_todos
+
+ESTADOS_PROCESOS = int(os.getenv("ESTADOS_PROCESOS", "0")) or os.cpu_count() or 1
+
+_LOTE = 2000
+
+
+def _totales_por_usuario(desde: date, hasta: date, moneda: str) -> Tuple[Dict[int, dict], Dict[int, dict]]:
+    """({usuario_id: {tipo: total}} de inversiones, ídem de gastos) del rango [desde, hasta)."""
+    partes = en_todos(lambda db: (
+        db.info["shard"],
+        grupos(db, Inversion, None, desde, hasta, por_tipo=True, por_usuario=True),
+        grupos(db, Gasto, None, desde, hasta, por_tipo=True, por_usuario=True),
+    ))
+
+    ubicaciones = {}
+    if SHARDING:
+        with Session(engine) as db:
+            ubicaciones = dict(db.exec(select(ShardUsuario.usuario_id, ShardUsuario.shard)).all())
+
+    snapshot = obtener_snapshot()
+    resultado = []
+    for indice in (1, 2):
+        # Un usuario a medio mover puede tener filas en dos shards: vale el del mapa
+        filas = (
+            ((usuario_id, tipo), moneda_fila, fecha, total)
+            for parte in partes
+            for usuario_id, tipo, moneda_fila, fecha, total in parte[indice]
+            if ubicaciones.get(usuario_id, 0) == parte[0]
+        )
+        por_usuario: Dict[int, dict] = {}
+        for (usuario_id, tipo), total in snapshot.convertir_por_clave(filas, moneda).items():
+            por_usuario.setdefault(usuario_id, {})[tipo] = total
+        resultado.append(por_usuario)
+    return resultado[0], resultado[1]
+
+
+def _lotes(usuarios: List[Tuple[int, str]], inversiones: dict, gastos: dict) -> Iterator[List[DatosEstado]]:
+    for i in range(0, len(usuarios), _LOTE):
+        yield [
+            DatosEstado(usuario_id, nombre, inversiones.get(usuario_id, {}), gastos.get(usuario_id, {}))
+            for usuario_id, nombre in usuarios[i:i + _LOTE]
+        ]
+
+
+def ejecutar(anio: int, mes: int, procesos: int = ESTADOS_PROCESOS, moneda: str = MONEDA_BASE) -> dict:
+    inicio = time.perf_counter()
+    desde = date(anio, mes, 1)
+    hasta = desde + relativedelta(months=1)
+
+    inversiones, gastos = _totales_por_usuario(desde, hasta, moneda)
+    with Session(engine) as db:
+        usuarios = db.exec(select(Item.id, Item.nombre).order_by(Item.id)).all()
+    consultas = time.perf_counter() - inicio
+
+    if procesos <= 1:
+        escritos = sum(escribir_lote(anio, mes, moneda, lote) for lote in _lotes(usuarios, inversiones, gastos))
+    else:
+        # spawn y no fork: este proceso ya lanzó los hilos de en_todos y tiene conexiones
+        # abiertas en los pools de los engines; un hijo creado con fork heredaría locks
+        # tomados por otros hilos y sockets de la base compartidos con el padre.
+        contexto = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=procesos, mp_context=contexto) as pool:
+            futuros = [
+                pool.submit(escribir_lote, anio, mes, moneda, lote)
+                for lote in _lotes(usuarios, inversiones, gastos)
+            ]
+            escritos = sum(futuro.result() for futuro in futuros)
+
+    resultado = {
+        "periodo": f"{anio:04d}-{mes:02d}",
+        "usuarios": escritos,
+        "procesos": procesos,
+        "consultas_s": round(consultas, 2),
+        "total_s": round(time.perf_counter() - inicio, 2),
+    }
+    print(f"🧾 Estados de cuenta generados: {resultado}")
+    return resultado
+
+
+if __name__ == "__main__":
+    anterior = date.today().replace(day=1) - relativedelta(months=1)
+    parser = argparse.ArgumentParser(description="Generar los estados de cuenta mensuales")
+    parser.add_argument("--anio", type=int, default=anterior.year)
+    parser.add_argument("--mes", type=int, default=anterior.month, choices=range(1, 13))
+    parser.add_argument("--procesos", type=int, default=ESTADOS_PROCESOS)
+    args = parser.parse_args()
+    ejecutar(args.anio, args.mes, args.procesos)
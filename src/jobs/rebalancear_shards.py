@@ -0,0 +1,260 @@
+"""
+Mueve usuarios entre shards sin detener el servicio.
+
+    python -m src.jobs.rebalancear_shards --usuario 42 --destino 2
+    python -m src.jobs.rebalancear_shards --equilibrar
+
+Para cada usuario:
+1. Lo marca como `migrando`: sus escrituras responden 503 (las lecturas siguen en el origen).
+2. Espera a que todos los procesos vean el estado (SHARD_MAPA_TTL + margen).
+3. Copia gastos e inversiones (también los archivados y sus totales congelados) al
+   destino conservando los id (si un id ya está ocupado en el destino, en la tabla de
+   recientes o en la de archivo, se asigna uno nuevo por encima de ambas) y la serie
+   de saldos, y recalcula ahí sus anomalías de gasto. Sus bocetos de
+   /analisis/estadisticas no se copian: quedan pendientes en el destino y se reconstruyen
+   en la primera consulta.
+4. Cambia el mapa al destino y reactiva las escrituras.
+5. Espera otra vez y borra los datos del origen.
+
+Los clientes de /sync del usuario reciben una descarga completa (el token es por shard).
+"""
+import argparse
+import os
+import time
+from collections import Counter
+from typing import List, Optional, Tuple
+from sqlalchemy import delete, func, insert, select, update
+from sqlmodel import Session
+from src.config.db import engine, shard_engines
+from src.jobs.detectar_anomalias import recalcular
+from src.models.anomalia import AnomaliaGasto
+from src.models.cambio import CambioMovimiento
+from src.models.distribucion import DistribucionMensual, EstadoDistribucion
+from src.models.gasto import Gasto, GastoArchivo
+from src.models.inversion import Inversion, InversionArchivo
+from src.models.item import Item
+from src.models.resumen_archivo import ResumenArchivo
+from src.models.serie_saldo import SerieSaldo
+from src.models.shard import ACTIVO, BORRANDO, MIGRANDO, ShardUsuario
+from src.utils.distribucion import descartar
+from src.utils.shards import N_SHARDS, SHARD_MAPA_TTL, leer_ubicacion, olvidar
+
+# Tiempo extra para que terminen las escrituras que empezaron antes de marcar al usuario
+SHARD_MIGRACION_MARGEN = float(os.getenv("SHARD_MIGRACION_MARGEN", "5"))
+
+_TABLAS_MOVIMIENTOS = [Gasto.__table__, Inversion.__table__]
+# Archivo y totales congelados: se copian igual que los movimientos
+_TABLAS_ARCHIVO = [GastoArchivo.__table__, InversionArchivo.__table__, ResumenArchivo.__table__]
+# (recientes, archivo): archivar conserva el id, así que ambas comparten un mismo espacio de id
+_FAMILIAS = [
+    (Gasto.__table__, GastoArchivo.__table__),
+    (Inversion.__table__, InversionArchivo.__table__),
+]
+_LOTE = 1000
+
+
+def _fijar_ubicacion(usuario_id: int, shard: int, estado: str) -> None:
+    with Session(engine) as db:
+        fila = db.get(ShardUsuario, usuario_id) or ShardUsuario(usuario_id=usuario_id)
+        fila.shard, fila.estado = shard, estado
+        db.add(fila)
+        db.commit()
+    olvidar(usuario_id)
+
+
+def _max_id(conexion, tabla, *condiciones) -> int:
+    return conexion.execute(select(func.coalesce(func.max(tabla.c.id), 0)).where(*condiciones)).scalar()
+
+
+def _techo(origen, destino, tablas, usuario_id: int) -> int:
+    """Mayor id de `tablas` en el destino o entre las filas del usuario en el origen."""
+    return max(max(_max_id(destino, t), _max_id(origen, t, t.c.usuario_id == usuario_id)) for t in tablas)
+
+
+def _reservar_ids(origen, destino_engine, familia, usuario_id: int) -> Optional[int]:
+    """
+    En MySQL sube el AUTO_INCREMENT de la tabla de recientes del destino por encima de
+    todos los id que puede ocupar la copia: los INSERT de otros usuarios mientras se copia
+    (y los posteriores) no chocan con ellos ni con los archivados copiados. Va antes de la
+    transacción de copia porque ALTER TABLE confirma implícitamente. Devuelve el primer id
+    reservado para las filas remapeadas, o None si la base no lo necesita.
+    """
+    if destino_engine.dialect.name != "mysql":
+        return None
+    filas = sum(
+        origen.execute(select(func.count()).select_from(t).where(t.c.usuario_id == usuario_id)).scalar()
+        for t in familia
+    )
+    with destino_engine.connect() as dst:
+        primero = _techo(origen, dst, familia, usuario_id) + 1
+        dst.exec_driver_sql(f"ALTER TABLE {familia[0].name} AUTO_INCREMENT = {primero + filas}")
+    return primero
+
+
+def _copiar_movimientos(origen, destino, tabla, usuario_id: int, ocupan=None,
+                        siguiente: Optional[int] = None) -> Tuple[dict, Optional[int]]:
+    """
+    Copia las filas del usuario conservando su id salvo que ya esté en `ocupan` (por
+    defecto solo `tabla`) en el destino; esas reciben id explícitos desde `siguiente`
+    (sin `siguiente`, los asigna el destino). Devuelve (conteos, siguiente id libre).
+    """
+    ocupan = ocupan or [tabla]
+    copiados = remapeados = 0
+    resultado = origen.execution_options(yield_per=_LOTE).execute(
+        select(tabla).where(tabla.c.usuario_id == usuario_id).order_by(tabla.c.id)
+    )
+    for lote in resultado.mappings().partitions():
+        filas = [dict(fila) for fila in lote]
+        ids = [f["id"] for f in filas]
+        ocupados = set()
+        for t in ocupan:
+            ocupados.update(destino.execute(select(t.c.id).where(t.c.id.in_(ids))).scalars())
+        conservan = [f for f in filas if f["id"] not in ocupados]
+        nuevas = [f for f in filas if f["id"] in ocupados]
+        for fila in nuevas:
+            if siguiente is None:
+                del fila["id"]
+            else:
+                fila["id"], siguiente = siguiente, siguiente + 1
+        if conservan:
+            destino.execute(insert(tabla), conservan)
+        if nuevas:
+            destino.execute(insert(tabla), nuevas)
+        copiados += len(filas)
+        remapeados += len(nuevas)
+    return {"copiados": copiados, "remapeados": remapeados}, siguiente
+
+
+def _copiar_familia(origen, destino, familia, usuario_id: int, primero: Optional[int]) -> dict:
+    """
+    Copia recientes y archivados del usuario como un solo espacio de id: un id libre
+    debe estarlo en las dos tablas del destino y los remapeados van por encima de ambas.
+    """
+    recientes, archivo = familia
+    siguiente = primero or _techo(origen, destino, familia, usuario_id) + 1
+    resultado = {}
+    for tabla in (archivo, recientes):
+        resultado[tabla.name], siguiente = _copiar_movimientos(
+            origen, destino, tabla, usuario_id, ocupan=familia, siguiente=siguiente
+        )
+
+    # Sin AUTO_INCREMENT reservado, igual que al archivar: el id más alto debe quedar en
+    # recientes o un INSERT sin id (SQLite usa max(id) + 1) podría repetir el de un archivado
+    if primero is None and _max_id(destino, archivo) >= _max_id(destino, recientes):
+        mayor = _max_id(destino, recientes, recientes.c.usuario_id == usuario_id)
+        if not mayor:
+            raise RuntimeError(
+                f"No se puede mover al usuario {usuario_id}: sus {archivo.name} quedarían por "
+                f"encima del último id de {recientes.name} en el destino"
+            )
+        destino.execute(update(recientes).where(recientes.c.id == mayor).values(id=siguiente))
+        resultado[recientes.name]["remapeados"] += 1
+    return resultado
+
+
+def _copiar_serie(origen, destino, usuario_id: int) -> None:
+    tabla = SerieSaldo.__table__
+    anterior = destino.execute(select(tabla.c.version).where(tabla.c.usuario_id == usuario_id)).scalar()
+    destino.execute(delete(tabla).where(tabla.c.usuario_id == usuario_id))
+    fila = origen.execute(select(tabla).where(tabla.c.usuario_id == usuario_id)).mappings().first()
+    if fila is not None:
+        # La versión sigue creciendo para que ninguna caché confunda la serie con una anterior
+        fila = dict(fila)
+        fila["version"] = max(fila["version"], anterior or 0) + 1
+        destino.execute(insert(tabla), fila)
+
+
+def _borrar_usuario(conexion, usuario_id: int) -> None:
+    for tabla in [*_TABLAS_MOVIMIENTOS, *_TABLAS_ARCHIVO, SerieSaldo.__table__, CambioMovimiento.__table__,
+                  AnomaliaGasto.__table__, DistribucionMensual.__table__, EstadoDistribucion.__table__]:
+        conexion.execute(delete(tabla).where(tabla.c.usuario_id == usuario_id))
+
+
+def mover_usuario(usuario_id: int, destino: int, espera: Optional[float] = None) -> dict:
+    """Mueve los movimientos de un usuario al shard `destino` (ver pasos en el docstring del módulo)."""
+    if not 0 <= destino < N_SHARDS:
+        raise ValueError(f"Shard inválido: {destino} (hay {N_SHARDS})")
+    espera = SHARD_MAPA_TTL + SHARD_MIGRACION_MARGEN if espera is None else espera
+
+    with Session(engine) as db:
+        origen, estado = leer_ubicacion(db, usuario_id)
+    if estado == BORRANDO:
+        raise ValueError(f"El usuario {usuario_id} se está eliminando")
+    if origen == destino:
+        return {"usuario_id": usuario_id, "origen": origen, "destino": destino, "movido": False}
+
+    _fijar_ubicacion(usuario_id, origen, MIGRANDO)
+    resultado = {"usuario_id": usuario_id, "origen": origen, "destino": destino, "movido": True}
+    try:
+        time.sleep(espera)
+        with shard_engines[origen].connect() as src:
+            reservados = [_reservar_ids(src, shard_engines[destino], familia, usuario_id) for familia in _FAMILIAS]
+            with shard_engines[destino].begin() as dst:
+                # Restos de un movimiento anterior interrumpido
+                _borrar_usuario(dst, usuario_id)
+                for familia, primero in zip(_FAMILIAS, reservados):
+                    resultado.update(_copiar_familia(src, dst, familia, usuario_id, primero))
+                tabla = ResumenArchivo.__table__
+                resultado[tabla.name], _ = _copiar_movimientos(src, dst, tabla, usuario_id)
+                _copiar_serie(src, dst, usuario_id)
+                # Se recalculan en vez de copiarse: un gasto remapeado cambia de id
+                recalcular(dst, [usuario_id])
+                descartar(dst, [usuario_id])
+        _fijar_ubicacion(usuario_id, destino, ACTIVO)
+    except Exception:
+        # El origen sigue intacto: se descarta la copia y se reactiva el usuario donde estaba
+        with shard_engines[destino].begin() as dst:
+            _borrar_usuario(dst, usuario_id)
+        _fijar_ubicacion(usuario_id, origen, ACTIVO)
+        raise
+
+    # Los procesos con el mapa viejo en caché aún pueden leer del origen un momento
+    time.sleep(espera)
+    with shard_engines[origen].begin() as src:
+        _borrar_usuario(src, usuario_id)
+
+    print(f"🔀 Usuario {usuario_id} movido del shard {origen} al {destino}: {resultado}")
+    return resultado
+
+
+def plan_equilibrio() -> List[tuple]:
+    """Movimientos (usuario_id, destino) que dejan el mismo número de usuarios por shard (±1)."""
+    with Session(engine) as db:
+        usuarios = db.exec(select(Item.id)).scalars().all()
+        mapa = dict(db.exec(select(ShardUsuario.usuario_id, ShardUsuario.shard)).all())
+
+    por_shard = {s: [] for s in range(N_SHARDS)}
+    for usuario_id in usuarios:
+        por_shard.setdefault(mapa.get(usuario_id, 0), []).append(usuario_id)
+
+    conteo = Counter({s: len(ids) for s, ids in por_shard.items()})
+    plan = []
+    while True:
+        mayor, menor = max(conteo, key=conteo.get), min(conteo, key=conteo.get)
+        if conteo[mayor] - conteo[menor] <= 1:
+            return plan
+        plan.append((por_shard[mayor].pop(), menor))
+        conteo[mayor] -= 1
+        conteo[menor] += 1
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Mover usuarios entre shards")
+    parser.add_argument("--usuario", type=int)
+    parser.add_argument("--destino", type=int)
+    parser.add_argument("--equilibrar", action="store_true", help="Repartir los usuarios por igual")
+    args = parser.parse_args(argv)
+
+    if args.equilibrar:
+        plan = plan_equilibrio()
+        print(f"📋 {len(plan)} usuarios a mover")
+        for usuario_id, destino in plan:
+            mover_usuario(usuario_id, destino)
+    elif args.usuario is not None and args.destino is not None:
+        mover_usuario(args.usuario, args.destino)
+    else:
+        parser.error("usa --usuario y --destino, o --equilibrar")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Recategoriza los gastos existentes con las reglas de categoría actuales.
+
+    python -m src.jobs.recategorizar_gastos
+    python -m src.jobs.recategorizar_gastos --usuario 42
+
+Recorre la tabla gasto de cada shard por id, en lotes y con SQL directo: calcula el tipo
+de cada fila con el categorizador (en caché) de su dueño y actualiza solo las que cambian,
+anotándolas en el log de cambios para que los clientes de /sync las reciban (y
+detectar_anomalias recalcule a esos usuarios) y descartando los bocetos de
+/analisis/estadisticas de sus dueños, que se reconstruyen en la próxima consulta. Cada
+lote es una transacción; una fila que el usuario modificó mientras tanto no se pisa.
+
+Los movimientos archivados y sus totales congelados no se tocan, y se saltan los
+usuarios que se están moviendo de shard.
+"""
+import argparse
+from typing import Optional, Set
+from sqlalchemy import bindparam, select, update
+from sqlmodel import Session
+from src.config.db import engine, shard_engines
+from src.models.gasto import Gasto
+from src.models.shard import MIGRANDO, ShardUsuario
+from src.utils.cambios import TIPOS, UPSERT, registrar_cambios
+from src.utils.categorias import categorizador
+from src.utils.distribucion import descartar
+from src.utils.shards import SHARDING
+
+_LOTE = 5000
+
+_ACTUALIZAR = (
+    update(Gasto.__table__)
+    .where(Gasto.__table__.c.id == bindparam("b_id"), Gasto.__table__.c.tipo_gasto == bindparam("b_anterior"))
+    .values(tipo_gasto=bindparam("b_tipo"))
+)
+
+
+def _migrando() -> Set[int]:
+    if not SHARDING:
+        return set()
+    with Session(engine) as db:
+        return set(db.exec(select(ShardUsuario.usuario_id).where(ShardUsuario.estado == MIGRANDO)).scalars().all())
+
+
+def _recategorizar_lote(conn, desde_id: int, usuario_id: Optional[int], omitir: Set[int]):
+    """(último id leído, filas leídas, filas cambiadas) de un lote, o None si no quedan filas."""
+    tabla = Gasto.__table__
+    statement = (
+        select(tabla.c.id, tabla.c.usuario_id, tabla.c.tipo_gasto, tabla.c.descripcion, tabla.c.cantidad_gasto)
+        .where(tabla.c.id > desde_id)
+        .order_by(tabla.c.id)
+        .limit(_LOTE)
+    )
+    if usuario_id is not None:
+        statement = statement.where(tabla.c.usuario_id == usuario_id)
+    filas = conn.execute(statement).all()
+    if not filas:
+        return None
+
+    cambios = []
+    for gasto_id, dueno, tipo, descripcion, cantidad in filas:
+        if dueno in omitir:
+            continue
+        nuevo = categorizador(dueno).categorizar(tipo, descripcion, cantidad)
+        if nuevo != tipo:
+            cambios.append({"b_id": gasto_id, "b_anterior": tipo, "b_tipo": nuevo, "usuario_id": dueno})
+
+    if cambios:
+        conn.execute(_ACTUALIZAR, [{k: v for k, v in c.items() if k != "usuario_id"} for c in cambios])
+        registrar_cambios(conn, [(c["usuario_id"], TIPOS[Gasto], c["b_id"], UPSERT) for c in cambios])
+        descartar(conn, sorted({c["usuario_id"] for c in cambios}))
+    return filas[-1].id, len(filas), len(cambios)
+
+
+def ejecutar(engine=engine, usuario_id: Optional[int] = None) -> dict:
+    omitir = _migrando()
+    ultimo_id = leidos = cambiados = 0
+    while True:
+        with engine.begin() as conn:
+            lote = _recategorizar_lote(conn, ultimo_id, usuario_id, omitir)
+        if lote is None:
+            break
+        ultimo_id, n_leidos, n_cambiados = lote
+        leidos += n_leidos
+        cambiados += n_cambiados
+
+    resultado = {"revisados": leidos, "recategorizados": cambiados, "omitidos_usuarios": len(omitir)}
+    print(f"🏷️ Gastos recategorizados: {resultado}")
+    return resultado
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recategorizar gastos existentes")
+    parser.add_argument("--usuario", type=int, default=None, help="Solo los gastos de este usuario")
+    args = parser.parse_args()
+    for shard_engine in dict.fromkeys(shard_engines):
+        ejecutar(shard_engine, args.usuario)
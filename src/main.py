@@ -3,20 +3,30 @@ from pathlib import Path
 from typing import Annotated
 
 from fastapi import FastAPI, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import FileResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from jose import jwt
 from sqlmodel import SQLModel, select
-from src.routes.db_session import SessionDep
+from src.routes.db_session import MiddlewareEscrituras, SessionDep
 from src.config.db import engine
+from src.config.busqueda import inicializar_indice
+from src.utils.shards import inicializar_shards
 from src import models
 from src.routes.item_router import items_router
 from src.routes.inversion_router import inversion_router
 from src.routes.gasto_router import gasto_router
 from src.routes.analisis_router import analisis_router
+from src.routes.movimiento_router import movimiento_router
+from src.routes.busqueda_router import busqueda_router
+from src.routes.sync_router import sync_router
+from src.routes.perfil_router import perfil_router
+from src.routes.regla_router import regla_router
 
 # Seguridad
 from src.dependencies import oauth2_scheme, decode_token, verify_admin_role, ADMIN_USERNAME, ADMIN_ROL
+from src.utils.admision import LimiteConcurrencia, LimiteTasa, clave_ip, clave_login, clave_usuario
+from src.utils.perfilado import MiddlewarePerfil
 
 # Gemini
 import google.generativeai as genai
@@ -36,17 +46,49 @@ ABSOLUTE_FILE_PATH = TEMPLATES_DIR / "admit.html"
 # --- CONFIGURACIÓN DEL ADMIN ---
 ADMIN_PASSWORD = "super_secure_admin_password"
 
+# --- CONTROL DE ADMISIÓN ---
+# Cupos por proceso para que /token y /chat no acaparen los hilos que usan las rutas CRUD.
+limite_login = LimiteConcurrencia(
+    "login",
+    max_concurrentes=int(os.getenv("LOGIN_MAX_CONCURRENTES", "8")),
+    max_en_cola=int(os.getenv("LOGIN_MAX_COLA", "32")),
+    espera_max=float(os.getenv("LOGIN_ESPERA_MAX", "2"))
+)
+limite_chat = LimiteConcurrencia(
+    "chat",
+    max_concurrentes=int(os.getenv("CHAT_MAX_CONCURRENTES", "4")),
+    max_en_cola=int(os.getenv("CHAT_MAX_COLA", "8")),
+    espera_max=float(os.getenv("CHAT_ESPERA_MAX", "5"))
+)
+tasa_login_ip = LimiteTasa("login-ip", capacidad=20, por_minuto=float(os.getenv("LOGIN_POR_MINUTO_IP", "30")), clave=clave_ip)
+tasa_login_usuario = LimiteTasa("login-usuario", capacidad=5, por_minuto=float(os.getenv("LOGIN_POR_MINUTO_USUARIO", "5")), clave=clave_login)
+tasa_chat_ip = LimiteTasa("chat-ip", capacidad=20, por_minuto=float(os.getenv("CHAT_POR_MINUTO_IP", "30")), clave=clave_ip)
+tasa_chat_usuario = LimiteTasa("chat-usuario", capacidad=5, por_minuto=float(os.getenv("CHAT_POR_MINUTO_USUARIO", "10")), clave=clave_usuario)
+
 # --- CONFIGURACIÓN INICIAL ---
 SQLModel.metadata.create_all(engine)
+inicializar_indice(engine)
+inicializar_shards()
 
 # Crear instancia
 app = FastAPI()
 
+# Perfilado bajo demanda (cabecera X-Perfil); sin la cabecera no hace nada
+app.add_middleware(MiddlewarePerfil)
+
+# Tras una escritura el cliente lee del primario (ver src/routes/db_session.py)
+app.add_middleware(MiddlewareEscrituras)
+
 # Incluir routers
 app.include_router(items_router)
 app.include_router(inversion_router)
 app.include_router(gasto_router)
 app.include_router(analisis_router)
+app.include_router(movimiento_router)
+app.include_router(busqueda_router)
+app.include_router(sync_router)
+app.include_router(perfil_router)
+app.include_router(regla_router)
 
 
 # -------------------------------
@@ -57,7 +99,11 @@ def encode_token(payload: dict) -> str:
     return jwt.encode(payload, "my-secret", algorithm="HS256")
 
 
-@app.post("/token", tags=['login'])
+@app.post(
+    "/token",
+    tags=['login'],
+    dependencies=[Depends(tasa_login_ip), Depends(tasa_login_usuario), Depends(limite_login)]
+)
 def login(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
     db: SessionDep
@@ -173,7 +219,11 @@ async def list_available_models():
         return {"error": str(e), "suggestion": "Verifica tu API key en https://aistudio.google.com/app/apikey"}
 
 
-@app.post("/chat", tags=["chat"])
+@app.post(
+    "/chat",
+    tags=["chat"],
+    dependencies=[Depends(tasa_chat_ip), Depends(tasa_chat_usuario), Depends(limite_chat)]
+)
 async def chat_endpoint(req: ChatRequest):
     """
     Chat simple con Gemini 2.5 Flash (modelo estable y rápido).
@@ -189,7 +239,9 @@ async def chat_endpoint(req: ChatRequest):
         model_name = "models/gemini-2.5-flash"
         
         temp_model = genai.GenerativeModel(model_name)
-        response = temp_model.generate_content(
+        # La llamada es bloqueante: se ejecuta en un hilo para no detener el event loop
+        response = await run_in_threadpool(
+            temp_model.generate_content,
             req.message,
             generation_config=genai.GenerationConfig(
                 temperature=0.7,
@@ -1,6 +1,14 @@
 from .item import Item, ItemCreateIn, ItemCreateOut, ItemUpdateIn
-from .gasto import Gasto, GastoCreateIn, GastoUpdateIn, GastoRead
-from .inversion import Inversion, InversionCreateIn, InversionUpdateIn, InversionRead
+from .gasto import Gasto, GastoCreateIn, GastoUpdateIn, GastoRead, GastoArchivo
+from .inversion import Inversion, InversionCreateIn, InversionUpdateIn, InversionRead, InversionArchivo
+from .movimiento import OperacionBatch, BatchIn, ResultadoOperacion, BatchOut
+from .serie_saldo import SerieSaldo
+from .cambio import CambioMovimiento, EstadoSync
+from .shard import ShardUsuario
+from .resumen_archivo import ResumenArchivo
+from .anomalia import AnomaliaGasto, AnomaliaRead, EstadoAnomalias
+from .regla_categoria import ReglaCategoria, ReglaCategoriaIn, ReglaCategoriaRead
+from .distribucion import DistribucionMensual, EstadoDistribucion, InventarioDistribucion
 
 # Asegurar que las relaciones entre modelos se importen al cargar el paquete
 from . import relationships
\ No newline at end of file
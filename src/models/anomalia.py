@@ -0,0 +1,42 @@
+# anomalia.py
+from sqlmodel import SQLModel, Field
+from sqlalchemy import Index
+from typing import Optional
+from datetime import date, datetime, timezone
+
+class AnomaliaGasto(SQLModel, table=True):
+    """
+    Gasto marcado como inusual por el job detectar_anomalias: su cantidad (en la moneda
+    base) está muy por encima de la mediana de los gastos anteriores del mismo tipo.
+    """
+    __tablename__ = "anomalia_gasto"
+    __table_args__ = (
+        Index("ix_anomalia_usuario_fecha", "usuario_id", "fecha_gasto"),
+    )
+
+    gasto_id: int = Field(primary_key=True)
+    usuario_id: int = Field()
+    tipo_gasto: str = Field()
+    fecha_gasto: date = Field()
+    cantidad: float = Field()                 # En la moneda base
+    mediana: float = Field()                  # De los gastos anteriores del mismo tipo
+    desviacion: float = Field()               # MAD escalada (comparable a una desviación estándar)
+    puntuacion: float = Field()               # (cantidad - mediana) / desviacion
+    fecha_deteccion: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class AnomaliaRead(SQLModel):
+    gasto_id: int
+    tipo_gasto: str
+    fecha_gasto: date
+    cantidad: float
+    mediana: float
+    desviacion: float
+    puntuacion: float
+
+class EstadoAnomalias(SQLModel, table=True):
+    """Fila única: último id de cambio_movimiento ya procesado por detectar_anomalias."""
+    __tablename__ = "estado_anomalias"
+
+    id: int = Field(default=1, primary_key=True)
+    ultimo_cambio: int = Field(default=0)
+    fecha_ejecucion: Optional[datetime] = None
@@ -0,0 +1,30 @@
+# cambio.py
+from sqlmodel import SQLModel, Field
+from sqlalchemy import Index
+from typing import Optional
+from datetime import datetime, timezone
+
+class CambioMovimiento(SQLModel, table=True):
+    """
+    Registro de cambios (outbox) de gastos e inversiones para la sincronización delta.
+    El id autoincremental es el token de sincronización.
+    """
+    __tablename__ = "cambio_movimiento"
+    __table_args__ = (
+        Index("ix_cambio_usuario_token", "usuario_id", "id"),
+        Index("ix_cambio_movimiento", "tipo", "movimiento_id"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    usuario_id: int = Field()
+    tipo: str = Field(max_length=10)          # gasto | inversion
+    movimiento_id: int = Field()
+    operacion: str = Field(max_length=10)     # upsert | delete
+    fecha_cambio: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class EstadoSync(SQLModel, table=True):
+    """Fila única: los tokens menores que token_minimo ya fueron compactados."""
+    __tablename__ = "estado_sync"
+
+    id: int = Field(default=1, primary_key=True)
+    token_minimo: int = Field(default=0)
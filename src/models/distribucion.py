@@ -0,0 +1,51 @@
+# distribucion.py
+from sqlmodel import SQLModel, Field
+from sqlalchemy import JSON, Column, LargeBinary
+from typing import List, Optional
+from datetime import date, datetime, timezone
+
+class DistribucionMensual(SQLModel, table=True):
+    """
+    Boceto de cuantiles (tipo DDSketch) de las cantidades de un usuario en un mes,
+    por movimiento (gasto | inversion) y categoría, en la moneda de EstadoDistribucion.
+    `cubetas` es un array('q') intercalado [índice_0, conteo_0, índice_1, conteo_1, ...]
+    de cubetas logarítmicas; los bocetos de varios meses o usuarios se combinan sumando
+    los conteos de cada índice. `mayores` guarda los movimientos más grandes
+    [[cantidad, id, fecha], ...]; si `mayores_completo` es falso se borró alguno y hay
+    que releerlos.
+    """
+    __tablename__ = "distribucion_mensual"
+
+    usuario_id: int = Field(primary_key=True)
+    tipo: str = Field(primary_key=True, max_length=10)
+    categoria: str = Field(primary_key=True, max_length=255)
+    mes: date = Field(primary_key=True)       # Primer día del mes
+    conteo: int = Field(default=0)
+    suma: float = Field(default=0.0)
+    cubetas: bytes = Field(sa_column=Column(LargeBinary(length=2**24), nullable=False))
+    mayores: List[list] = Field(default_factory=list, sa_column=Column(JSON, nullable=False))
+    mayores_completo: bool = Field(default=True)
+
+class EstadoDistribucion(SQLModel, table=True):
+    """
+    Marcador de los bocetos de cada usuario con movimientos en el shard. Con `pendiente`
+    se construyen completos en la próxima consulta (la global solo busca estos); si no,
+    están construidos en `moneda` y se mantienen en cada flush. El flush que guarda el
+    primer movimiento de un usuario crea su marcador pendiente.
+    """
+    __tablename__ = "estado_distribucion"
+
+    usuario_id: int = Field(primary_key=True)
+    moneda: str = Field(default="", max_length=3)
+    pendiente: bool = Field(default=True, index=True)
+
+class InventarioDistribucion(SQLModel, table=True):
+    """
+    Fila única: los usuarios del shard con movimientos anteriores a los marcadores de
+    estado_distribucion ya tienen el suyo, con `moneda` como moneda base.
+    """
+    __tablename__ = "inventario_distribucion"
+
+    id: int = Field(default=1, primary_key=True)
+    moneda: str = Field(max_length=3)
+    fecha_ejecucion: Optional[datetime] = Field(default_factory=lambda: datetime.now(timezone.utc))
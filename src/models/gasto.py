@@ -2,24 +2,28 @@
 from sqlmodel import Relationship, SQLModel, Field
 from typing import Optional
 from datetime import date
+from src.config.tipo_cambio import MONEDA_BASE
 
 class GastoBase(SQLModel):
     tipo_gasto: str = Field(index=True)
     cantidad_gasto: float = Field()
     fecha_gasto: date = Field(default_factory=date.today)
     descripcion: Optional[str] = None
+    moneda: str = Field(default=MONEDA_BASE, max_length=3)
 
 class GastoCreateIn(SQLModel):
     tipo_gasto: str = Field()
     cantidad_gasto: float = Field()
     fecha_gasto: Optional[date] = Field(default_factory=date.today)
     descripcion: Optional[str] = None 
+    moneda: str = Field(default=MONEDA_BASE, max_length=3)
 
 class GastoUpdateIn(SQLModel):
     tipo_gasto: Optional[str] = None
     cantidad_gasto: Optional[float] = None
     fecha_gasto: Optional[date] = None
     descripcion: Optional[str] = None
+    moneda: Optional[str] = Field(default=None, max_length=3)
 
 class GastoRead(SQLModel):
     id: int = Field()
@@ -27,10 +31,18 @@ class GastoRead(SQLModel):
     cantidad_gasto: float = Field()
     fecha_gasto: date = Field()
     descripcion: Optional[str] = None
+    moneda: str = Field()
     usuario_id: int
 
 class Gasto(GastoBase, table=True):
     __tablename__ = "gasto"
     
     id: Optional[int] = Field(default=None, primary_key=True)
-    usuario_id: Optional[int] = Field(default=None, foreign_key="item.id")
\ No newline at end of file
+    usuario_id: Optional[int] = Field(default=None, foreign_key="item.id")
+
+class GastoArchivo(GastoBase, table=True):
+    """Gastos anteriores al horizonte de archivo; solo lectura y con el mismo id que tenían."""
+    __tablename__ = "gasto_archivo"
+    
+    id: int = Field(primary_key=True)
+    usuario_id: Optional[int] = Field(default=None, foreign_key="item.id", index=True)
\ No newline at end of file
@@ -2,24 +2,28 @@
 from sqlmodel import Relationship, SQLModel, Field
 from typing import Optional
 from datetime import date 
+from src.config.tipo_cambio import MONEDA_BASE
 
 class InversionBase(SQLModel):
     tipo_inversion: str = Field(index=True)
     cantidad_inversion: float = Field()
     fecha_inversion: date = Field(default_factory=date.today)
     descripcion: Optional[str] = None
+    moneda: str = Field(default=MONEDA_BASE, max_length=3)
 
 class InversionCreateIn(SQLModel):
     tipo_inversion: str = Field()
     cantidad_inversion: float = Field()
     fecha_inversion: Optional[date] = Field(default_factory=date.today)
     descripcion: Optional[str] = None 
+    moneda: str = Field(default=MONEDA_BASE, max_length=3)
 
 class InversionUpdateIn(SQLModel):
     tipo_inversion: Optional[str] = None
     cantidad_inversion: Optional[float] = None
     fecha_inversion: Optional[date] = None
     descripcion: Optional[str] = None
+    moneda: Optional[str] = Field(default=None, max_length=3)
 
 class InversionRead(SQLModel):
     id: int = Field()
@@ -27,10 +31,18 @@ class InversionRead(SQLModel):
     cantidad_inversion: float = Field()
     fecha_inversion: date = Field()
     descripcion: Optional[str] = None
+    moneda: str = Field()
     usuario_id: int
 
 class Inversion(InversionBase, table=True):
     __tablename__ = "inversion"
     
     id: Optional[int] = Field(default=None, primary_key=True)
-    usuario_id: Optional[int] = Field(default=None, foreign_key="item.id")
\ No newline at end of file
+    usuario_id: Optional[int] = Field(default=None, foreign_key="item.id")
+
+class InversionArchivo(InversionBase, table=True):
+    """Inversiones anteriores al horizonte de archivo; solo lectura y con el mismo id que tenían."""
+    __tablename__ = "inversion_archivo"
+    
+    id: int = Field(primary_key=True)
+    usuario_id: Optional[int] = Field(default=None, foreign_key="item.id", index=True)
\ No newline at end of file
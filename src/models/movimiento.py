@@ -0,0 +1,30 @@
+# movimiento.py
+from sqlmodel import SQLModel, Field
+from typing import Any, Dict, List, Literal, Optional
+
+class OperacionBatch(SQLModel):
+    accion: Literal["crear", "actualizar", "eliminar"]
+    tipo: Literal["gasto", "inversion"]
+    id: Optional[int] = None                   # Requerido para actualizar/eliminar
+    datos: Optional[Dict[str, Any]] = None     # Campos de GastoCreateIn/InversionCreateIn (o de *UpdateIn)
+
+class BatchIn(SQLModel):
+    operaciones: List[OperacionBatch] = Field(min_length=1, max_length=500)
+    # todo_o_nada: si una operación falla no se aplica ninguna
+    # mejor_esfuerzo: cada operación se aplica (o se descarta) por separado
+    modo: Literal["todo_o_nada", "mejor_esfuerzo"] = "todo_o_nada"
+
+class ResultadoOperacion(SQLModel):
+    indice: int
+    accion: str
+    tipo: str
+    ok: bool
+    id: Optional[int] = None
+    codigo: Optional[int] = None               # Estado HTTP equivalente de la ruta individual si falló
+    error: Optional[str] = None
+
+class BatchOut(SQLModel):
+    modo: str
+    aplicadas: int
+    fallidas: int
+    resultados: List[ResultadoOperacion]
@@ -0,0 +1,36 @@
+# regla_categoria.py
+from sqlmodel import SQLModel, Field
+from typing import Literal, Optional
+from datetime import datetime, timezone
+
+# Tipos de patrón de una regla
+PALABRAS = "palabras"   # Lista de palabras o frases separadas por comas
+REGEX = "regex"         # Expresión regular sobre el texto normalizado
+
+class ReglaCategoriaBase(SQLModel):
+    categoria: str = Field(max_length=100)                 # tipo_gasto que se asigna
+    tipo_patron: str = Field(default=PALABRAS, max_length=10)
+    patron: Optional[str] = Field(default=None, max_length=500)  # Sin patrón: solo por cantidad
+    cantidad_min: Optional[float] = None                   # Inclusive, en la moneda del gasto
+    cantidad_max: Optional[float] = None                   # Exclusive
+    prioridad: int = Field(default=0)                      # Mayor prioridad gana
+
+class ReglaCategoria(ReglaCategoriaBase, table=True):
+    """
+    Regla de categorización de gastos. Con usuario_id nulo es una regla del sistema
+    (para todos); las del usuario se aplican antes que las del sistema.
+    Vive en la base principal, como los usuarios.
+    """
+    __tablename__ = "regla_categoria"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    usuario_id: Optional[int] = Field(default=None, index=True)
+    fecha_creacion: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class ReglaCategoriaIn(ReglaCategoriaBase):
+    tipo_patron: Literal["palabras", "regex"] = PALABRAS
+    sistema: bool = False                                  # Solo admin: regla para todos los usuarios
+
+class ReglaCategoriaRead(ReglaCategoriaBase):
+    id: int
+    usuario_id: Optional[int]
@@ -0,0 +1,26 @@
+# resumen_archivo.py
+from sqlmodel import SQLModel, Field
+from sqlalchemy import Index
+from typing import Optional
+from datetime import date, datetime, timezone
+
+class ResumenArchivo(SQLModel, table=True):
+    """
+    Totales congelados de los movimientos archivados, por (usuario, tipo, mes, categoría, moneda);
+    `fecha` es el primer día del mes. Solo se insertan filas (nunca se modifican): si un mismo
+    mes se archiva en dos pasadas o en dos lotes quedan dos filas y los totales se suman.
+    """
+    __tablename__ = "resumen_archivo"
+    __table_args__ = (
+        Index("ix_resumen_archivo_usuario", "usuario_id", "tipo", "fecha"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    usuario_id: int = Field()
+    tipo: str = Field(max_length=10)          # gasto | inversion
+    fecha: date = Field()
+    categoria: str = Field()                  # tipo_gasto / tipo_inversion
+    moneda: str = Field(max_length=3)
+    total: float = Field()
+    movimientos: int = Field()
+    fecha_archivo: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
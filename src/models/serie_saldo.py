@@ -0,0 +1,18 @@
+# serie_saldo.py
+from sqlmodel import SQLModel, Field
+from sqlalchemy import Column, LargeBinary
+from datetime import date
+
+class SerieSaldo(SQLModel, table=True):
+    """
+    Saldos acumulados por día de un usuario (sumas prefijas), en `moneda`.
+    `datos` es un array('d') intercalado: [inversiones_0, gastos_0, inversiones_1, gastos_1, ...]
+    donde el índice i corresponde a fecha_inicio + i días y cada valor es el acumulado hasta ese día.
+    """
+    __tablename__ = "serie_saldo"
+
+    usuario_id: int = Field(primary_key=True)
+    moneda: str = Field(max_length=3)
+    fecha_inicio: date = Field()
+    datos: bytes = Field(sa_column=Column(LargeBinary(length=2**24), nullable=False))
+    version: int = Field(default=1)
@@ -0,0 +1,18 @@
+# shard.py
+from sqlmodel import SQLModel, Field
+
+# Estados de un usuario en el mapa de shards
+ACTIVO = "activo"
+MIGRANDO = "migrando"   # Se están copiando sus movimientos: escrituras en pausa (503)
+BORRANDO = "borrando"   # Se está eliminando la cuenta: escrituras rechazadas (410)
+
+class ShardUsuario(SQLModel, table=True):
+    """
+    Mapa usuario -> shard, guardado en la base principal.
+    Un usuario sin fila vive en el shard 0 (datos anteriores al particionado).
+    """
+    __tablename__ = "shard_usuario"
+
+    usuario_id: int = Field(primary_key=True)
+    shard: int = Field(default=0, index=True)
+    estado: str = Field(default=ACTIVO, max_length=10)
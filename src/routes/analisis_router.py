@@ -1,17 +1,28 @@
-from typing import Annotated, List, Dict
+from typing import Annotated, List, Dict, Literal, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlmodel import select, func
-from src.routes.db_session import SessionDep
+from fastapi.responses import FileResponse
+from src.routes.db_session import ReadSessionDep
 from src.models.inversion import Inversion
 from src.models.gasto import Gasto
-from src.dependencies import decode_token
-from datetime import date, datetime
+from src.models.anomalia import AnomaliaGasto, AnomaliaRead
+from src.dependencies import decode_token, verify_admin_role
+from src.config.tipo_cambio import MONEDA_BASE, normalizar_moneda, obtener_snapshot
+from src.utils.agregados import grupos
+from src.utils.categorias import normalizar
+from src.utils.distribucion import MAYORES_K, PRECISION_RELATIVA, Boceto, bocetos_shard, bocetos_usuario, combinar_shards
+from src.utils.estados import FORMATOS, archivo_estado, periodos_usuario
+from src.utils.lectura import consulta, ejecutar
+from src.utils.respuestas import respuesta_filas
+from src.utils.serie_saldo import obtener_serie
+from src.utils.shards import en_paralelo, en_todos
+from datetime import date, datetime, timedelta
 from dateutil.relativedelta import relativedelta
 
 analisis_router = APIRouter(prefix="/analisis", tags=["Análisis Financiero"])
 
 # --- DEPENDENCIAS DE SEGURIDAD ---
 UserDep = Annotated[dict, Depends(decode_token)]
+AdminDep = Annotated[bool, Depends(verify_admin_role)]
 
 
 # --- MODELOS DE RESPUESTA ---
@@ -23,6 +34,7 @@ class ResumenFinanciero(BaseModel):
     balance: float
     porcentaje_ahorro: float
     periodo: str
+    moneda: str = MONEDA_BASE
 
 class GastoPorTipo(BaseModel):
     tipo_gasto: str
@@ -34,58 +46,300 @@ class InversionPorTipo(BaseModel):
     total: float
     porcentaje: float
 
+class Dashboard(BaseModel):
+    # Solo vienen los bloques pedidos en `campos`
+    resumen_general: Optional[ResumenFinanciero] = None
+    resumen_mensual: Optional[ResumenFinanciero] = None
+    gastos_por_tipo: Optional[List[GastoPorTipo]] = None
+    inversiones_por_tipo: Optional[List[InversionPorTipo]] = None
+    tendencia_mensual: Optional[List[dict]] = None
 
-# --- ENDPOINTS ---
+class PuntoSaldo(BaseModel):
+    fecha: date
+    inversiones_acumuladas: float   # Desde el primer movimiento (patrimonio)
+    gastos_acumulados: float
+    saldo: float
+    saldo_periodo: float            # Solo lo ocurrido desde `desde` (saldo corriente)
 
-@analisis_router.get("/resumen-general", response_model=ResumenFinanciero)
-def get_resumen_general(db: SessionDep, user: UserDep):
-    """
-    Obtiene un resumen financiero general del usuario:
-    - Total de inversiones
-    - Total de gastos
-    - Balance (inversiones - gastos)
-    - Porcentaje de ahorro
-    """
+class CubetaHistograma(BaseModel):
+    desde: float
+    hasta: float
+    conteo: int
+
+class MovimientoMayor(BaseModel):
+    id: int
+    fecha: date
+    cantidad: float
+    usuario_id: Optional[int] = None  # Solo en /global/estadisticas
+
+class EstadisticasCategoria(BaseModel):
+    categoria: str
+    conteo: int
+    total: float
+    promedio: float
+    percentiles: Dict[str, float]   # {"p50": ..., "p90": ...}
+    histograma: List[CubetaHistograma]
+    mayores: List[MovimientoMayor]
+
+class Estadisticas(BaseModel):
+    tipo: str
+    periodo: str
+    moneda: str = MONEDA_BASE
+    precision_relativa: float       # Error relativo máximo de percentiles e histograma
+    general: Optional[EstadisticasCategoria] = None  # Todas las categorías juntas
+    categorias: List[EstadisticasCategoria]
+
+
+# --- AUXILIARES ---
+
+MonedaQuery = Annotated[str, Query(description="Moneda en la que se expresan los totales")]
+
+MAX_PUNTOS_SALDO = 1000
+
+CAMPOS_DASHBOARD = list(Dashboard.model_fields)
+
+
+def _moneda_destino(moneda: str) -> str:
+    try:
+        return normalizar_moneda(moneda)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+def _rango_mes(anio: int, mes: int):
+    """Devuelve (primer_dia, primer_dia_del_mes_siguiente)."""
+    primer_dia = date(anio, mes, 1)
+    if mes == 12:
+        ultimo_dia = date(anio + 1, 1, 1)
+    else:
+        ultimo_dia = date(anio, mes + 1, 1)
+    return primer_dia, ultimo_dia
+
+
+def _total(
+    db, modelo, usuario_id: int, moneda: str, desde: date = None, hasta: date = None, por_dia: bool = False
+) -> float:
+    """Total del usuario en `moneda` para el rango [desde, hasta) (ver `grupos` para `por_dia`)."""
+    filas = grupos(db, modelo, usuario_id, desde, hasta, por_dia=por_dia)
+    totales = obtener_snapshot().convertir_por_clave(filas, moneda)
+    return totales.get(None, 0.0)
+
+
+def _totales_por_tipo(db, modelo, usuario_id: int, moneda: str, desde: date = None, hasta: date = None) -> Dict[str, float]:
+    """Totales del usuario en `moneda` agrupados por tipo."""
+    filas = grupos(db, modelo, usuario_id, desde, hasta, por_tipo=True)
+    return obtener_snapshot().convertir_por_clave(filas, moneda)
+
+
+def _lista_gastos_por_tipo(gastos_por_tipo: Dict[str, float]) -> List[GastoPorTipo]:
+    if not gastos_por_tipo:
+        return []
+    
+    # Calcular total
+    total_gastos = sum(gastos_por_tipo.values())
     
-    # Obtener todas las inversiones del usuario
-    statement_inv = select(Inversion).where(Inversion.usuario_id == user["id"])
-    inversiones = db.exec(statement_inv).all()
-    total_inversiones = sum(inv.cantidad_inversion for inv in inversiones)
+    # Crear lista de resultados con porcentajes
+    resultado = []
+    for tipo, total in gastos_por_tipo.items():
+        porcentaje = (total / total_gastos * 100) if total_gastos > 0 else 0
+        resultado.append(GastoPorTipo(
+            tipo_gasto=tipo,
+            total=total,
+            porcentaje=round(porcentaje, 2)
+        ))
     
-    # Obtener todos los gastos del usuario
-    statement_gasto = select(Gasto).where(Gasto.usuario_id == user["id"])
-    gastos = db.exec(statement_gasto).all()
-    total_gastos = sum(gasto.cantidad_gasto for gasto in gastos)
+    # Ordenar por total descendente
+    resultado.sort(key=lambda x: x.total, reverse=True)
     
+    return resultado
+
+
+def _lista_inversiones_por_tipo(inversiones_por_tipo: Dict[str, float]) -> List[InversionPorTipo]:
+    if not inversiones_por_tipo:
+        return []
+    
+    # Calcular total
+    total_inversiones = sum(inversiones_por_tipo.values())
+    
+    # Crear lista de resultados con porcentajes
+    resultado = []
+    for tipo, total in inversiones_por_tipo.items():
+        porcentaje = (total / total_inversiones * 100) if total_inversiones > 0 else 0
+        resultado.append(InversionPorTipo(
+            tipo_inversion=tipo,
+            total=total,
+            porcentaje=round(porcentaje, 2)
+        ))
+    
+    # Ordenar por total descendente
+    resultado.sort(key=lambda x: x.total, reverse=True)
+    
+    return resultado
+
+
+def _resumen(total_inversiones: float, total_gastos: float, periodo: str, moneda: str) -> ResumenFinanciero:
     # Calcular balance
     balance = total_inversiones - total_gastos
-    
+
     # Calcular porcentaje de ahorro
     if total_inversiones > 0:
         porcentaje_ahorro = (balance / total_inversiones) * 100
     else:
         porcentaje_ahorro = 0.0
-    
+
     return ResumenFinanciero(
         total_inversiones=total_inversiones,
         total_gastos=total_gastos,
         balance=balance,
         porcentaje_ahorro=round(porcentaje_ahorro, 2),
-        periodo="Todo el tiempo"
+        periodo=periodo,
+        moneda=moneda
+    )
+
+
+def _percentiles(texto: str) -> List[float]:
+    try:
+        valores = [float(p) for p in texto.split(",") if p.strip()]
+    except ValueError:
+        valores = []
+    if not valores or any(not 0 <= p <= 100 for p in valores):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="`percentiles` debe ser una lista de números entre 0 y 100 separados por comas"
+        )
+    return valores
+
+
+def _estadisticas_categoria(
+    categoria: str, boceto: Boceto, percentiles: List[float], cubetas: int, mayores: int, con_usuario: bool
+) -> EstadisticasCategoria:
+    return EstadisticasCategoria(
+        categoria=categoria,
+        conteo=boceto.conteo,
+        total=boceto.suma,
+        promedio=boceto.suma / boceto.conteo if boceto.conteo else 0.0,
+        percentiles={f"p{p:g}": boceto.cuantil(p / 100) for p in percentiles},
+        histograma=[CubetaHistograma(desde=d, hasta=h, conteo=n) for d, h, n in boceto.histograma(cubetas)],
+        mayores=[
+            MovimientoMayor(id=m[1], fecha=m[2], cantidad=m[0], usuario_id=m[3] if con_usuario else None)
+            for m in boceto.mayores[:mayores]
+        ]
     )
 
 
+def _estadisticas(
+    bocetos: Dict[str, Boceto], tipo: str, desde: Optional[date], hasta: Optional[date],
+    percentiles: str, cubetas: int, mayores: int, con_usuario: bool = False
+) -> Estadisticas:
+    valores = _percentiles(percentiles)
+    bocetos = {categoria: b for categoria, b in bocetos.items() if b.conteo > 0}
+    general = Boceto()
+    for boceto in bocetos.values():
+        general.sumar(boceto)
+
+    categorias = [
+        _estadisticas_categoria(categoria, boceto, valores, cubetas, mayores, con_usuario)
+        for categoria, boceto in bocetos.items()
+    ]
+    categorias.sort(key=lambda x: x.total, reverse=True)
+
+    if desde is None and hasta is None:
+        periodo = "Todo el tiempo"
+    else:
+        periodo = f"{desde.strftime('%Y-%m') if desde else 'inicio'} / {hasta.strftime('%Y-%m') if hasta else 'hoy'}"
+    return Estadisticas(
+        tipo=tipo,
+        periodo=periodo,
+        precision_relativa=PRECISION_RELATIVA,
+        general=_estadisticas_categoria("*", general, valores, cubetas, mayores, con_usuario) if bocetos else None,
+        categorias=categorias
+    )
+
+
+def _filtro_categoria(tipo: str, categoria: Optional[str]) -> Optional[str]:
+    # Los tipos de gasto se guardan normalizados (ver src/utils/categorias.py)
+    if categoria is None or tipo != "gasto":
+        return categoria
+    return normalizar(categoria)
+
+
+def _periodos_tendencia(meses: int) -> List[tuple]:
+    """(año, mes) de los últimos `meses` meses, del más antiguo al actual."""
+    fecha_actual = date.today()
+    periodos = []
+    for i in reversed(range(meses)):
+        fecha_analisis = fecha_actual - relativedelta(months=i)
+        periodos.append((fecha_analisis.year, fecha_analisis.month))
+    return periodos
+
+
+def _rango_periodos(periodos: List[tuple]):
+    return date(periodos[0][0], periodos[0][1], 1), _rango_mes(*periodos[-1])[1]
+
+
+def _tendencia(filas_inversiones, filas_gastos, periodos: List[tuple], moneda: str) -> List[dict]:
+    """Totales por mes a partir de filas de `grupos` (tipo, moneda, fecha, total)."""
+    snapshot = obtener_snapshot()
+
+    def por_mes(filas):
+        return snapshot.convertir_por_clave(
+            (((f.year, f.month), m, f, c) for _, m, f, c in filas), moneda
+        )
+    
+    inversiones_mes = por_mes(filas_inversiones)
+    gastos_mes = por_mes(filas_gastos)
+    
+    resultado = []
+    for anio, mes in periodos:
+        total_inversiones = inversiones_mes.get((anio, mes), 0.0)
+        total_gastos = gastos_mes.get((anio, mes), 0.0)
+        
+        resultado.append({
+            "mes": mes,
+            "anio": anio,
+            "periodo": f"{mes}/{anio}",
+            "total_inversiones": total_inversiones,
+            "total_gastos": total_gastos,
+            "balance": total_inversiones - total_gastos,
+            "moneda": moneda
+        })
+    
+    return resultado
+
+
+# --- ENDPOINTS ---
+
+@analisis_router.get("/resumen-general", response_model=ResumenFinanciero)
+def get_resumen_general(db: ReadSessionDep, user: UserDep, moneda: MonedaQuery = MONEDA_BASE):
+    """
+    Obtiene un resumen financiero general del usuario:
+    - Total de inversiones
+    - Total de gastos
+    - Balance (inversiones - gastos)
+    - Porcentaje de ahorro
+    Los totales se convierten a `moneda` con el tipo de cambio de cada fecha.
+    """
+    moneda = _moneda_destino(moneda)
+
+    total_inversiones = _total(db, Inversion, user["id"], moneda)
+    total_gastos = _total(db, Gasto, user["id"], moneda)
+
+    return _resumen(total_inversiones, total_gastos, "Todo el tiempo", moneda)
+
+
 @analisis_router.get("/resumen-mensual", response_model=ResumenFinanciero)
 def get_resumen_mensual(
-    db: SessionDep, 
+    db: ReadSessionDep, 
     user: UserDep,
     mes: int = Query(default=None, ge=1, le=12, description="Mes (1-12). Si no se especifica, usa el mes actual"),
-    anio: int = Query(default=None, ge=2000, description="Año. Si no se especifica, usa el año actual")
+    anio: int = Query(default=None, ge=2000, description="Año. Si no se especifica, usa el año actual"),
+    moneda: MonedaQuery = MONEDA_BASE
 ):
     """
     Obtiene un resumen financiero mensual del usuario.
     Si no se especifica mes/año, usa el mes actual.
     """
+    moneda = _moneda_destino(moneda)
     
     # Si no se especifica mes/año, usar el actual
     if mes is None:
@@ -93,230 +347,394 @@ def get_resumen_mensual(
     if anio is None:
         anio = datetime.now().year
     
-    # Calcular el primer y último día del mes
-    primer_dia = date(anio, mes, 1)
-    if mes == 12:
-        ultimo_dia = date(anio + 1, 1, 1)
-    else:
-        ultimo_dia = date(anio, mes + 1, 1)
-    
-    # Obtener inversiones del mes
-    statement_inv = select(Inversion).where(
-        Inversion.usuario_id == user["id"],
-        Inversion.fecha_inversion >= primer_dia,
-        Inversion.fecha_inversion < ultimo_dia
-    )
-    inversiones = db.exec(statement_inv).all()
-    total_inversiones = sum(inv.cantidad_inversion for inv in inversiones)
-    
-    # Obtener gastos del mes
-    statement_gasto = select(Gasto).where(
-        Gasto.usuario_id == user["id"],
-        Gasto.fecha_gasto >= primer_dia,
-        Gasto.fecha_gasto < ultimo_dia
-    )
-    gastos = db.exec(statement_gasto).all()
-    total_gastos = sum(gasto.cantidad_gasto for gasto in gastos)
-    
-    # Calcular balance
-    balance = total_inversiones - total_gastos
+    primer_dia, ultimo_dia = _rango_mes(anio, mes)
     
-    # Calcular porcentaje de ahorro
-    if total_inversiones > 0:
-        porcentaje_ahorro = (balance / total_inversiones) * 100
-    else:
-        porcentaje_ahorro = 0.0
+    total_inversiones = _total(db, Inversion, user["id"], moneda, primer_dia, ultimo_dia)
+    total_gastos = _total(db, Gasto, user["id"], moneda, primer_dia, ultimo_dia)
     
-    return ResumenFinanciero(
-        total_inversiones=total_inversiones,
-        total_gastos=total_gastos,
-        balance=balance,
-        porcentaje_ahorro=round(porcentaje_ahorro, 2),
-        periodo=f"{mes}/{anio}"
-    )
+    return _resumen(total_inversiones, total_gastos, f"{mes}/{anio}", moneda)
 
 
 @analisis_router.get("/gastos-por-tipo", response_model=List[GastoPorTipo])
 def get_gastos_por_tipo(
-    db: SessionDep, 
+    db: ReadSessionDep, 
     user: UserDep,
     mes: int = Query(default=None, ge=1, le=12, description="Filtrar por mes (opcional)"),
-    anio: int = Query(default=None, ge=2000, description="Filtrar por año (opcional)")
+    anio: int = Query(default=None, ge=2000, description="Filtrar por año (opcional)"),
+    moneda: MonedaQuery = MONEDA_BASE
 ):
     """
     Obtiene el total de gastos agrupados por tipo.
     Muestra qué categorías consumen más dinero.
     Opcionalmente se puede filtrar por mes y año.
     """
-    
-    # Construir query base
-    statement = select(Gasto).where(Gasto.usuario_id == user["id"])
+    moneda = _moneda_destino(moneda)
     
     # Aplicar filtros de fecha si se especifican
+    primer_dia = ultimo_dia = None
     if mes is not None and anio is not None:
-        primer_dia = date(anio, mes, 1)
-        if mes == 12:
-            ultimo_dia = date(anio + 1, 1, 1)
-        else:
-            ultimo_dia = date(anio, mes + 1, 1)
-        
-        statement = statement.where(
-            Gasto.fecha_gasto >= primer_dia,
-            Gasto.fecha_gasto < ultimo_dia
-        )
-    
-    # Obtener todos los gastos
-    gastos = db.exec(statement).all()
+        primer_dia, ultimo_dia = _rango_mes(anio, mes)
     
-    if not gastos:
-        return []
+    gastos_por_tipo = _totales_por_tipo(db, Gasto, user["id"], moneda, primer_dia, ultimo_dia)
     
-    # Agrupar por tipo
-    gastos_por_tipo: Dict[str, float] = {}
-    for gasto in gastos:
-        if gasto.tipo_gasto in gastos_por_tipo:
-            gastos_por_tipo[gasto.tipo_gasto] += gasto.cantidad_gasto
-        else:
-            gastos_por_tipo[gasto.tipo_gasto] = gasto.cantidad_gasto
-    
-    # Calcular total
-    total_gastos = sum(gastos_por_tipo.values())
-    
-    # Crear lista de resultados con porcentajes
-    resultado = []
-    for tipo, total in gastos_por_tipo.items():
-        porcentaje = (total / total_gastos * 100) if total_gastos > 0 else 0
-        resultado.append(GastoPorTipo(
-            tipo_gasto=tipo,
-            total=total,
-            porcentaje=round(porcentaje, 2)
-        ))
-    
-    # Ordenar por total descendente
-    resultado.sort(key=lambda x: x.total, reverse=True)
-    
-    return resultado
+    return _lista_gastos_por_tipo(gastos_por_tipo)
 
 
 @analisis_router.get("/inversiones-por-tipo", response_model=List[InversionPorTipo])
 def get_inversiones_por_tipo(
-    db: SessionDep, 
+    db: ReadSessionDep, 
     user: UserDep,
     mes: int = Query(default=None, ge=1, le=12, description="Filtrar por mes (opcional)"),
-    anio: int = Query(default=None, ge=2000, description="Filtrar por año (opcional)")
+    anio: int = Query(default=None, ge=2000, description="Filtrar por año (opcional)"),
+    moneda: MonedaQuery = MONEDA_BASE
 ):
     """
     Obtiene el total de inversiones agrupadas por tipo.
     Muestra de dónde provienen los ingresos.
     Opcionalmente se puede filtrar por mes y año.
     """
-    
-    # Construir query base
-    statement = select(Inversion).where(Inversion.usuario_id == user["id"])
+    moneda = _moneda_destino(moneda)
     
     # Aplicar filtros de fecha si se especifican
+    primer_dia = ultimo_dia = None
     if mes is not None and anio is not None:
-        primer_dia = date(anio, mes, 1)
-        if mes == 12:
-            ultimo_dia = date(anio + 1, 1, 1)
-        else:
-            ultimo_dia = date(anio, mes + 1, 1)
-        
-        statement = statement.where(
-            Inversion.fecha_inversion >= primer_dia,
-            Inversion.fecha_inversion < ultimo_dia
-        )
-    
-    # Obtener todas las inversiones
-    inversiones = db.exec(statement).all()
-    
-    if not inversiones:
-        return []
-    
-    # Agrupar por tipo
-    inversiones_por_tipo: Dict[str, float] = {}
-    for inversion in inversiones:
-        if inversion.tipo_inversion in inversiones_por_tipo:
-            inversiones_por_tipo[inversion.tipo_inversion] += inversion.cantidad_inversion
-        else:
-            inversiones_por_tipo[inversion.tipo_inversion] = inversion.cantidad_inversion
-    
-    # Calcular total
-    total_inversiones = sum(inversiones_por_tipo.values())
-    
-    # Crear lista de resultados con porcentajes
-    resultado = []
-    for tipo, total in inversiones_por_tipo.items():
-        porcentaje = (total / total_inversiones * 100) if total_inversiones > 0 else 0
-        resultado.append(InversionPorTipo(
-            tipo_inversion=tipo,
-            total=total,
-            porcentaje=round(porcentaje, 2)
-        ))
+        primer_dia, ultimo_dia = _rango_mes(anio, mes)
     
-    # Ordenar por total descendente
-    resultado.sort(key=lambda x: x.total, reverse=True)
+    inversiones_por_tipo = _totales_por_tipo(db, Inversion, user["id"], moneda, primer_dia, ultimo_dia)
     
-    return resultado
+    return _lista_inversiones_por_tipo(inversiones_por_tipo)
 
 
 @analisis_router.get("/tendencia-mensual")
 def get_tendencia_mensual(
-    db: SessionDep,
+    db: ReadSessionDep,
     user: UserDep,
-    meses: int = Query(default=6, ge=1, le=24, description="Número de meses hacia atrás")
+    meses: int = Query(default=6, ge=1, le=24, description="Número de meses hacia atrás"),
+    moneda: MonedaQuery = MONEDA_BASE
 ):
     """
     Obtiene la tendencia de ingresos y gastos de los últimos N meses.
     Útil para graficar la evolución financiera.
     """
+    moneda = _moneda_destino(moneda)
     
-    resultado = []
-    fecha_actual = date.today()
+    periodos = _periodos_tendencia(meses)
+    desde, hasta = _rango_periodos(periodos)
     
-    for i in range(meses):
-        # Calcular el mes a analizar (restando meses)
-        fecha_analisis = fecha_actual - relativedelta(months=i)
-        mes = fecha_analisis.month
-        anio = fecha_analisis.year
-        
-        # Primer y último día del mes
-        primer_dia = date(anio, mes, 1)
-        if mes == 12:
-            ultimo_dia = date(anio + 1, 1, 1)
-        else:
-            ultimo_dia = date(anio, mes + 1, 1)
-        
-        # Inversiones del mes
-        statement_inv = select(Inversion).where(
-            Inversion.usuario_id == user["id"],
-            Inversion.fecha_inversion >= primer_dia,
-            Inversion.fecha_inversion < ultimo_dia
+    # Una sola consulta agrupada por tipo de movimiento para todo el rango
+    return _tendencia(
+        grupos(db, Inversion, user["id"], desde, hasta),
+        grupos(db, Gasto, user["id"], desde, hasta),
+        periodos,
+        moneda
+    )
+
+
+@analisis_router.get("/rango", response_model=ResumenFinanciero)
+def get_resumen_rango(
+    db: ReadSessionDep,
+    user: UserDep,
+    desde: date = Query(description="Fecha inicial (inclusive)"),
+    hasta: date = Query(description="Fecha final (inclusive)"),
+    moneda: MonedaQuery = MONEDA_BASE
+):
+    """
+    Resumen financiero de cualquier rango de fechas.
+    En la moneda base se resuelve en O(1) con la serie diaria de saldos acumulados del
+    usuario; en otra moneda se suman los movimientos del rango con el tipo de cambio de cada fecha.
+    """
+    moneda = _moneda_destino(moneda)
+    if hasta < desde:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="`hasta` debe ser posterior a `desde`")
+    periodo = f"{desde.isoformat()} / {hasta.isoformat()}"
+
+    if moneda != MONEDA_BASE:
+        fin = hasta + timedelta(days=1)
+        total_inversiones = _total(db, Inversion, user["id"], moneda, desde, fin, por_dia=True)
+        total_gastos = _total(db, Gasto, user["id"], moneda, desde, fin, por_dia=True)
+        return _resumen(total_inversiones, total_gastos, periodo, moneda)
+
+    serie = obtener_serie(db, user["id"])
+    total_inversiones, total_gastos = serie.rango(desde, hasta)
+
+    return _resumen(total_inversiones, total_gastos, periodo, serie.moneda)
+
+
+@analisis_router.get("/saldo-acumulado", response_model=List[PuntoSaldo])
+def get_saldo_acumulado(
+    db: ReadSessionDep,
+    user: UserDep,
+    desde: Optional[date] = Query(default=None, description="Por defecto, el primer movimiento"),
+    hasta: Optional[date] = Query(default=None, description="Por defecto, hoy"),
+    paso: Literal["dia", "semana", "mes"] = Query(default="dia", description="Un punto por día, semana o fin de mes")
+):
+    """
+    Serie para graficar el saldo corriente y el patrimonio neto del usuario,
+    leída de la misma serie diaria de saldos acumulados que /analisis/rango.
+    """
+    serie = obtener_serie(db, user["id"])
+    hasta = hasta or date.today()
+    desde = desde or serie.fecha_inicio or hasta
+    if hasta < desde:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="`hasta` debe ser posterior a `desde`")
+
+    fechas = []
+    fecha = desde
+    while fecha < hasta and len(fechas) <= MAX_PUNTOS_SALDO:
+        if paso == "mes":
+            fecha = min(_rango_mes(fecha.year, fecha.month)[1] - timedelta(days=1), hasta)
+        fechas.append(fecha)
+        fecha += timedelta(days=7 if paso == "semana" else 1)
+    if not fechas or fechas[-1] != hasta:
+        fechas.append(hasta)
+    if len(fechas) > MAX_PUNTOS_SALDO:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Demasiados puntos (máximo {MAX_PUNTOS_SALDO}); usa un paso mayor o un rango menor"
         )
-        inversiones = db.exec(statement_inv).all()
-        total_inversiones = sum(inv.cantidad_inversion for inv in inversiones)
-        
-        # Gastos del mes
-        statement_gasto = select(Gasto).where(
-            Gasto.usuario_id == user["id"],
-            Gasto.fecha_gasto >= primer_dia,
-            Gasto.fecha_gasto < ultimo_dia
+
+    inv_inicial, gastos_inicial = serie.acumulado(desde - timedelta(days=1))
+    resultado = []
+    for fecha in fechas:
+        inversiones, gastos = serie.acumulado(fecha)
+        resultado.append(PuntoSaldo(
+            fecha=fecha,
+            inversiones_acumuladas=inversiones,
+            gastos_acumulados=gastos,
+            saldo=inversiones - gastos,
+            saldo_periodo=(inversiones - inv_inicial) - (gastos - gastos_inicial)
+        ))
+
+    return resultado
+
+
+
+def _en_rango(filas, desde: Optional[date], hasta: Optional[date]) -> list:
+    """Filas de `grupos` con fecha en [desde, hasta) (sin límite si es None)."""
+    return [
+        fila for fila in filas
+        if (desde is None or fila[2] >= desde) and (hasta is None or fila[2] < hasta)
+    ]
+
+
+@analisis_router.get("/dashboard", response_model=Dashboard, response_model_exclude_none=True)
+def get_dashboard(
+    db: ReadSessionDep,
+    user: UserDep,
+    campos: Optional[str] = Query(default=None, description=f"Bloques separados por comas (por defecto todos): {', '.join(CAMPOS_DASHBOARD)}"),
+    mes: int = Query(default=None, ge=1, le=12, description="Mes de resumen_mensual y, junto con `anio`, filtro de los bloques por tipo"),
+    anio: int = Query(default=None, ge=2000, description="Año (ver `mes`)"),
+    meses: int = Query(default=6, ge=1, le=24, description="Meses de tendencia_mensual"),
+    moneda: MonedaQuery = MONEDA_BASE
+):
+    """
+    Los bloques de /analisis/resumen-general, /resumen-mensual, /gastos-por-tipo,
+    /inversiones-por-tipo y /tendencia-mensual en una sola respuesta, con los mismos
+    parámetros y resultados que cada endpoint.
+    Se hace una consulta agrupada por (tipo, moneda, fecha) para inversiones y otra para
+    gastos, solo del rango que cubren los bloques pedidos, en paralelo y cada una en su
+    propia conexión; todos los bloques se calculan en memoria a partir de ellas.
+    """
+    moneda = _moneda_destino(moneda)
+    pedidos = CAMPOS_DASHBOARD if campos is None else [c.strip() for c in campos.split(",") if c.strip()]
+    desconocidos = [c for c in pedidos if c not in CAMPOS_DASHBOARD]
+    if desconocidos or not pedidos:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Campos inválidos: {', '.join(desconocidos) or '(ninguno)'}. Válidos: {', '.join(CAMPOS_DASHBOARD)}"
         )
-        gastos = db.exec(statement_gasto).all()
-        total_gastos = sum(gasto.cantidad_gasto for gasto in gastos)
-        
-        balance = total_inversiones - total_gastos
-        
-        resultado.append({
-            "mes": mes,
-            "anio": anio,
-            "periodo": f"{mes}/{anio}",
-            "total_inversiones": total_inversiones,
-            "total_gastos": total_gastos,
-            "balance": balance
-        })
-    
-    # Invertir para que el más antiguo esté primero
-    resultado.reverse()
-    
-    return resultado
\ No newline at end of file
+
+    mes_actual, anio_actual = mes or datetime.now().month, anio or datetime.now().year
+    rango_mensual = _rango_mes(anio_actual, mes_actual)
+    rango_por_tipo = _rango_mes(anio, mes) if mes is not None and anio is not None else (None, None)
+    periodos = _periodos_tendencia(meses)
+
+    # Rango de fechas y movimientos que necesita cada bloque
+    necesita = {
+        "resumen_general": ((None, None), (Inversion, Gasto)),
+        "resumen_mensual": (rango_mensual, (Inversion, Gasto)),
+        "gastos_por_tipo": (rango_por_tipo, (Gasto,)),
+        "inversiones_por_tipo": (rango_por_tipo, (Inversion,)),
+        "tendencia_mensual": (_rango_periodos(periodos), (Inversion, Gasto)),
+    }
+    modelos = [m for m in (Inversion, Gasto) if any(m in necesita[c][1] for c in pedidos)]
+    inicios = [necesita[c][0][0] for c in pedidos]
+    finales = [necesita[c][0][1] for c in pedidos]
+    desde = None if None in inicios else min(inicios)
+    hasta = None if None in finales else max(finales)
+
+    # Datos compartidos: una consulta por tipo de movimiento, en paralelo
+    consultas = [
+        (lambda sesion, modelo=modelo: grupos(sesion, modelo, user["id"], desde, hasta, por_tipo=True))
+        for modelo in modelos
+    ]
+    filas = dict(zip(modelos, en_paralelo(db, *consultas)))
+    inversiones, gastos = filas.get(Inversion, []), filas.get(Gasto, [])
+
+    snapshot = obtener_snapshot()
+
+    def total(filas_modelo, rango) -> float:
+        filas_rango = _en_rango(filas_modelo, *rango)
+        return snapshot.convertir_por_clave(((None, m, f, c) for _, m, f, c in filas_rango), moneda).get(None, 0.0)
+
+    resultado = Dashboard()
+    if "resumen_general" in pedidos:
+        resultado.resumen_general = _resumen(total(inversiones, (None, None)), total(gastos, (None, None)), "Todo el tiempo", moneda)
+    if "resumen_mensual" in pedidos:
+        resultado.resumen_mensual = _resumen(
+            total(inversiones, rango_mensual), total(gastos, rango_mensual), f"{mes_actual}/{anio_actual}", moneda
+        )
+    if "gastos_por_tipo" in pedidos:
+        resultado.gastos_por_tipo = _lista_gastos_por_tipo(
+            snapshot.convertir_por_clave(_en_rango(gastos, *rango_por_tipo), moneda)
+        )
+    if "inversiones_por_tipo" in pedidos:
+        resultado.inversiones_por_tipo = _lista_inversiones_por_tipo(
+            snapshot.convertir_por_clave(_en_rango(inversiones, *rango_por_tipo), moneda)
+        )
+    if "tendencia_mensual" in pedidos:
+        resultado.tendencia_mensual = _tendencia(inversiones, gastos, periodos, moneda)
+    return resultado
+
+@analisis_router.get("/anomalias", response_model=List[AnomaliaRead])
+def get_anomalias(
+    db: ReadSessionDep,
+    user: UserDep,
+    desde: Optional[date] = Query(default=None, description="Fecha inicial del gasto (inclusive)"),
+    hasta: Optional[date] = Query(default=None, description="Fecha final del gasto (inclusive)"),
+    tipo_gasto: Optional[str] = Query(default=None, description="Solo un tipo de gasto"),
+    limite: int = Query(default=100, ge=1, le=1000)
+):
+    """
+    Gastos inusuales del usuario, del más reciente al más antiguo, con la mediana y la
+    desviación de sus gastos anteriores del mismo tipo (en la moneda base).
+    Los calcula el job detectar_anomalias: los gastos posteriores a su última
+    ejecución todavía no aparecen.
+    """
+    c = AnomaliaGasto.__table__.c
+    condiciones = [c.usuario_id == user["id"]]
+    if desde is not None:
+        condiciones.append(c.fecha_gasto >= desde)
+    if hasta is not None:
+        condiciones.append(c.fecha_gasto <= hasta)
+    if tipo_gasto is not None:
+        condiciones.append(c.tipo_gasto == tipo_gasto)
+
+    statement = (
+        consulta(AnomaliaGasto, AnomaliaRead, *condiciones)
+        .order_by(c.fecha_gasto.desc(), c.gasto_id.desc())
+        .limit(limite)
+    )
+    return respuesta_filas(AnomaliaRead, ejecutar(db, AnomaliaGasto, statement))
+
+
+@analisis_router.get("/estadisticas", response_model=Estadisticas, response_model_exclude_none=True)
+def get_estadisticas(
+    db: ReadSessionDep,
+    user: UserDep,
+    tipo: Literal["gasto", "inversion"] = Query(default="gasto"),
+    desde: Optional[date] = Query(default=None, description="Desde el mes de esta fecha (inclusive)"),
+    hasta: Optional[date] = Query(default=None, description="Hasta el mes de esta fecha (inclusive)"),
+    categoria: Optional[str] = Query(default=None, description="Solo una categoría (tipo de gasto o de inversión)"),
+    percentiles: str = Query(default="50,90,99", description="Percentiles separados por comas"),
+    cubetas: int = Query(default=20, ge=1, le=100, description="Intervalos del histograma (escala logarítmica)"),
+    mayores: int = Query(default=5, ge=0, le=MAYORES_K, description="Movimientos más grandes por categoría")
+):
+    """
+    Percentiles, histograma y movimientos más grandes de las cantidades del usuario, por
+    categoría y en total, en la moneda base. Salen de combinar los bocetos de cuantiles
+    mensuales del usuario (ver src/utils/distribucion.py): los percentiles tienen un error
+    relativo de a lo sumo `precision_relativa` y el periodo se toma en meses completos.
+    """
+    if desde is not None and hasta is not None and hasta < desde:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="`hasta` debe ser posterior a `desde`")
+
+    bocetos = bocetos_usuario(db, user["id"], tipo, desde, hasta, _filtro_categoria(tipo, categoria))
+    return _estadisticas(bocetos, tipo, desde, hasta, percentiles, cubetas, mayores)
+
+
+@analisis_router.get("/estados", response_model=List[str])
+def get_estados(user: UserDep):
+    """Periodos ('aaaa-mm') con estado de cuenta mensual generado, del más reciente al más antiguo."""
+    return periodos_usuario(user["id"])
+
+
+@analisis_router.get("/estados/{anio}/{mes}")
+def descargar_estado(
+    anio: int,
+    mes: int,
+    user: UserDep,
+    formato: Literal["csv", "html"] = Query(default="html", description="`html` se puede imprimir o guardar como PDF")
+):
+    """
+    Descarga el estado de cuenta mensual del usuario (mismos totales que
+    /analisis/resumen-mensual y /analisis/gastos-por-tipo, en la moneda base).
+    Los genera el job generar_estados a inicio de cada mes.
+    """
+    ruta = archivo_estado(user["id"], anio, mes, formato) if 1 <= mes <= 12 else None
+    if ruta is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Estado de cuenta no encontrado")
+    return FileResponse(
+        ruta,
+        media_type=FORMATOS[formato],
+        filename=f"estado_{anio:04d}-{mes:02d}.{formato}",
+        content_disposition_type="attachment" if formato == "csv" else "inline"
+    )
+
+# --- ENDPOINTS DE ADMINISTRACIÓN (TODOS LOS USUARIOS) ---
+# Cada shard calcula sus grupos (moneda, fecha) en paralelo y aquí se suman y convierten.
+
+@analisis_router.get("/global/resumen-general", response_model=ResumenFinanciero)
+def get_resumen_global(is_admin: AdminDep, moneda: MonedaQuery = MONEDA_BASE):
+    """Resumen financiero de todos los usuarios. Requiere rol de administrador."""
+    moneda = _moneda_destino(moneda)
+    snapshot = obtener_snapshot()
+
+    partes = en_todos(lambda db: (grupos(db, Inversion, None), grupos(db, Gasto, None)))
+    total_inversiones = snapshot.convertir_por_clave((f for inv, _ in partes for f in inv), moneda).get(None, 0.0)
+    total_gastos = snapshot.convertir_por_clave((f for _, gas in partes for f in gas), moneda).get(None, 0.0)
+
+    return _resumen(total_inversiones, total_gastos, "Todo el tiempo (todos los usuarios)", moneda)
+
+
+@analisis_router.get("/global/gastos-por-tipo", response_model=List[GastoPorTipo])
+def get_gastos_por_tipo_global(
+    is_admin: AdminDep,
+    mes: int = Query(default=None, ge=1, le=12, description="Filtrar por mes (opcional)"),
+    anio: int = Query(default=None, ge=2000, description="Filtrar por año (opcional)"),
+    moneda: MonedaQuery = MONEDA_BASE
+):
+    """Gastos de todos los usuarios agrupados por tipo. Requiere rol de administrador."""
+    moneda = _moneda_destino(moneda)
+
+    primer_dia = ultimo_dia = None
+    if mes is not None and anio is not None:
+        primer_dia, ultimo_dia = _rango_mes(anio, mes)
+
+    partes = en_todos(lambda db: grupos(db, Gasto, None, primer_dia, ultimo_dia, por_tipo=True))
+    gastos_por_tipo = obtener_snapshot().convertir_por_clave((f for parte in partes for f in parte), moneda)
+
+    return _lista_gastos_por_tipo(gastos_por_tipo)
+
+
+@analisis_router.get("/global/estadisticas", response_model=Estadisticas, response_model_exclude_none=True)
+def get_estadisticas_global(
+    is_admin: AdminDep,
+    tipo: Literal["gasto", "inversion"] = Query(default="gasto"),
+    desde: Optional[date] = Query(default=None, description="Desde el mes de esta fecha (inclusive)"),
+    hasta: Optional[date] = Query(default=None, description="Hasta el mes de esta fecha (inclusive)"),
+    categoria: Optional[str] = Query(default=None, description="Solo una categoría (tipo de gasto o de inversión)"),
+    percentiles: str = Query(default="50,90,99", description="Percentiles separados por comas"),
+    cubetas: int = Query(default=20, ge=1, le=100, description="Intervalos del histograma (escala logarítmica)"),
+    mayores: int = Query(default=5, ge=0, le=MAYORES_K, description="Movimientos más grandes por categoría")
+):
+    """
+    Como /analisis/estadisticas, pero de todos los usuarios. Cada shard combina los bocetos
+    de sus usuarios (construye antes los que falten) y aquí se suman. Requiere rol de administrador.
+    """
+    if desde is not None and hasta is not None and hasta < desde:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="`hasta` debe ser posterior a `desde`")
+
+    filtro = _filtro_categoria(tipo, categoria)
+    bocetos = combinar_shards(en_todos(lambda db: bocetos_shard(db, tipo, desde, hasta, filtro)))
+    return _estadisticas(bocetos, tipo, desde, hasta, percentiles, cubetas, mayores, con_usuario=True)
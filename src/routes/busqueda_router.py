@@ -0,0 +1,150 @@
+import re
+from datetime import date
+from typing import Annotated, List, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from pydantic import BaseModel
+from sqlalchemy import text
+from src.routes.db_session import ReadSessionDep
+from src.dependencies import decode_token
+from src.config.busqueda import FTS_TABLA, TABLAS_INDEXADAS
+
+busqueda_router = APIRouter(prefix="/buscar", tags=["Búsqueda"])
+
+# --- DEPENDENCIAS DE SEGURIDAD ---
+UserDep = Annotated[dict, Depends(decode_token)]
+
+MAX_TERMINOS = 10
+
+# tabla -> (columna de tipo, columna de cantidad, columna de fecha)
+_COLUMNAS = {
+    "gasto": ("tipo_gasto", "cantidad_gasto", "fecha_gasto"),
+    "inversion": ("tipo_inversion", "cantidad_inversion", "fecha_inversion"),
+}
+
+
+# --- MODELOS DE RESPUESTA ---
+
+class ResultadoBusqueda(BaseModel):
+    tipo: str
+    id: int
+    categoria: str
+    cantidad: float
+    fecha: date
+    descripcion: Optional[str]
+    moneda: str
+    relevancia: float
+
+class PaginaBusqueda(BaseModel):
+    q: str
+    pagina: int
+    por_pagina: int
+    hay_mas: bool
+    resultados: List[ResultadoBusqueda]
+
+
+# --- CONSULTAS POR MOTOR ---
+
+def _filtros_fecha(alias: str, columna_fecha: str, desde: Optional[date], hasta: Optional[date]) -> str:
+    filtros = ""
+    if desde is not None:
+        filtros += f" AND {alias}{columna_fecha} >= :desde"
+    if hasta is not None:
+        filtros += f" AND {alias}{columna_fecha} <= :hasta"
+    return filtros
+
+
+def _select_sqlite(tabla: str, desde, hasta) -> str:
+    tipo, cantidad, fecha = _COLUMNAS[tabla]
+    sufijo = TABLAS_INDEXADAS[tabla][0]
+    return (
+        f"SELECT '{tabla}' AS tipo, m.id AS id, m.{tipo} AS categoria, m.{cantidad} AS cantidad, "
+        f"m.{fecha} AS fecha, m.descripcion AS descripcion, m.moneda AS moneda, "
+        f"-bm25({FTS_TABLA}, 1.0, 0.0) AS relevancia "
+        f"FROM {FTS_TABLA} JOIN {tabla} m ON m.id = {FTS_TABLA}.rowid / 2 "
+        f"WHERE {FTS_TABLA} MATCH :consulta AND {FTS_TABLA}.rowid % 2 = {sufijo} "
+        f"AND m.usuario_id = :usuario_id" + _filtros_fecha("m.", fecha, desde, hasta)
+    )
+
+
+def _select_mysql(tabla: str, desde, hasta) -> str:
+    tipo, cantidad, fecha = _COLUMNAS[tabla]
+    match = "MATCH(descripcion) AGAINST (:consulta IN BOOLEAN MODE)"
+    return (
+        f"SELECT '{tabla}' AS tipo, id, {tipo} AS categoria, {cantidad} AS cantidad, "
+        f"{fecha} AS fecha, descripcion, moneda, {match} AS relevancia, "
+        f"ROW_NUMBER() OVER (ORDER BY {match} DESC, {fecha} DESC, id DESC) AS puesto "
+        f"FROM {tabla} WHERE usuario_id = :usuario_id AND {match}" + _filtros_fecha("", fecha, desde, hasta)
+    )
+
+
+# Orden de los resultados de cada motor. En SQLite todas las puntuaciones salen de la
+# misma tabla FTS5 y se comparan entre sí. En MySQL cada índice FULLTEXT puntúa con
+# las estadísticas de su tabla: se ordena cada tabla por separado y se intercalan por
+# puesto (el 1.º gasto, la 1.ª inversión, el 2.º gasto...).
+_ORDEN = {
+    "sqlite": "relevancia DESC, fecha DESC, id DESC",
+    "mysql": "puesto, fecha DESC, id DESC",
+}
+
+
+def _consulta(dialecto: str, terminos: List[str], usuario_id: int):
+    """Traduce los términos a la sintaxis del motor; cada término se busca como prefijo."""
+    if dialecto == "sqlite":
+        prefijos = " ".join(f'"{t}"*' for t in terminos)
+        return _select_sqlite, f'usuario : "{usuario_id}" AND descripcion : ({prefijos})'
+    if dialecto == "mysql":
+        return _select_mysql, " ".join(f"+{t}*" for t in terminos)
+    raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail="Búsqueda no disponible para esta base de datos")
+
+
+def _sql(dialecto: str, select_tabla, tablas: List[str], desde, hasta) -> str:
+    return (
+        "SELECT * FROM (" + " UNION ALL ".join(select_tabla(t, desde, hasta) for t in tablas) + ") AS r "
+        f"ORDER BY {_ORDEN[dialecto]} LIMIT :limite OFFSET :offset"
+    )
+
+
+# --- ENDPOINT ---
+
+@busqueda_router.get("/", response_model=PaginaBusqueda)
+def buscar_movimientos(
+    db: ReadSessionDep,
+    user: UserDep,
+    q: str = Query(min_length=1, max_length=200, description="Texto a buscar en la descripción (coincidencia por prefijo)"),
+    tipo: Optional[Literal["gasto", "inversion"]] = Query(default=None, description="Limitar a gastos o inversiones"),
+    desde: Optional[date] = Query(default=None, description="Fecha mínima (inclusive)"),
+    hasta: Optional[date] = Query(default=None, description="Fecha máxima (inclusive)"),
+    pagina: int = Query(default=1, ge=1),
+    por_pagina: int = Query(default=20, ge=1, le=100)
+):
+    """
+    Busca gastos e inversiones del usuario por su descripción usando el índice de texto
+    (FULLTEXT en MySQL, FTS5 en SQLite). Los resultados se ordenan por relevancia; en MySQL,
+    gastos e inversiones se intercalan según su puesto en cada tabla.
+    """
+    terminos = re.findall(r"\w+", q.lower())[:MAX_TERMINOS]
+    if not terminos:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="La búsqueda no contiene palabras")
+
+    dialecto = db.get_bind().dialect.name
+    select_tabla, consulta = _consulta(dialecto, terminos, user["id"])
+    tablas = [tipo] if tipo else list(_COLUMNAS)
+    sql = _sql(dialecto, select_tabla, tablas, desde, hasta)
+    params = {
+        "consulta": consulta,
+        "usuario_id": user["id"],
+        "desde": desde,
+        "hasta": hasta,
+        # Se pide una fila extra para saber si hay más páginas
+        "limite": por_pagina + 1,
+        "offset": (pagina - 1) * por_pagina,
+    }
+    filas = db.exec(text(sql), params=params).mappings().all()
+
+    return PaginaBusqueda(
+        q=q,
+        pagina=pagina,
+        por_pagina=por_pagina,
+        hay_mas=len(filas) > por_pagina,
+        resultados=[ResultadoBusqueda(**fila) for fila in filas[:por_pagina]]
+    )
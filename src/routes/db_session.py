@@ -1,11 +1,118 @@
+import os
+import time
+from itertools import cycle
 from typing import Annotated, Generator
-from fastapi import Depends
+from fastapi import Depends, HTTPException, Request, status
 from sqlmodel import Session
-from src.config.db import engine
+from src.config.db import engine, replica_engines
+from src.dependencies import usuario_opcional
+from src.models.shard import BORRANDO, MIGRANDO
+from src.utils.shards import N_SHARDS, SHARD_MAPA_TTL, sesion, ubicacion
 
-def get_db() -> Generator[Session, None, None]:
-    with Session(engine) as session: # <-- Nombre de variable local diferente
+# Tras escribir, un cliente sigue leyendo del primario durante este tiempo
+# para ver sus propios cambios aunque la réplica vaya atrasada.
+REPLICA_LAG_SEGUNDOS = float(os.getenv("REPLICA_LAG_SEGUNDOS", "5"))
+
+# Cabecera para forzar la lectura desde el primario
+HEADER_LEER_PRIMARIO = "x-leer-primario"
+
+# Instante (epoch) hasta el que el cliente lee del primario tras una escritura. Lo lleva
+# el propio cliente (cookie, o la cabecera de la respuesta reenviada en las siguientes
+# peticiones), así que vale aunque la lectura la atienda otro worker u otro servidor.
+COOKIE_PRIMARIO_HASTA = "leer_primario_hasta"
+HEADER_PRIMARIO_HASTA = "x-leer-primario-hasta"
+
+# Cabecera con la que un admin elige el shard en las rutas por id (los id son por shard)
+HEADER_SHARD = "x-shard"
+
+_METODOS_LECTURA = {"GET", "HEAD", "OPTIONS"}
+
+_replicas = cycle(replica_engines)
+
+
+def _primario_hasta(request: Request) -> float:
+    instante = 0.0
+    for valor in (request.headers.get(HEADER_PRIMARIO_HASTA), request.cookies.get(COOKIE_PRIMARIO_HASTA)):
+        try:
+            instante = max(instante, float(valor))
+        except (TypeError, ValueError):
+            pass
+    return instante
+
+
+def _leer_del_primario(request: Request) -> bool:
+    if not replica_engines or request.headers.get(HEADER_LEER_PRIMARIO):
+        return True
+    return time.time() < _primario_hasta(request)
+
+
+class MiddlewareEscrituras:
+    """
+    Middleware ASGI: la respuesta de cada escritura lleva el instante hasta el que ese
+    cliente debe leer del primario (la ventana cuenta desde el final de la escritura).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in _METODOS_LECTURA or not replica_engines:
+            return await self.app(scope, receive, send)
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                hasta = f"{time.time() + REPLICA_LAG_SEGUNDOS:.3f}".encode()
+                cookie = b"%s=%s; Max-Age=%d; Path=/; HttpOnly; SameSite=Lax" % (
+                    COOKIE_PRIMARIO_HASTA.encode(), hasta, max(1, int(REPLICA_LAG_SEGUNDOS))
+                )
+                mensaje.setdefault("headers", []).extend([
+                    (HEADER_PRIMARIO_HASTA.encode(), hasta),
+                    (b"set-cookie", cookie),
+                ])
+            await send(mensaje)
+
+        await self.app(scope, receive, enviar)
+
+
+def _shard(request: Request, escritura: bool) -> int:
+    """Shard del usuario del token; las peticiones sin token solo usan la base principal."""
+    usuario = usuario_opcional(request.headers.get("authorization"))
+    if usuario is None:
+        return 0
+    if usuario["id"] == 0:
+        try:
+            shard = int(request.headers.get(HEADER_SHARD, "0"))
+        except ValueError:
+            shard = -1
+        if not 0 <= shard < N_SHARDS:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Shard inválido (0-{N_SHARDS - 1})")
+        return shard
+
+    shard, estado = ubicacion(usuario["id"])
+    if escritura and estado == BORRANDO:
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="La cuenta se está eliminando")
+    if escritura and estado == MIGRANDO:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Tus datos se están moviendo de servidor, reintenta en unos segundos",
+            headers={"Retry-After": str(max(1, int(SHARD_MAPA_TTL)))}
+        )
+    return shard
+
+
+def get_db(request: Request) -> Generator[Session, None, None]:
+    escritura = request.method not in _METODOS_LECTURA
+    shard = _shard(request, escritura)
+    with sesion(shard) as session: # <-- Nombre de variable local diferente
         yield session # <-- Retornamos la variable local
 
 
-SessionDep = Annotated[Session, Depends(get_db)]
\ No newline at end of file
+def get_read_db(request: Request) -> Generator[Session, None, None]:
+    """Sesión para rutas de solo lectura: usa una réplica salvo que el cliente acabe de escribir."""
+    lectura_engine = engine if _leer_del_primario(request) else next(_replicas)
+    with sesion(_shard(request, escritura=False), principal=lectura_engine) as session:
+        yield session
+
+
+SessionDep = Annotated[Session, Depends(get_db)]
+ReadSessionDep = Annotated[Session, Depends(get_read_db)]
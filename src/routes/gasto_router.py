@@ -1,9 +1,12 @@
 from typing import Annotated, List
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import select
-from src.routes.db_session import SessionDep
-from src.models.gasto import Gasto, GastoCreateIn, GastoUpdateIn, GastoRead
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from src.routes.db_session import SessionDep, ReadSessionDep
+from src.models.gasto import Gasto, GastoArchivo, GastoCreateIn, GastoUpdateIn, GastoRead
 from src.dependencies import decode_token # Para obtener el ID del usuario
+from src.config.tipo_cambio import normalizar_moneda
+from src.utils.categorias import categorizar_gasto
+from src.utils.lectura import leer_filas
+from src.utils.respuestas import respuesta_filas
 
 gasto_router = APIRouter(prefix="/gastos", tags=["Gastos"])
 
@@ -11,24 +14,39 @@ gasto_router = APIRouter(prefix="/gastos", tags=["Gastos"])
 # Usa decode_token para obtener el usuario autenticado
 UserDep = Annotated[dict, Depends(decode_token)]
 
+
+def _validar_moneda(moneda: str) -> str:
+    """Normaliza el código de moneda o responde 400 si no hay tipo de cambio para él."""
+    try:
+        return normalizar_moneda(moneda)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+def _rechazar_si_archivado(db, gasto_id: int, user: dict) -> None:
+    """Los movimientos archivados son de solo lectura: 409 en vez de 404 para su dueño."""
+    archivo = db.get(GastoArchivo, gasto_id)
+    if archivo and (archivo.usuario_id == user["id"] or user["id"] == 0):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="El gasto está archivado y es de solo lectura")
+
 # --- RUTAS DE LECTURA (GET) ---
 
 @gasto_router.get("/", response_model=List[GastoRead])
-def get_gastos(db: SessionDep, user: UserDep):
+def get_gastos(
+    db: ReadSessionDep,
+    user: UserDep,
+    incluir_archivo: bool = Query(default=False, description="Incluir también los movimientos archivados")
+):
     """Obtiene todos los gastos del usuario autenticado."""
-    # Filtrar por el ID del usuario
-    statement = select(Gasto).where(Gasto.usuario_id == user["id"])
-    gastos = db.exec(statement).all()
-    
-    if not gastos and user["id"] != 0: # Si no hay gastos y no es el Admin
-        return []
+    # Solo las columnas de GastoRead, leídas sin ORM y codificadas sin validar fila por fila
+    tablas = [Gasto, GastoArchivo] if incluir_archivo else [Gasto]
+    gastos = leer_filas(db, GastoRead, tablas, lambda c: c.usuario_id == user["id"])
 
-    return gastos
+    return respuesta_filas(GastoRead, gastos)
 
 @gasto_router.get("/{gasto_id}", response_model=GastoRead)
 def get_gasto_by_id(gasto_id: int, db: SessionDep, user: UserDep):
     """Obtiene un gasto específico del usuario autenticado por ID."""
-    gasto = db.get(Gasto, gasto_id)
+    gasto = db.get(Gasto, gasto_id) or db.get(GastoArchivo, gasto_id)
     
     if not gasto:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Gasto no encontrado")
@@ -45,12 +63,17 @@ def get_gasto_by_id(gasto_id: int, db: SessionDep, user: UserDep):
 def create_gasto(gasto_in: GastoCreateIn, db: SessionDep, user: UserDep):
     """Crea un nuevo gasto para el usuario autenticado."""
     
+    gasto_in.moneda = _validar_moneda(gasto_in.moneda)
+
     # Crea la instancia del modelo de DB
     db_gasto = Gasto.model_validate(gasto_in)
     
     # Asigna el usuario_id del usuario autenticado
     db_gasto.usuario_id = user["id"]
     
+    # Tipo normalizado (o el que asignen las reglas de categoría)
+    categorizar_gasto(db_gasto)
+    
     db.add(db_gasto)
     db.commit()
     db.refresh(db_gasto)
@@ -65,6 +88,7 @@ def update_gasto(gasto_id: int, gasto_in: GastoUpdateIn, db: SessionDep, user: U
     db_gasto = db.get(Gasto, gasto_id)
     
     if not db_gasto:
+        _rechazar_si_archivado(db, gasto_id, user)
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Gasto no encontrado")
 
     # Seguridad: Asegurar que el gasto pertenezca al usuario autenticado (a menos que sea Admin)
@@ -73,10 +97,14 @@ def update_gasto(gasto_id: int, gasto_in: GastoUpdateIn, db: SessionDep, user: U
         
     # ✅ CORRECCIÓN: Actualizar los campos correctamente
     update_data = gasto_in.model_dump(exclude_unset=True)
+    if update_data.get("moneda") is not None:
+        update_data["moneda"] = _validar_moneda(update_data["moneda"])
     
     # Actualizar cada campo individualmente
     for key, value in update_data.items():
         setattr(db_gasto, key, value)
+    if "tipo_gasto" in update_data or "descripcion" in update_data:
+        categorizar_gasto(db_gasto)
     
     db.add(db_gasto)
     db.commit()
@@ -92,6 +120,7 @@ def delete_gasto(gasto_id: int, db: SessionDep, user: UserDep):
     db_gasto = db.get(Gasto, gasto_id)
     
     if not db_gasto:
+        _rechazar_si_archivado(db, gasto_id, user)
         # Se devuelve 204 incluso si no se encuentra para mantener la idempotencia.
         return 
     
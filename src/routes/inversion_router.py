@@ -1,9 +1,11 @@
 from typing import Annotated, List
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import select
-from src.routes.db_session import SessionDep
-from src.models.inversion import Inversion, InversionCreateIn, InversionUpdateIn, InversionRead
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from src.routes.db_session import SessionDep, ReadSessionDep
+from src.models.inversion import Inversion, InversionArchivo, InversionCreateIn, InversionUpdateIn, InversionRead
 from src.dependencies import decode_token # Para obtener el ID del usuario
+from src.config.tipo_cambio import normalizar_moneda
+from src.utils.lectura import leer_filas
+from src.utils.respuestas import respuesta_filas
 
 inversion_router = APIRouter(prefix="/inversiones", tags=["Inversiones"])
 
@@ -11,24 +13,39 @@ inversion_router = APIRouter(prefix="/inversiones", tags=["Inversiones"])
 # Usa decode_token para obtener el usuario autenticado
 UserDep = Annotated[dict, Depends(decode_token)]
 
+
+def _validar_moneda(moneda: str) -> str:
+    """Normaliza el código de moneda o responde 400 si no hay tipo de cambio para él."""
+    try:
+        return normalizar_moneda(moneda)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+def _rechazar_si_archivado(db, inversion_id: int, user: dict) -> None:
+    """Los movimientos archivados son de solo lectura: 409 en vez de 404 para su dueño."""
+    archivo = db.get(InversionArchivo, inversion_id)
+    if archivo and (archivo.usuario_id == user["id"] or user["id"] == 0):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="La inversión está archivada y es de solo lectura")
+
 # --- RUTAS DE LECTURA (GET) ---
 
 @inversion_router.get("/", response_model=List[InversionRead])
-def get_inversiones(db: SessionDep, user: UserDep):
+def get_inversiones(
+    db: ReadSessionDep,
+    user: UserDep,
+    incluir_archivo: bool = Query(default=False, description="Incluir también los movimientos archivados")
+):
     """Obtiene todas las inversiones del usuario autenticado."""
-    # Filtrar por el ID del usuario
-    statement = select(Inversion).where(Inversion.usuario_id == user["id"])
-    inversiones = db.exec(statement).all()
-    
-    if not inversiones and user["id"] != 0: # Si no hay inversiones y no es el Admin
-        return []
+    # Solo las columnas de InversionRead, leídas sin ORM y codificadas sin validar fila por fila
+    tablas = [Inversion, InversionArchivo] if incluir_archivo else [Inversion]
+    inversiones = leer_filas(db, InversionRead, tablas, lambda c: c.usuario_id == user["id"])
 
-    return inversiones
+    return respuesta_filas(InversionRead, inversiones)
 
 @inversion_router.get("/{inversion_id}", response_model=InversionRead)
 def get_inversion_by_id(inversion_id: int, db: SessionDep, user: UserDep):
     """Obtiene una inversión específica del usuario autenticado por ID."""
-    inversion = db.get(Inversion, inversion_id)
+    inversion = db.get(Inversion, inversion_id) or db.get(InversionArchivo, inversion_id)
     
     if not inversion:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Inversión no encontrada")
@@ -51,6 +68,8 @@ def create_inversion(inversion_in: InversionCreateIn, db: SessionDep, user: User
     print(f"   Cantidad: {inversion_in.cantidad_inversion}")
     print(f"{'='*50}")
     
+    inversion_in.moneda = _validar_moneda(inversion_in.moneda)
+
     # Crea la instancia del modelo de DB
     db_inversion = Inversion.model_validate(inversion_in)
     
@@ -76,6 +95,7 @@ def update_inversion(inversion_id: int, inversion_in: InversionUpdateIn, db: Ses
     db_inversion = db.get(Inversion, inversion_id)
     
     if not db_inversion:
+        _rechazar_si_archivado(db, inversion_id, user)
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Inversión no encontrada")
 
     # Seguridad: Asegurar que la inversión pertenezca al usuario autenticado (a menos que sea Admin)
@@ -84,6 +104,8 @@ def update_inversion(inversion_id: int, inversion_in: InversionUpdateIn, db: Ses
         
     # ✅ CORRECCIÓN: Actualizar los campos correctamente
     update_data = inversion_in.model_dump(exclude_unset=True)
+    if update_data.get("moneda") is not None:
+        update_data["moneda"] = _validar_moneda(update_data["moneda"])
     
     # Actualizar cada campo individualmente
     for key, value in update_data.items():
@@ -103,6 +125,7 @@ def delete_inversion(inversion_id: int, db: SessionDep, user: UserDep):
     db_inversion = db.get(Inversion, inversion_id)
     
     if not db_inversion:
+        _rechazar_si_archivado(db, inversion_id, user)
         # Se devuelve 204 incluso si no se encuentra para mantener la idempotencia.
         return 
     
@@ -1,8 +1,12 @@
 from typing import Annotated
 from fastapi import APIRouter, Depends, HTTPException, status, Response
-from sqlmodel import select
+from sqlmodel import delete, select
 from src.models.item import Item, ItemCreateIn, ItemCreateOut, ItemUpdateIn
-from src.routes.db_session import SessionDep
+from src.models.regla_categoria import ReglaCategoria
+from src.models.shard import BORRANDO, ShardUsuario
+from src.routes.db_session import SessionDep, ReadSessionDep
+from src.utils.categorias import olvidar_reglas
+from src.utils.shards import asignar_shard, leer_ubicacion, olvidar, sesion
 
 # Importamos las dependencias de seguridad desde main.py
 # (Asegúrate de que 'main.py' esté accesible o considera mover estas dependencias)
@@ -17,7 +21,7 @@ items_router = APIRouter(prefix="/items", tags=["items CRUD"])
 
 @items_router.get("/")
 def get_items(
-    db: SessionDep
+    db: ReadSessionDep
 ) -> list[Item]:
     """Obtiene todos los ítems."""
     statement = select(Item)
@@ -40,6 +44,10 @@ def add_item(
     db.add(db_item)
     db.commit()
     db.refresh(db_item)
+
+    # Fijar el shard donde vivirán sus gastos e inversiones
+    asignar_shard(db, db_item.id)
+    db.commit()
     return db_item
 
 
@@ -93,22 +101,56 @@ def delete_item(
         raise HTTPException(status_code=404, detail="Item no encontrado")
     
     # ✅ NUEVO: Primero eliminar todas las inversiones del usuario
+    # (sus movimientos viven en su shard, que puede ser otra base)
     from src.models.inversion import Inversion
     from src.models.gasto import Gasto
     
-    inversiones_statement = select(Inversion).where(Inversion.usuario_id == item_id)
-    inversiones = db.exec(inversiones_statement).all()
-    for inversion in inversiones:
-        db.delete(inversion)
-    
-    # ✅ NUEVO: Eliminar todos los gastos del usuario
-    gastos_statement = select(Gasto).where(Gasto.usuario_id == item_id)
-    gastos = db.exec(gastos_statement).all()
-    for gasto in gastos:
-        db.delete(gasto)
+    # Los movimientos viven en el shard y el usuario en la base principal: no hay una
+    # transacción común. Primero se marca la cuenta como en borrado (sin escrituras);
+    # si algo falla después, queda marcada y repetir el DELETE termina el trabajo.
+    shard, _ = leer_ubicacion(db, item_id)
+    ubicacion_usuario = db.get(ShardUsuario, item_id) or ShardUsuario(usuario_id=item_id, shard=shard)
+    ubicacion_usuario.estado = BORRANDO
+    db.add(ubicacion_usuario)
+    db.commit()
+    olvidar(item_id)
+
+    with sesion(shard) as db_shard:
+        inversiones_statement = select(Inversion).where(Inversion.usuario_id == item_id)
+        inversiones = db_shard.exec(inversiones_statement).all()
+        for inversion in inversiones:
+            db_shard.delete(inversion)
+        
+        # ✅ NUEVO: Eliminar todos los gastos del usuario
+        gastos_statement = select(Gasto).where(Gasto.usuario_id == item_id)
+        gastos = db_shard.exec(gastos_statement).all()
+        for gasto in gastos:
+            db_shard.delete(gasto)
+        
+        # Sus movimientos archivados, totales congelados, anomalías y bocetos de estadísticas
+        # (solo lectura: se borran en bloque)
+        from src.models.gasto import GastoArchivo
+        from src.models.inversion import InversionArchivo
+        from src.models.resumen_archivo import ResumenArchivo
+        from src.models.anomalia import AnomaliaGasto
+        from src.models.distribucion import DistribucionMensual, EstadoDistribucion
+        for archivo in (GastoArchivo, InversionArchivo, ResumenArchivo, AnomaliaGasto, DistribucionMensual, EstadoDistribucion):
+            db_shard.exec(delete(archivo).where(archivo.usuario_id == item_id))
+        
+        # Y su serie de saldos acumulados
+        from src.models.serie_saldo import SerieSaldo
+        serie = db_shard.get(SerieSaldo, item_id)
+        if serie:
+            db_shard.delete(serie)
+        db_shard.commit()
     
-    # Ahora sí eliminar el usuario
+    # Ahora sí, en una sola transacción de la base principal: sus reglas de
+    # categorización, su entrada en el mapa de shards y el usuario
+    db.exec(delete(ReglaCategoria).where(ReglaCategoria.usuario_id == item_id))
+    db.delete(ubicacion_usuario)
     db.delete(db_item)
     db.commit()
+    olvidar(item_id)
+    olvidar_reglas(item_id)
     
     return Response(status_code=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
@@ -0,0 +1,183 @@
+from typing import Annotated, Dict, List, Tuple
+from fastapi import APIRouter, Depends, HTTPException, status
+from pydantic import ValidationError
+from sqlalchemy.exc import SQLAlchemyError
+from sqlmodel import select
+from src.routes.db_session import SessionDep
+from src.models.gasto import Gasto, GastoArchivo, GastoCreateIn, GastoUpdateIn
+from src.models.inversion import Inversion, InversionArchivo, InversionCreateIn, InversionUpdateIn
+from src.models.movimiento import OperacionBatch, BatchIn, ResultadoOperacion, BatchOut
+from src.dependencies import decode_token
+from src.config.tipo_cambio import normalizar_moneda
+from src.utils.categorias import categorizar_gasto
+
+movimiento_router = APIRouter(prefix="/movimientos", tags=["Movimientos"])
+
+# --- DEPENDENCIAS DE SEGURIDAD ---
+UserDep = Annotated[dict, Depends(decode_token)]
+
+# tipo -> (modelo de tabla, esquema de creación, esquema de actualización)
+_MODELOS = {
+    "gasto": (Gasto, GastoCreateIn, GastoUpdateIn),
+    "inversion": (Inversion, InversionCreateIn, InversionUpdateIn),
+}
+
+# tipo -> (tabla de archivo, mensaje del 409 que devuelven PUT/DELETE /{tipo}s/{id})
+_ARCHIVOS = {
+    "gasto": (GastoArchivo, "El gasto está archivado y es de solo lectura"),
+    "inversion": (InversionArchivo, "La inversión está archivada y es de solo lectura"),
+}
+
+
+class OperacionInvalida(Exception):
+    """Error de una operación concreta del batch (no de todo el request)."""
+
+    def __init__(self, mensaje: str, codigo: int = status.HTTP_400_BAD_REQUEST):
+        super().__init__(mensaje)
+        self.codigo = codigo
+
+
+def _rechazar_si_falta(db, op: OperacionBatch, user: dict):
+    """Mismas respuestas que las rutas de un solo movimiento: 409 si está archivado, 404 si no existe."""
+    modelo_archivo, mensaje = _ARCHIVOS[op.tipo]
+    archivo = db.get(modelo_archivo, op.id)
+    if archivo and (archivo.usuario_id == user["id"] or user["id"] == 0):
+        raise OperacionInvalida(mensaje, status.HTTP_409_CONFLICT)
+    raise OperacionInvalida("Movimiento no encontrado", status.HTTP_404_NOT_FOUND)
+
+
+def _cargar_existentes(db, operaciones: List[OperacionBatch]) -> Dict[Tuple[str, int], object]:
+    """Trae en una sola consulta por tipo todas las filas que se van a actualizar o eliminar."""
+    existentes = {}
+    for tipo, (modelo, _, _) in _MODELOS.items():
+        ids = {op.id for op in operaciones if op.tipo == tipo and op.accion != "crear" and op.id is not None}
+        if ids:
+            for fila in db.exec(select(modelo).where(modelo.id.in_(ids))).all():
+                existentes[(tipo, fila.id)] = fila
+    return existentes
+
+
+def _validar_datos(esquema, datos: dict):
+    try:
+        entrada = esquema.model_validate(datos or {})
+    except ValidationError as e:
+        errores = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+        raise OperacionInvalida(f"Datos inválidos: {errores}")
+    if getattr(entrada, "moneda", None) is not None:
+        try:
+            entrada.moneda = normalizar_moneda(entrada.moneda)
+        except ValueError as e:
+            raise OperacionInvalida(str(e))
+    return entrada
+
+
+def _aplicar(db, op: OperacionBatch, existentes: dict, user: dict):
+    """Aplica una operación en la sesión sin hacer commit. Devuelve la fila creada/afectada o None."""
+    modelo, esquema_crear, esquema_actualizar = _MODELOS[op.tipo]
+
+    if op.accion == "crear":
+        fila = modelo.model_validate(_validar_datos(esquema_crear, op.datos))
+        fila.usuario_id = user["id"]
+        if modelo is Gasto:
+            # Mismo tipo que POST /gastos (el categorizador del usuario está en caché)
+            categorizar_gasto(fila)
+        db.add(fila)
+        return fila
+
+    if op.id is None:
+        raise OperacionInvalida("Falta el id del movimiento")
+
+    fila = existentes.get((op.tipo, op.id))
+    if fila is None:
+        _rechazar_si_falta(db, op, user)
+
+    # Seguridad: el movimiento debe pertenecer al usuario autenticado (a menos que sea Admin)
+    if fila.usuario_id != user["id"] and user["id"] != 0:
+        raise OperacionInvalida("No autorizado para modificar este movimiento", status.HTTP_403_FORBIDDEN)
+
+    if op.accion == "actualizar":
+        update_data = _validar_datos(esquema_actualizar, op.datos).model_dump(exclude_unset=True)
+        for key, value in update_data.items():
+            setattr(fila, key, value)
+        if modelo is Gasto and ("tipo_gasto" in update_data or "descripcion" in update_data):
+            categorizar_gasto(fila)
+        db.add(fila)
+    else:
+        db.delete(fila)
+        existentes.pop((op.tipo, op.id), None)
+    return fila
+
+
+@movimiento_router.post("/batch", response_model=BatchOut)
+def aplicar_batch(batch: BatchIn, db: SessionDep, user: UserDep):
+    """
+    Aplica en una sola transacción varias operaciones de crear/actualizar/eliminar
+    sobre gastos e inversiones del usuario autenticado.
+
+    - `todo_o_nada`: si alguna operación falla se revierte todo y se responde 409
+      con el resultado de cada operación.
+    - `mejor_esfuerzo`: cada operación usa su propio SAVEPOINT; las que fallan se
+      descartan y el resto se confirma.
+
+    Cada resultado fallido lleva en `codigo` el estado que habría devuelto la ruta
+    individual (404 si no existe, 409 si está archivado, 403 si es de otro usuario...).
+
+    Los IDs generados se obtienen del INSERT; las filas no se vuelven a leer.
+    """
+    todo_o_nada = batch.modo == "todo_o_nada"
+    existentes = _cargar_existentes(db, batch.operaciones)
+
+    resultados: List[ResultadoOperacion] = []
+    afectadas = []  # (resultado, fila) para completar el id tras el flush
+
+    for indice, op in enumerate(batch.operaciones):
+        resultado = ResultadoOperacion(indice=indice, accion=op.accion, tipo=op.tipo, ok=True, id=op.id)
+        try:
+            if todo_o_nada:
+                fila = _aplicar(db, op, existentes, user)
+            else:
+                with db.begin_nested():
+                    fila = _aplicar(db, op, existentes, user)
+            if fila is not None and op.accion != "eliminar":
+                afectadas.append((resultado, fila))
+        except OperacionInvalida as e:
+            resultado.ok = False
+            resultado.codigo = e.codigo
+            resultado.error = str(e)
+        except SQLAlchemyError as e:
+            resultado.ok = False
+            resultado.codigo = status.HTTP_409_CONFLICT
+            resultado.error = str(e)
+        resultados.append(resultado)
+
+    fallidas = sum(1 for r in resultados if not r.ok)
+
+    if todo_o_nada and fallidas:
+        db.rollback()
+        for r in resultados:
+            if r.ok:
+                r.ok = False
+                r.error = "No aplicada: otra operación del batch falló"
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=BatchOut(modo=batch.modo, aplicadas=0, fallidas=len(resultados), resultados=resultados).model_dump()
+        )
+
+    try:
+        # Un único flush envía todos los INSERT/UPDATE/DELETE pendientes y asigna los IDs
+        db.flush()
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"No se pudo aplicar el batch: {e}")
+
+    for resultado, fila in afectadas:
+        resultado.id = fila.id
+
+    db.commit()
+
+    return BatchOut(
+        modo=batch.modo,
+        aplicadas=len(resultados) - fallidas,
+        fallidas=fallidas,
+        resultados=resultados
+    )
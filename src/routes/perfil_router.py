@@ -0,0 +1,61 @@
+from typing import Annotated, List, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import FileResponse
+from pydantic import BaseModel
+from datetime import datetime
+from src.dependencies import verify_admin_role
+from src.utils.perfilado import archivo_perfil, emitir_token, listar_perfiles
+
+perfil_router = APIRouter(prefix="/admin/perfiles", tags=["admin"])
+
+# --- DEPENDENCIAS DE SEGURIDAD ---
+AdminDep = Annotated[bool, Depends(verify_admin_role)]
+
+
+# --- MODELOS DE RESPUESTA ---
+
+class TokenPerfil(BaseModel):
+    token: str          # Enviar en la cabecera X-Perfil (o ?perfil=) de las peticiones a perfilar
+    usuario_id: int
+    expira: datetime
+
+class PerfilResumen(BaseModel):
+    id: str
+    metodo: Optional[str]
+    ruta: Optional[str]
+    query: str = ""
+    usuario_id: int
+    estado: Optional[int]
+    duracion_ms: float
+    muestras: int
+    sql_total: int
+    sql_ms: float
+
+
+@perfil_router.post("/token", response_model=TokenPerfil)
+def crear_token_perfil(
+    is_admin: AdminDep,
+    usuario_id: int = Query(description="Usuario cuyas peticiones se podrán perfilar"),
+    minutos: int = Query(default=15, ge=1, le=24 * 60, description="Validez del token")
+):
+    """Autoriza a perfilar las peticiones de un usuario. Requiere rol de administrador."""
+    token, expira = emitir_token(usuario_id, minutos)
+    return TokenPerfil(token=token, usuario_id=usuario_id, expira=expira)
+
+
+@perfil_router.get("/", response_model=List[PerfilResumen])
+def get_perfiles(is_admin: AdminDep):
+    """Perfiles guardados, del más reciente al más antiguo. Requiere rol de administrador."""
+    return listar_perfiles()
+
+
+@perfil_router.get("/{perfil_id}/{tipo}")
+def descargar_perfil(perfil_id: str, tipo: Literal["speedscope", "sql"], is_admin: AdminDep):
+    """
+    Descarga un perfil: `speedscope` (abrir en https://www.speedscope.app) o `sql`
+    (sentencias con su duración). Requiere rol de administrador.
+    """
+    ruta = archivo_perfil(perfil_id, tipo)
+    if ruta is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Perfil no encontrado")
+    return FileResponse(ruta, media_type="application/json", filename=ruta.name)
@@ -0,0 +1,77 @@
+from typing import Annotated, List
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlmodel import func, or_, select
+from src.routes.db_session import SessionDep
+from src.models.regla_categoria import REGEX, ReglaCategoria, ReglaCategoriaIn, ReglaCategoriaRead
+from src.dependencies import decode_token
+from src.utils.categorias import MAX_REGLAS_REGEX, normalizar, olvidar_reglas, validar_patron
+
+regla_router = APIRouter(prefix="/reglas", tags=["Reglas de categoría"])
+
+# --- DEPENDENCIAS DE SEGURIDAD ---
+UserDep = Annotated[dict, Depends(decode_token)]
+
+
+@regla_router.get("/", response_model=List[ReglaCategoriaRead])
+def get_reglas(db: SessionDep, user: UserDep):
+    """Reglas de categorización del usuario y del sistema (usuario_id nulo)."""
+    statement = select(ReglaCategoria).where(
+        or_(ReglaCategoria.usuario_id == user["id"], ReglaCategoria.usuario_id.is_(None))
+    ).order_by(ReglaCategoria.usuario_id.is_(None), ReglaCategoria.prioridad.desc(), ReglaCategoria.id)
+    return db.exec(statement).all()
+
+
+@regla_router.post("/", response_model=ReglaCategoriaRead, status_code=status.HTTP_201_CREATED)
+def create_regla(regla_in: ReglaCategoriaIn, db: SessionDep, user: UserDep):
+    """
+    Crea una regla que asigna `categoria` a los gastos cuyo tipo o descripción coincide con
+    `patron` (palabras separadas por comas o un regex sobre el texto en minúsculas y sin
+    acentos) y cuya cantidad está en [cantidad_min, cantidad_max).
+    Con `sistema=true` (solo admin) la regla es para todos los usuarios.
+    Se aplica a los gastos nuevos; los existentes se recategorizan con el job recategorizar_gastos.
+    """
+    if regla_in.sistema and user["id"] != 0:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Solo un administrador puede crear reglas del sistema")
+    if not normalizar(regla_in.categoria):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="La categoría no puede estar vacía")
+    if regla_in.patron:
+        try:
+            validar_patron(regla_in.tipo_patron, regla_in.patron)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    elif regla_in.cantidad_min is None and regla_in.cantidad_max is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="La regla necesita un patrón o un rango de cantidad")
+    if regla_in.patron and regla_in.tipo_patron == REGEX and not regla_in.sistema:
+        regex_propios = db.exec(select(func.count()).select_from(ReglaCategoria).where(
+            ReglaCategoria.usuario_id == user["id"], ReglaCategoria.tipo_patron == REGEX,
+        )).one()
+        if regex_propios >= MAX_REGLAS_REGEX:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"No se pueden tener más de {MAX_REGLAS_REGEX} reglas regex")
+
+    db_regla = ReglaCategoria.model_validate(regla_in, update={
+        "categoria": normalizar(regla_in.categoria),
+        "usuario_id": None if regla_in.sistema else user["id"],
+    })
+    db.add(db_regla)
+    db.commit()
+    db.refresh(db_regla)
+    olvidar_reglas(db_regla.usuario_id)
+    return db_regla
+
+
+@regla_router.delete("/{regla_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_regla(regla_id: int, db: SessionDep, user: UserDep):
+    """Elimina una regla propia (o del sistema, si es admin)."""
+    db_regla = db.get(ReglaCategoria, regla_id)
+    if not db_regla:
+        return
+
+    propia = db_regla.usuario_id == user["id"]
+    if not propia and user["id"] != 0:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="No autorizado para eliminar esta regla")
+
+    usuario_id = db_regla.usuario_id
+    db.delete(db_regla)
+    db.commit()
+    olvidar_reglas(usuario_id)
+    return
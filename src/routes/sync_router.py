@@ -0,0 +1,130 @@
+from typing import Annotated, Dict, List, Tuple
+from fastapi import APIRouter, Depends, Query
+from pydantic import BaseModel
+from sqlmodel import and_, select, func
+from src.routes.db_session import ReadSessionDep
+from src.models.gasto import Gasto, GastoArchivo, GastoRead
+from src.models.inversion import Inversion, InversionArchivo, InversionRead
+from src.models.cambio import CambioMovimiento, EstadoSync
+from src.dependencies import decode_token
+from src.utils.cambios import UPSERT, DELETE, limite_confirmado
+from src.utils.lectura import leer_filas
+
+sync_router = APIRouter(prefix="/sync", tags=["Sincronización"])
+
+# --- DEPENDENCIAS DE SEGURIDAD ---
+UserDep = Annotated[dict, Depends(decode_token)]
+
+# El token lleva el shard (token = id * _SHARDS_TOKEN + shard): los id del log son por
+# shard, así que un token emitido por otro shard (usuario movido) provoca un reset.
+_SHARDS_TOKEN = 1024
+
+# El token no avanza sobre los cambios de los últimos SYNC_MARGEN_SEGUNDOS (ver
+# src/utils/cambios.py): esos se vuelven a enviar en la siguiente llamada y el cliente
+# los aplica de nuevo (cada cambio es el estado actual o un borrado, aplicarlo dos veces
+# no altera nada).
+
+# tipo -> (modelo de tabla, tabla de archivo, modelo de lectura)
+_MODELOS = {
+    "gasto": (Gasto, GastoArchivo, GastoRead),
+    "inversion": (Inversion, InversionArchivo, InversionRead),
+}
+
+
+# --- MODELOS DE RESPUESTA ---
+
+class Eliminado(BaseModel):
+    tipo: str
+    id: int
+
+class RespuestaSync(BaseModel):
+    token: int                      # Enviar como `since` en la próxima sincronización
+    reset: bool                     # True: descartar los datos locales y usar esta respuesta completa
+    hay_mas: bool                   # True: volver a llamar con el nuevo token
+    gastos: List[GastoRead]
+    inversiones: List[InversionRead]
+    eliminados: List[Eliminado]
+
+
+def _leer(db, tipo: str, condicion) -> list:
+    """Filas de la tabla y de su archivo (un movimiento archivado no está eliminado)."""
+    tabla, archivo, lectura = _MODELOS[tipo]
+    filas = leer_filas(db, lectura, (tabla, archivo), condicion)
+    return [lectura.model_validate(fila._asdict()) for fila in filas]
+
+
+@sync_router.get("/", response_model=RespuestaSync)
+def sincronizar(
+    db: ReadSessionDep,
+    user: UserDep,
+    since: int = Query(default=0, ge=0, description="Token de la última sincronización (0 = descarga completa)"),
+    limite: int = Query(default=500, ge=1, le=5000, description="Máximo de cambios por respuesta")
+):
+    """
+    Devuelve solo lo que cambió desde `since`: gastos e inversiones creados o modificados
+    (estado actual) y los eliminados. Si el token es anterior a la última compactación
+    del log, responde con la descarga completa y `reset=true`.
+    El token no pasa de los cambios de los últimos SYNC_MARGEN_SEGUNDOS: esos pueden
+    repetirse en la siguiente respuesta.
+    """
+    shard = db.info.get("shard", 0)
+    desde_id, shard_token = divmod(since, _SHARDS_TOKEN)
+    estado = db.get(EstadoSync, 1)
+    token_minimo = estado.token_minimo if estado else 0
+    reset = since == 0 or shard_token != shard or desde_id < token_minimo
+    confirmado_hasta = limite_confirmado()
+
+    if reset:
+        # Descarga completa: el token se toma antes de leer y sin los cambios recientes, así nada se pierde
+        token = db.exec(
+            select(CambioMovimiento.id)
+            .where(CambioMovimiento.fecha_cambio <= confirmado_hasta)
+            .order_by(CambioMovimiento.id.desc())
+            .limit(1)
+        ).first() or 0
+        return RespuestaSync(
+            token=max(token, token_minimo) * _SHARDS_TOKEN + shard,
+            reset=True,
+            hay_mas=False,
+            gastos=_leer(db, "gasto", lambda m: m.usuario_id == user["id"]),
+            inversiones=_leer(db, "inversion", lambda m: m.usuario_id == user["id"]),
+            eliminados=[]
+        )
+
+    cambios = db.exec(
+        select(CambioMovimiento.id, CambioMovimiento.tipo, CambioMovimiento.movimiento_id,
+               CambioMovimiento.operacion, CambioMovimiento.fecha_cambio)
+        .where(CambioMovimiento.usuario_id == user["id"], CambioMovimiento.id > desde_id)
+        .order_by(CambioMovimiento.id)
+        .limit(limite)
+    ).all()
+
+    # Solo cuenta la última operación de cada movimiento dentro de la página
+    ultima: Dict[Tuple[str, int], str] = {}
+    for cambio in cambios:
+        ultima[(cambio.tipo, cambio.movimiento_id)] = cambio.operacion
+
+    actuales = {}
+    eliminados = [Eliminado(tipo=t, id=i) for (t, i), op in ultima.items() if op == DELETE]
+    for tipo in _MODELOS:
+        ids = [i for (t, i), op in ultima.items() if t == tipo and op == UPSERT]
+        actuales[tipo] = _leer(db, tipo, lambda m: and_(m.usuario_id == user["id"], m.id.in_(ids))) if ids else []
+        # Modificado y luego borrado en un cambio que cae en una página posterior
+        encontrados = {fila.id for fila in actuales[tipo]}
+        eliminados.extend(Eliminado(tipo=tipo, id=i) for i in ids if i not in encontrados)
+
+    # El token llega hasta antes del primer cambio reciente; desde ahí se repiten
+    hasta_id = desde_id
+    for cambio in cambios:
+        if cambio.fecha_cambio > confirmado_hasta:
+            break
+        hasta_id = cambio.id
+
+    return RespuestaSync(
+        token=hasta_id * _SHARDS_TOKEN + shard,
+        reset=False,
+        hay_mas=len(cambios) == limite and hasta_id > desde_id,
+        gastos=actuales["gasto"],
+        inversiones=actuales["inversion"],
+        eliminados=eliminados
+    )
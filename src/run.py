@@ -0,0 +1,104 @@
+"""
+Lanzador de producción con varios workers.
+
+    python -m src.run --workers 4 --port 8000
+
+- Con gunicorn instalado (Linux/Mac) usa workers de uvicorn con la app precargada
+  en el proceso padre; `kill -HUP <pid del master>` reemplaza los workers sin cortar
+  las peticiones en curso.
+- Sin gunicorn (o en Windows) usa el supervisor de uvicorn; `kill -HUP` también
+  reinicia los workers de forma ordenada, pero cada uno importa la app por su cuenta.
+
+Cada worker dimensiona su pool de conexiones con DB_CONEXIONES_MAX / workers
+(ver src/config/db.py), así que agregar workers no supera max_connections de MySQL.
+"""
+import argparse
+import importlib.util
+import os
+
+APP = "src.main:app"
+
+
+def _worker_class() -> str:
+    # El paquete uvicorn-worker reemplaza a uvicorn.workers (obsoleto desde uvicorn 0.30)
+    if importlib.util.find_spec("uvicorn_worker") is not None:
+        return "uvicorn_worker.UvicornWorker"
+    return "uvicorn.workers.UvicornWorker"
+
+
+def _pre_fork(server, worker):
+    from src.config.db import reiniciar_pools
+    reiniciar_pools(cerrar=True)
+
+
+def _post_fork(server, worker):
+    from src.config.db import reiniciar_pools
+    reiniciar_pools()
+
+
+def _run_gunicorn(host: str, port: int, workers: int) -> None:
+    from gunicorn.app.base import BaseApplication
+
+    class Servidor(BaseApplication):
+        def __init__(self, opciones: dict):
+            self.opciones = opciones
+            super().__init__()
+
+        def load_config(self):
+            for clave, valor in self.opciones.items():
+                self.cfg.set(clave, valor)
+
+        def load(self):
+            from src.main import app
+            return app
+
+    Servidor({
+        "bind": f"{host}:{port}",
+        "workers": workers,
+        "worker_class": _worker_class(),
+        "preload_app": True,
+        "pre_fork": _pre_fork,
+        "post_fork": _post_fork,
+        "graceful_timeout": int(os.getenv("GRACEFUL_TIMEOUT", "30")),
+        "timeout": int(os.getenv("WORKER_TIMEOUT", "60")),
+        "keepalive": 5,
+    }).run()
+
+
+def _run_uvicorn(host: str, port: int, workers: int) -> None:
+    import uvicorn
+    uvicorn.run(
+        APP,
+        host=host,
+        port=port,
+        workers=workers,
+        timeout_graceful_shutdown=int(os.getenv("GRACEFUL_TIMEOUT", "30")),
+    )
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Servidor de producción de FINANZAS_PROYECT")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)))
+    parser.add_argument("--servidor", choices=["auto", "gunicorn", "uvicorn"], default="auto")
+    args = parser.parse_args(argv)
+
+    workers = max(1, args.workers)
+    # Debe fijarse antes de importar la app: src.config.db lo usa para el tamaño del pool
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+
+    servidor = args.servidor
+    if servidor == "auto":
+        hay_gunicorn = importlib.util.find_spec("gunicorn") is not None
+        servidor = "gunicorn" if hay_gunicorn and os.name != "nt" else "uvicorn"
+
+    print(f"🚀 Iniciando {servidor} con {workers} workers en {args.host}:{args.port}")
+    if servidor == "gunicorn":
+        _run_gunicorn(args.host, args.port, workers)
+    else:
+        _run_uvicorn(args.host, args.port, workers)
+
+
+if __name__ == "__main__":
+    main()
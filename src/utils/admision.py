@@ -0,0 +1,198 @@
+"""
+Control de admisión para rutas costosas (/token, /chat):
+
+- LimiteConcurrencia: como máximo N peticiones a la vez por proceso y una cola de
+  espera acotada; si la cola está llena o la espera se agota responde 503 enseguida.
+- LimiteTasa: token bucket por clave (usuario o IP) con backend intercambiable:
+  memoria del proceso o uno compartido entre workers (Redis).
+"""
+import asyncio
+import math
+import os
+import time
+from abc import ABC, abstractmethod
+from threading import Lock
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from fastapi import HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from src.dependencies import usuario_opcional
+
+
+def _rechazo(codigo: int, detalle: str, reintentar_en: float) -> HTTPException:
+    return HTTPException(
+        status_code=codigo,
+        detail=detalle,
+        headers={"Retry-After": str(max(1, math.ceil(reintentar_en)))}
+    )
+
+
+# --- CONCURRENCIA ---
+
+class LimiteConcurrencia:
+    """Dependencia con yield que reserva un cupo durante toda la petición."""
+
+    def __init__(self, nombre: str, max_concurrentes: int, max_en_cola: int, espera_max: float):
+        self.nombre = nombre
+        self.max_concurrentes = max_concurrentes
+        self.max_en_cola = max_en_cola
+        self.espera_max = espera_max
+        self._semaforo = asyncio.Semaphore(max_concurrentes)
+        self._en_cola = 0
+
+    async def __call__(self):
+        if self._semaforo.locked():
+            if self._en_cola >= self.max_en_cola:
+                raise _rechazo(status.HTTP_503_SERVICE_UNAVAILABLE, f"{self.nombre}: servicio saturado", self.espera_max)
+            self._en_cola += 1
+            try:
+                await asyncio.wait_for(self._semaforo.acquire(), timeout=self.espera_max)
+            except asyncio.TimeoutError:
+                raise _rechazo(status.HTTP_503_SERVICE_UNAVAILABLE, f"{self.nombre}: servicio saturado", self.espera_max)
+            finally:
+                self._en_cola -= 1
+        else:
+            await self._semaforo.acquire()
+        try:
+            yield
+        finally:
+            self._semaforo.release()
+
+
+# --- TASA (TOKEN BUCKET) ---
+
+class BackendTasa(ABC):
+    """Guarda el estado de los buckets. `bloqueante` indica si hace I/O (se llama desde un hilo)."""
+
+    bloqueante = False
+
+    @abstractmethod
+    def consumir(self, clave: str, capacidad: float, recarga: float, costo: float = 1.0) -> float:
+        """Consume `costo` tokens. Devuelve 0 si se permitió o los segundos a esperar si no."""
+
+
+class BackendMemoria(BackendTasa):
+    """Buckets en memoria del proceso (cada worker lleva su propia cuenta)."""
+
+    MAX_CLAVES = 100_000
+
+    def __init__(self):
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = Lock()
+
+    def consumir(self, clave: str, capacidad: float, recarga: float, costo: float = 1.0) -> float:
+        ahora = time.monotonic()
+        with self._lock:
+            tokens, ultimo = self._buckets.get(clave, (capacidad, ahora))
+            tokens = min(capacidad, tokens + (ahora - ultimo) * recarga)
+            if tokens >= costo:
+                espera = 0.0
+                tokens -= costo
+            else:
+                espera = (costo - tokens) / recarga
+            self._buckets[clave] = (tokens, ahora)
+            if len(self._buckets) > self.MAX_CLAVES:
+                self._podar(ahora, capacidad, recarga)
+        return espera
+
+    def _podar(self, ahora: float, capacidad: float, recarga: float) -> None:
+        # Un bucket que ya se habría llenado otra vez equivale a no tenerlo
+        llenado = capacidad / recarga
+        for clave, (_, ultimo) in list(self._buckets.items()):
+            if ahora - ultimo >= llenado:
+                del self._buckets[clave]
+
+
+class BackendRedis(BackendTasa):
+    """Buckets compartidos entre workers y servidores; requiere el paquete `redis`."""
+
+    bloqueante = True
+
+    _SCRIPT = """
+    local capacidad = tonumber(ARGV[1])
+    local recarga = tonumber(ARGV[2])
+    local ahora = tonumber(ARGV[3])
+    local costo = tonumber(ARGV[4])
+    local datos = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local tokens = tonumber(datos[1]) or capacidad
+    local ts = tonumber(datos[2]) or ahora
+    tokens = math.min(capacidad, tokens + math.max(0, ahora - ts) * recarga)
+    local espera = 0
+    if tokens >= costo then tokens = tokens - costo else espera = (costo - tokens) / recarga end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', ahora)
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacidad / recarga) + 1)
+    return tostring(espera)
+    """
+
+    def __init__(self, url: str, prefijo: str = "tasa:"):
+        import redis
+        self._cliente = redis.Redis.from_url(url)
+        self._script = self._cliente.register_script(self._SCRIPT)
+        self._prefijo = prefijo
+
+    def consumir(self, clave: str, capacidad: float, recarga: float, costo: float = 1.0) -> float:
+        espera = self._script(keys=[self._prefijo + clave], args=[capacidad, recarga, time.time(), costo])
+        return float(espera)
+
+
+_backend: Optional[BackendTasa] = None
+
+
+def configurar_backend(backend: BackendTasa) -> None:
+    """Permite enchufar otro backend (por ejemplo en pruebas o con otro almacén compartido)."""
+    global _backend
+    _backend = backend
+
+
+def obtener_backend() -> BackendTasa:
+    global _backend
+    if _backend is None:
+        if os.getenv("RATE_LIMIT_BACKEND", "memoria") == "redis":
+            _backend = BackendRedis(os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+        else:
+            _backend = BackendMemoria()
+    return _backend
+
+
+# --- CLAVES ---
+
+async def clave_ip(request: Request) -> str:
+    return "ip:" + (request.client.host if request.client else "desconocida")
+
+
+async def clave_usuario(request: Request) -> str:
+    """Usuario del JWT si viene uno válido; si no, la IP."""
+    usuario = usuario_opcional(request.headers.get("authorization"))
+    if usuario is not None:
+        return f"usuario:{usuario['id']}"
+    return await clave_ip(request)
+
+
+async def clave_login(request: Request) -> str:
+    """
+    Nombre de usuario que intenta iniciar sesión en /token, junto con la IP de origen:
+    los intentos desde una IP no agotan el bucket de ese usuario en las demás, así que
+    nadie puede bloquearle el login a otro usuario conociendo solo su nombre.
+    """
+    formulario = await request.form()
+    return f"login:{formulario.get('username', '')}:{await clave_ip(request)}"
+
+
+class LimiteTasa:
+    """Dependencia que aplica un token bucket de `capacidad` con `por_minuto` recargas."""
+
+    def __init__(self, nombre: str, capacidad: int, por_minuto: float,
+                 clave: Callable[[Request], Awaitable[str]] = clave_ip):
+        self.nombre = nombre
+        self.capacidad = capacidad
+        self.recarga = por_minuto / 60
+        self.clave = clave
+
+    async def __call__(self, request: Request) -> None:
+        clave = f"{self.nombre}:{await self.clave(request)}"
+        backend = obtener_backend()
+        if backend.bloqueante:
+            espera = await run_in_threadpool(backend.consumir, clave, self.capacidad, self.recarga)
+        else:
+            espera = backend.consumir(clave, self.capacidad, self.recarga)
+        if espera > 0:
+            raise _rechazo(status.HTTP_429_TOO_MANY_REQUESTS, f"{self.nombre}: demasiadas peticiones", espera)
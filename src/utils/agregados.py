@@ -0,0 +1,98 @@
+from datetime import date
+from typing import Optional
+from sqlalchemy import Date, type_coerce
+from sqlmodel import select, func
+from src.config.tipo_cambio import obtener_snapshot
+from src.models.inversion import Inversion, InversionArchivo
+from src.models.gasto import Gasto, GastoArchivo
+from src.models.resumen_archivo import ResumenArchivo
+from src.utils.lectura import ejecutar
+
+# Las cantidades se suman en la base de datos agrupando por (moneda, periodo de la tasa):
+# con el archivo de tasas mensual el periodo es el mes, así que el número de grupos
+# crece con los meses de historial y no con los días. La conversión a otra moneda se
+# aplica después sobre esos grupos con el snapshot en memoria, nunca fila por fila.
+# Los movimientos archivados se leen de sus totales congelados por mes (resumen_archivo);
+# quien necesita días exactos (la serie de saldos, /rango) los suma de las tablas de archivo.
+
+# (columna de tipo, columna de cantidad, columna de fecha) de cada movimiento
+COLUMNAS = {
+    Gasto: (Gasto.tipo_gasto, Gasto.cantidad_gasto, Gasto.fecha_gasto),
+    Inversion: (Inversion.tipo_inversion, Inversion.cantidad_inversion, Inversion.fecha_inversion),
+}
+
+# Valor de ResumenArchivo.tipo de cada movimiento
+TIPO_RESUMEN = {Gasto: "gasto", Inversion: "inversion"}
+
+# tabla caliente -> tabla de archivo
+ARCHIVOS = {Gasto: GastoArchivo, Inversion: InversionArchivo}
+
+
+def inicio_de_mes(fecha, dialecto: str):
+    """Expresión SQL con el primer día del mes de `fecha` (SQLite o MySQL)."""
+    if dialecto == "sqlite":
+        return type_coerce(func.date(fecha, "start of month"), Date)
+    return func.str_to_date(func.date_format(fecha, "%Y-%m-01"), "%Y-%m-%d")
+
+
+def _agrupar(db, modelo, claves, cantidad, fecha, filtros, desde: date = None, hasta: date = None):
+    statement = select(*claves, func.sum(cantidad)).where(*filtros)
+    if desde is not None:
+        statement = statement.where(fecha >= desde)
+    if hasta is not None:
+        statement = statement.where(fecha < hasta)
+    # Solo lectura: se ejecuta sin pasar por el ORM (ver src/utils/lectura.py)
+    return ejecutar(db, modelo, statement.group_by(*claves))
+
+
+def _claves(modelo, tipo, fecha, por_tipo: bool, por_usuario: bool) -> list:
+    claves = [modelo.moneda, fecha]
+    if por_tipo:
+        claves.insert(0, tipo)
+    if por_usuario:
+        claves.insert(0, modelo.usuario_id)
+    return claves
+
+
+def grupos(
+    db, modelo, usuario_id: Optional[int], desde: date = None, hasta: date = None,
+    por_tipo: bool = False, por_usuario: bool = False, por_dia: bool = False
+):
+    """
+    Suma las cantidades del usuario (o de todos si `usuario_id` es None) agrupadas por
+    (moneda, fecha) y, si se pide, por tipo, incluyendo los movimientos archivados.
+    Si las tasas son mensuales `fecha` es el primer día del mes; si no, el día.
+    Devuelve filas (tipo, moneda, fecha, total); `tipo` es None cuando no se agrupa por él.
+    Con `por_usuario` cada fila empieza además por el usuario_id: (usuario_id, tipo, moneda, fecha, total).
+    Un mismo grupo puede aparecer más de una vez (recientes y archivados): hay que acumular.
+
+    Los archivados llegan en totales por mes (fecha = día 1), así que `desde` y `hasta`
+    deben caer en inicio de mes; con `por_dia` todo se agrupa por día y los archivados se
+    suman de las tablas de archivo con su fecha real, para rangos arbitrarios o series diarias.
+    """
+    tipo, cantidad, fecha = COLUMNAS[modelo]
+    filtros = [] if usuario_id is None else [modelo.usuario_id == usuario_id]
+    periodo = fecha
+    if not por_dia and obtener_snapshot().por_mes:
+        periodo = inicio_de_mes(fecha, db.connection(bind_arguments={"mapper": modelo}).dialect.name)
+    claves = _claves(modelo, tipo, periodo, por_tipo, por_usuario)
+    filas = list(_agrupar(db, modelo, claves, cantidad, fecha, filtros, desde, hasta))
+
+    if por_dia:
+        archivo = ARCHIVOS[modelo]
+        tipo, cantidad, fecha = (getattr(archivo, columna.key) for columna in COLUMNAS[modelo])
+        filtros_archivo = [] if usuario_id is None else [archivo.usuario_id == usuario_id]
+    else:
+        archivo = ResumenArchivo
+        tipo, cantidad, fecha = ResumenArchivo.categoria, ResumenArchivo.total, ResumenArchivo.fecha
+        filtros_archivo = [ResumenArchivo.tipo == TIPO_RESUMEN[modelo]]
+        if usuario_id is not None:
+            filtros_archivo.append(ResumenArchivo.usuario_id == usuario_id)
+    claves_archivo = _claves(archivo, tipo, fecha, por_tipo, por_usuario)
+    filas.extend(_agrupar(db, archivo, claves_archivo, cantidad, fecha, filtros_archivo, desde, hasta))
+
+    if por_tipo:
+        return filas
+    if por_usuario:
+        return [(fila[0], None, *fila[1:]) for fila in filas]
+    return [(None, *fila) for fila in filas]
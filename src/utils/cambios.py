@@ -0,0 +1,57 @@
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Tuple
+from sqlalchemy import event, insert
+from sqlmodel import Session
+from src.models.gasto import Gasto
+from src.models.inversion import Inversion
+from src.models.cambio import CambioMovimiento
+
+# Cada alta, modificación o baja de gastos e inversiones hecha con la sesión ORM
+# se anota en cambio_movimiento dentro de la misma transacción (patrón outbox).
+
+TIPOS = {Gasto: "gasto", Inversion: "inversion"}
+
+UPSERT = "upsert"
+DELETE = "delete"
+
+# Los id del log se asignan al insertar pero se ven al confirmar: con escritores
+# concurrentes un id menor puede aparecer después de haber leído uno mayor. Quien
+# recorre el log con un cursor (/sync, detectar_anomalias) no lo avanza sobre cambios
+# más recientes que este margen (cota del tiempo entre el INSERT y el commit); esos se
+# vuelven a procesar en la siguiente pasada.
+SYNC_MARGEN_SEGUNDOS = float(os.getenv("SYNC_MARGEN_SEGUNDOS", "5"))
+
+
+def limite_confirmado() -> datetime:
+    """Los cambios anotados antes de este instante ya están confirmados (o nunca lo estarán)."""
+    return datetime.now(timezone.utc) - timedelta(seconds=SYNC_MARGEN_SEGUNDOS)
+
+
+def registrar_cambios(conexion, cambios: Iterable[Tuple[int, str, int, str]]) -> None:
+    """Inserta (usuario_id, tipo, movimiento_id, operacion) en el log de cambios."""
+    ahora = datetime.now(timezone.utc)
+    filas = [
+        {"usuario_id": u, "tipo": t, "movimiento_id": m, "operacion": o, "fecha_cambio": ahora}
+        for u, t, m, o in cambios
+    ]
+    if filas:
+        conexion.execute(insert(CambioMovimiento.__table__), filas)
+
+
+@event.listens_for(Session, "after_flush")
+def _anotar_cambios(session, flush_context):
+    # En after_flush new/dirty/deleted todavía reflejan lo que se acaba de enviar
+    # y los objetos nuevos ya tienen su id.
+    cambios = []
+    for obj in session.new:
+        if type(obj) in TIPOS:
+            cambios.append((obj.usuario_id, TIPOS[type(obj)], obj.id, UPSERT))
+    for obj in session.dirty:
+        if type(obj) in TIPOS and session.is_modified(obj):
+            cambios.append((obj.usuario_id, TIPOS[type(obj)], obj.id, UPSERT))
+    for obj in session.deleted:
+        if type(obj) in TIPOS:
+            cambios.append((obj.usuario_id, TIPOS[type(obj)], obj.id, DELETE))
+    if cambios:
+        registrar_cambios(session.connection(), cambios)
@@ -0,0 +1,254 @@
+"""
+Categorización automática de gastos con reglas.
+
+Las reglas del usuario y las del sistema (tabla regla_categoria) se compilan en un único
+matcher por usuario, que revisa el texto del gasto (`tipo_gasto` + `descripcion`,
+normalizados):
+- las reglas de palabras se guardan en un diccionario frase -> reglas y se buscan todas
+  las secuencias de palabras del texto (hasta la frase más larga), sin recorrer regla por regla;
+- cada patrón regex distinto se compila una vez y se busca por separado: un regex
+  combinado con alternativas solo reporta una coincidencia por tramo del texto y
+  ocultaría las reglas que se solapan con ella (`uber` frente a `uber eats`).
+Las reglas con el mismo patrón se distinguen por su rango de cantidad. Gana la regla de
+mayor prioridad; las del usuario van antes que las del sistema. Si ninguna coincide,
+el gasto conserva su tipo, normalizado.
+
+Los regex de los usuarios se limitan para que ninguno pueda trabar el proceso con
+backtracking catastrófico (ReDoS, p. ej. `(a+)+$`): se rechazan los cuantificadores
+anidados, las alternativas dentro de una repetición y las referencias a grupos; se admiten
+a lo sumo MAX_REPETICIONES_REGEX repeticiones de largo variable por patrón, y el regex solo
+revisa los primeros MAX_TEXTO_REGEX caracteres del texto. Cada usuario tiene a lo sumo
+MAX_REGLAS_REGEX reglas regex propias.
+
+El matcher de cada usuario se cachea REGLAS_TTL segundos por proceso (los usuarios sin
+reglas propias comparten el del sistema).
+"""
+import os
+import re
+import time
+import unicodedata
+try:
+    from re import _parser as sre_parse     # Python >= 3.11
+except ImportError:                         # pragma: no cover
+    import sre_parse
+from threading import Lock
+from typing import Dict, Iterator, List, Optional, Pattern, Tuple
+from sqlmodel import Session, or_, select
+from src.config.db import engine
+from src.models.regla_categoria import PALABRAS, REGEX, ReglaCategoria
+
+REGLAS_TTL = float(os.getenv("REGLAS_TTL", "30"))
+
+_MAX_USUARIOS_EN_CACHE = 100_000
+_SISTEMA = None  # Clave en caché del categorizador de solo reglas del sistema
+_PALABRA = re.compile(r"\w+")
+
+MAX_PATRON_REGEX = 200          # Caracteres de un patrón regex
+MAX_REPETICIONES_REGEX = 2      # Repeticiones de largo variable (*, +, ?, {m,n}) por patrón
+MAX_TEXTO_REGEX = 200           # Caracteres del texto que revisa el regex
+MAX_REGLAS_REGEX = 10           # Reglas regex propias por usuario
+
+
+def normalizar(texto: Optional[str]) -> str:
+    """Minúsculas, sin acentos y con un solo espacio entre palabras ("  Café " -> "cafe")."""
+    if not texto:
+        return ""
+    descompuesto = unicodedata.normalize("NFKD", texto.casefold())
+    return " ".join("".join(c for c in descompuesto if not unicodedata.combining(c)).split())
+
+
+def _palabras(texto: str) -> List[str]:
+    return _PALABRA.findall(texto)
+
+
+def frases(patron: str) -> List[str]:
+    """Frases normalizadas de un patrón de palabras ("Wal-Mart, súper" -> ["wal mart", "super"])."""
+    resultado = []
+    for parte in patron.split(","):
+        frase = " ".join(_palabras(normalizar(parte)))
+        if frase and frase not in resultado:
+            resultado.append(frase)
+    return resultado
+
+
+def _repeticiones(nodos, en_repeticion: bool = False) -> int:
+    """
+    Repeticiones de largo variable de un regex ya parseado; lanza ValueError si tiene
+    construcciones que pueden tardar un tiempo exponencial en el motor de `re`.
+    """
+    total = 0
+    for op, arg in nodos:
+        nombre = str(op)
+        if nombre in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT"):
+            minimo, maximo, sub = arg
+            variable = minimo != maximo
+            if variable and en_repeticion:
+                raise ValueError("El regex no puede tener cuantificadores anidados")
+            internas = _repeticiones(sub, en_repeticion or variable)
+            # Una repetición fija ({3}) repite también las variables de adentro
+            total += internas * (maximo if not variable else 1) + variable
+        elif nombre == "BRANCH":
+            if en_repeticion:
+                raise ValueError("El regex no puede tener alternativas dentro de una repetición")
+            total += sum(_repeticiones(alternativa, en_repeticion) for alternativa in arg[1])
+        elif nombre == "SUBPATTERN":
+            total += _repeticiones(arg[-1], en_repeticion)
+        elif nombre in ("ASSERT", "ASSERT_NOT"):
+            total += _repeticiones(arg[1], en_repeticion)
+        elif nombre == "ATOMIC_GROUP":
+            total += _repeticiones(arg, en_repeticion)
+        elif nombre in ("GROUPREF", "GROUPREF_EXISTS"):
+            raise ValueError("El regex no puede tener referencias a grupos")
+    return total
+
+
+def validar_patron(tipo_patron: str, patron: str) -> None:
+    """Lanza ValueError si el patrón de una regla no es válido."""
+    if tipo_patron == PALABRAS:
+        if not frases(patron):
+            raise ValueError("El patrón no tiene palabras")
+    elif tipo_patron == REGEX:
+        if len(patron) > MAX_PATRON_REGEX:
+            raise ValueError(f"El regex no puede tener más de {MAX_PATRON_REGEX} caracteres")
+        try:
+            compilado = re.compile(f"(?:{patron})")
+        except re.error as e:
+            raise ValueError(f"Regex inválido: {e}")
+        if compilado.groupindex:
+            raise ValueError("El regex no puede tener grupos con nombre")
+        if _repeticiones(sre_parse.parse(patron)) > MAX_REPETICIONES_REGEX:
+            raise ValueError(f"El regex no puede tener más de {MAX_REPETICIONES_REGEX} repeticiones de largo variable")
+    else:
+        raise ValueError(f"Tipo de patrón desconocido: {tipo_patron}")
+
+
+class Categorizador:
+    """Reglas de un usuario (y del sistema) compiladas en un solo matcher."""
+
+    def __init__(self, reglas: List[ReglaCategoria]):
+        # Orden de preferencia: primero las del usuario, luego por prioridad y antigüedad
+        reglas = sorted(reglas, key=lambda r: (r.usuario_id is None, -r.prioridad, r.id or 0))
+        self._orden = {id(r): i for i, r in enumerate(reglas)}
+        self._por_frase: Dict[str, List[ReglaCategoria]] = {}
+        self._por_regex: Dict[str, Tuple[Pattern, List[ReglaCategoria]]] = {}
+        self._sin_patron: List[ReglaCategoria] = []
+        for regla in reglas:
+            if not regla.patron:
+                self._sin_patron.append(regla)
+                continue
+            try:
+                validar_patron(regla.tipo_patron, regla.patron)
+            except ValueError:
+                continue  # Una regla guardada que ya no es válida no rompe a las demás
+            if regla.tipo_patron == PALABRAS:
+                for frase in frases(regla.patron):
+                    self._por_frase.setdefault(frase, []).append(regla)
+                continue
+            if regla.patron not in self._por_regex:
+                self._por_regex[regla.patron] = (re.compile(regla.patron), [])
+            self._por_regex[regla.patron][1].append(regla)
+        self._max_palabras = max((f.count(" ") + 1 for f in self._por_frase), default=0)
+
+    @staticmethod
+    def _en_rango(regla: ReglaCategoria, cantidad: Optional[float]) -> bool:
+        if regla.cantidad_min is None and regla.cantidad_max is None:
+            return True
+        if cantidad is None:
+            return False
+        return (regla.cantidad_min is None or cantidad >= regla.cantidad_min) and \
+               (regla.cantidad_max is None or cantidad < regla.cantidad_max)
+
+    def _candidatas(self, texto: str) -> Iterator[List[ReglaCategoria]]:
+        """Listas de reglas (en orden de preferencia) cuyo patrón aparece en el texto."""
+        if self._por_frase:
+            palabras = _palabras(texto)
+            for i in range(len(palabras)):
+                for n in range(1, min(self._max_palabras, len(palabras) - i) + 1):
+                    reglas = self._por_frase.get(" ".join(palabras[i:i + n]))
+                    if reglas is not None:
+                        yield reglas
+        if self._por_regex:
+            texto_regex = texto[:MAX_TEXTO_REGEX]
+            for compilado, reglas in self._por_regex.values():
+                if compilado.search(texto_regex):
+                    yield reglas
+        yield self._sin_patron
+
+    def regla(self, texto: str, cantidad: Optional[float]) -> Optional[ReglaCategoria]:
+        """Regla que se aplica a un texto ya normalizado, o None."""
+        mejor = None
+        for reglas in self._candidatas(texto):
+            for regla in reglas:
+                if mejor is not None and self._orden[id(regla)] >= self._orden[id(mejor)]:
+                    break
+                if self._en_rango(regla, cantidad):
+                    mejor = regla
+                    break
+        return mejor
+
+    def categorizar(self, tipo_gasto: Optional[str], descripcion: Optional[str], cantidad: Optional[float]) -> str:
+        """Categoría final de un gasto: la de la regla que coincide o su tipo normalizado."""
+        tipo = normalizar(tipo_gasto)
+        regla = self.regla(f"{tipo} {normalizar(descripcion)}".strip(), cantidad)
+        return normalizar(regla.categoria) if regla is not None else tipo
+
+
+# --- CACHÉ POR USUARIO ---
+
+_cache: Dict[Optional[int], Tuple[Categorizador, float]] = {}
+_cache_lock = Lock()
+
+
+def _cargar(usuario_id: Optional[int]) -> Tuple[List[ReglaCategoria], bool]:
+    """(reglas del sistema y del usuario, si el usuario tiene reglas propias)."""
+    filtro = ReglaCategoria.usuario_id.is_(None)
+    if usuario_id is not None:
+        filtro = or_(filtro, ReglaCategoria.usuario_id == usuario_id)
+    with Session(engine) as db:
+        reglas = list(db.exec(select(ReglaCategoria).where(filtro)).all())
+    return reglas, any(r.usuario_id is not None for r in reglas)
+
+
+def categorizador(usuario_id: Optional[int]) -> Categorizador:
+    """Categorizador compilado del usuario (None: solo reglas del sistema), desde la caché."""
+    ahora = time.monotonic()
+    with _cache_lock:
+        en_cache = _cache.get(usuario_id)
+        sistema = _cache.get(_SISTEMA)
+    if en_cache is not None and en_cache[1] > ahora:
+        return en_cache[0]
+
+    reglas, propias = _cargar(usuario_id)
+    if not propias and sistema is not None and sistema[1] > ahora:
+        # Sin reglas propias: se comparte el compilado del sistema
+        compilado = sistema[0]
+    else:
+        compilado = Categorizador(reglas)
+
+    with _cache_lock:
+        if len(_cache) >= _MAX_USUARIOS_EN_CACHE:
+            for clave, (_, vence) in list(_cache.items()):
+                if vence <= ahora:
+                    del _cache[clave]
+        _cache[usuario_id] = (compilado, ahora + REGLAS_TTL)
+        if not propias and (sistema is None or sistema[0] is not compilado):
+            _cache[_SISTEMA] = (compilado, ahora + REGLAS_TTL)
+    return compilado
+
+
+def olvidar_reglas(usuario_id: Optional[int] = None) -> None:
+    """Descarta la caché de un usuario, o toda si cambió una regla del sistema (None)."""
+    with _cache_lock:
+        if usuario_id is None:
+            _cache.clear()
+        else:
+            _cache.pop(usuario_id, None)
+
+
+def categorizar(usuario_id: int, tipo_gasto: Optional[str], descripcion: Optional[str], cantidad: Optional[float]) -> str:
+    return categorizador(usuario_id).categorizar(tipo_gasto, descripcion, cantidad)
+
+
+def categorizar_gasto(gasto) -> None:
+    """Normaliza o asigna el `tipo_gasto` de un gasto con las reglas de su dueño."""
+    gasto.tipo_gasto = categorizar(gasto.usuario_id, gasto.tipo_gasto, gasto.descripcion, gasto.cantidad_gasto)
@@ -0,0 +1,524 @@
+"""
+Distribución de las cantidades de gastos e inversiones: percentiles, histograma y
+movimientos más grandes por categoría, sin ordenar el historial en cada consulta.
+
+Cada (usuario, movimiento, categoría, mes) tiene en distribucion_mensual un boceto de
+cuantiles tipo DDSketch: cubetas logarítmicas en las que cada cantidad cae en la cubeta
+(γ^(i-1), γ^i], con γ = (1 + PRECISION_RELATIVA) / (1 - PRECISION_RELATIVA). El valor
+que representa cada cubeta tiene a lo sumo ese error relativo, y los bocetos de varios
+meses, categorías o usuarios se combinan sumando los conteos de cada cubeta.
+
+Como la serie de saldos, los bocetos de un usuario se construyen la primera vez que se
+consultan (en MONEDA_BASE) y después se actualizan en el mismo flush que crea, modifica
+o elimina sus gastos e inversiones. Las escrituras con SQL directo que cambian la
+categoría (recategorizar_gastos) los descartan para que se reconstruyan.
+
+Cada usuario con movimientos tiene un marcador en estado_distribucion: pendiente hasta
+que sus bocetos se construyen. La consulta global solo lee los marcadores pendientes; la
+primera vez en cada shard (o si cambió MONEDA_BASE) un inventario marca a los usuarios
+que ya tenían movimientos.
+"""
+import math
+from array import array
+from datetime import date, datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import and_, delete, event, insert, select, union, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session
+from src.config.tipo_cambio import MONEDA_BASE, obtener_snapshot
+from src.models.distribucion import DistribucionMensual, EstadoDistribucion, InventarioDistribucion
+from src.models.gasto import Gasto, GastoArchivo
+from src.models.inversion import Inversion, InversionArchivo
+from src.utils.lectura import ejecutar
+from src.utils.serie_saldo import valores_anteriores
+from src.utils.shards import sesion_escritura
+
+# Cambiarla invalida los bocetos guardados: hay que vaciar estado_distribucion
+PRECISION_RELATIVA = 0.01
+
+# Movimientos más grandes que se guardan por boceto
+MAYORES_K = 10
+
+_GAMMA = (1 + PRECISION_RELATIVA) / (1 - PRECISION_RELATIVA)
+_LOG_GAMMA = math.log(_GAMMA)
+_CERO = -(2 ** 62)  # Índice de la cubeta de las cantidades <= 0
+_LOTE_USUARIOS = 500
+
+# modelo -> (tipo, atributo de categoría, de cantidad, de fecha)
+_CAMPOS = {
+    Gasto: ("gasto", "tipo_gasto", "cantidad_gasto", "fecha_gasto"),
+    Inversion: ("inversion", "tipo_inversion", "cantidad_inversion", "fecha_inversion"),
+}
+# tipo -> (modelo, tablas donde están sus movimientos: recientes y archivados)
+_TABLAS = {
+    "gasto": (Gasto, (Gasto.__table__, GastoArchivo.__table__)),
+    "inversion": (Inversion, (Inversion.__table__, InversionArchivo.__table__)),
+}
+
+_CLAVE = ("usuario_id", "tipo", "categoria", "mes")
+
+
+def _indice(valor: float) -> int:
+    return _CERO if valor <= 0 else math.ceil(math.log(valor) / _LOG_GAMMA)
+
+
+def limites(indice: int) -> Tuple[float, float]:
+    """(desde, hasta] de una cubeta."""
+    if indice == _CERO:
+        return 0.0, 0.0
+    return _GAMMA ** (indice - 1), _GAMMA ** indice
+
+
+def _conteos(cubetas: bytes) -> Dict[int, int]:
+    valores = array("q")
+    valores.frombytes(cubetas)
+    return dict(zip(valores[0::2], valores[1::2]))
+
+
+def _representante(indice: int) -> float:
+    # Punto de la cubeta con el mismo error relativo respecto de sus dos límites
+    return 0.0 if indice == _CERO else 2 * _GAMMA ** indice / (_GAMMA + 1)
+
+
+class Boceto:
+    """Uno o varios bocetos combinados: conteo por cubeta, total y movimientos más grandes."""
+
+    __slots__ = ("conteos", "conteo", "suma", "mayores", "mayores_completo")
+
+    def __init__(self):
+        self.conteos: Dict[int, int] = {}
+        self.conteo = 0
+        self.suma = 0.0
+        self.mayores: List[list] = []      # [cantidad, id, fecha(, usuario_id)], de mayor a menor
+        self.mayores_completo = True
+
+    @classmethod
+    def de_fila(cls, fila) -> "Boceto":
+        """Boceto guardado (fila de distribucion_mensual), para modificarlo."""
+        boceto = cls()
+        boceto.conteos = _conteos(fila.cubetas)
+        boceto.conteo, boceto.suma = fila.conteo, fila.suma
+        boceto.mayores, boceto.mayores_completo = list(fila.mayores), fila.mayores_completo
+        return boceto
+
+    # --- ESCRITURA ---
+
+    def agregar(self, valor: float, veces: int = 1) -> None:
+        indice = _indice(valor)
+        self.conteos[indice] = self.conteos.get(indice, 0) + veces
+        self.conteo += veces
+        self.suma += valor * veces
+
+    def agregar_mayor(self, mayor: list) -> None:
+        if len(self.mayores) < MAYORES_K or mayor[0] > self.mayores[-1][0]:
+            self.mayores.append(mayor)
+            self.mayores.sort(key=lambda m: m[0], reverse=True)
+            del self.mayores[MAYORES_K:]
+
+    def aplicar(self, movimientos: Iterable[Tuple[int, float, int, date]]) -> None:
+        """
+        Suma o resta (signo, importe, id, fecha) de un flush. Si sale de la lista uno de los
+        mayores y quedan movimientos fuera de ella, la lista se marca incompleta.
+        """
+        quitados = {}
+        for signo, importe, movimiento_id, fecha in movimientos:
+            self.agregar(importe, signo)
+            if signo > 0:
+                self.agregar_mayor([importe, movimiento_id, fecha.isoformat()])
+                continue
+            for i, mayor in enumerate(self.mayores):
+                if mayor[1] == movimiento_id:
+                    quitados[movimiento_id] = mayor[0]
+                    del self.mayores[i]
+                    break
+        # Volver a entrar con una cantidad igual o mayor no deja huecos
+        siguen = {m[1]: m[0] for m in self.mayores}
+        perdidos = [i for i, cantidad in quitados.items() if siguen.get(i, cantidad - 1) < cantidad]
+        if perdidos and self.conteo > len(self.mayores):
+            self.mayores_completo = False
+
+    def combinar(self, fila) -> None:
+        """Suma un boceto guardado; sus mayores llevan además el usuario_id."""
+        conteos = self.conteos
+        for indice, n in _conteos(fila.cubetas).items():
+            conteos[indice] = conteos.get(indice, 0) + n
+        self.conteo += fila.conteo
+        self.suma += fila.suma
+        for mayor in fila.mayores:
+            self.agregar_mayor([*mayor[:3], fila.usuario_id])
+
+    def sumar(self, otro: "Boceto") -> None:
+        for indice, n in otro.conteos.items():
+            self.conteos[indice] = self.conteos.get(indice, 0) + n
+        self.conteo += otro.conteo
+        self.suma += otro.suma
+        for mayor in otro.mayores:
+            self.agregar_mayor(mayor)
+
+    def columnas(self) -> dict:
+        cubetas = array("q")
+        for indice in sorted(i for i, n in self.conteos.items() if n):
+            cubetas.extend((indice, self.conteos[indice]))
+        return {
+            "conteo": self.conteo,
+            "suma": self.suma,
+            "cubetas": cubetas.tobytes(),
+            "mayores": self.mayores,
+            "mayores_completo": self.mayores_completo,
+        }
+
+    # --- LECTURA ---
+
+    def cuantil(self, q: float) -> Optional[float]:
+        """Valor del cuantil `q` (0..1) con error relativo <= PRECISION_RELATIVA, o None si está vacío."""
+        if self.conteo <= 0:
+            return None
+        rango = q * (self.conteo - 1)
+        acumulado = 0
+        indices = sorted(i for i, n in self.conteos.items() if n > 0)
+        valor = _representante(indices[-1])
+        for indice in indices:
+            acumulado += self.conteos[indice]
+            if acumulado > rango:
+                valor = _representante(indice)
+                break
+        # El mayor movimiento se conoce exacto: ningún cuantil lo supera
+        if self.mayores and self.mayores_completo:
+            valor = min(valor, self.mayores[0][0])
+        return valor
+
+    def histograma(self, cubetas: int) -> List[Tuple[float, float, int]]:
+        """
+        (desde, hasta, conteo) de a lo sumo `cubetas` intervalos de igual ancho en escala
+        logarítmica entre la menor y la mayor cantidad (más uno para las <= 0); sin los vacíos.
+        """
+        resultado = []
+        if self.conteos.get(_CERO, 0) > 0:
+            resultado.append((0.0, 0.0, self.conteos[_CERO]))
+        positivos = sorted(i for i, n in self.conteos.items() if n > 0 and i != _CERO)
+        if not positivos:
+            return resultado
+        bajo = positivos[0]
+        ancho = max(1, math.ceil((positivos[-1] - bajo + 1) / cubetas))
+        grupos: Dict[int, int] = {}
+        for indice in positivos:
+            grupo = (indice - bajo) // ancho
+            grupos[grupo] = grupos.get(grupo, 0) + self.conteos[indice]
+        for grupo in sorted(grupos):
+            primero = bajo + grupo * ancho
+            resultado.append((limites(primero)[0], limites(primero + ancho - 1)[1], grupos[grupo]))
+        return resultado
+
+
+# --- CONSTRUCCIÓN ---
+
+def _mes(fecha: date) -> date:
+    return fecha.replace(day=1)
+
+
+def _borrar(conexion, usuario_ids: List[int]) -> None:
+    for tabla in (DistribucionMensual.__table__, EstadoDistribucion.__table__):
+        conexion.execute(delete(tabla).where(tabla.c.usuario_id.in_(usuario_ids)))
+
+
+def _marcar_sin_marcador(conexion, usuario_ids: List[int]) -> None:
+    """Crea el marcador pendiente de los usuarios que no tienen uno."""
+    e = EstadoDistribucion.__table__
+    existentes = set(conexion.execute(select(e.c.usuario_id).where(e.c.usuario_id.in_(usuario_ids))).scalars())
+    nuevos = [{"usuario_id": u, "moneda": "", "pendiente": True} for u in usuario_ids if u not in existentes]
+    if not nuevos:
+        return
+    try:
+        with conexion.begin_nested():
+            conexion.execute(insert(e), nuevos)
+    except IntegrityError:
+        # Otra transacción creó alguno al mismo tiempo: se insertan de a uno
+        for fila in nuevos:
+            try:
+                with conexion.begin_nested():
+                    conexion.execute(insert(e), fila)
+            except IntegrityError:
+                pass
+
+
+def descartar(conexion, usuario_ids: List[int]) -> None:
+    """Borra los bocetos de los usuarios y los marca como pendientes: se reconstruyen en su próxima consulta."""
+    t, e = DistribucionMensual.__table__, EstadoDistribucion.__table__
+    conexion.execute(delete(t).where(t.c.usuario_id.in_(usuario_ids)))
+    conexion.execute(update(e).where(e.c.usuario_id.in_(usuario_ids)).values(pendiente=True))
+    _marcar_sin_marcador(conexion, usuario_ids)
+
+
+def construir(conexion, usuario_ids: List[int]) -> None:
+    """Reconstruye los bocetos de los usuarios desde sus movimientos, recientes y archivados."""
+    snapshot = obtener_snapshot()
+    for inicio in range(0, len(usuario_ids), _LOTE_USUARIOS):
+        lote = usuario_ids[inicio:inicio + _LOTE_USUARIOS]
+        bocetos: Dict[tuple, Boceto] = {}
+        for tipo, (modelo, tablas) in _TABLAS.items():
+            _, categoria, cantidad, fecha = _CAMPOS[modelo]
+            for tabla in tablas:
+                c = tabla.c
+                filas = conexion.execute(
+                    select(c.usuario_id, c[categoria], c[cantidad], c[fecha], c.moneda, c.id)
+                    .where(c.usuario_id.in_(lote))
+                )
+                for usuario_id, nombre, valor, dia, moneda, movimiento_id in filas:
+                    if valor is None or dia is None:
+                        continue
+                    importe = valor * snapshot.factor(moneda or MONEDA_BASE, MONEDA_BASE, dia)
+                    clave = (usuario_id, tipo, nombre or "", _mes(dia))
+                    boceto = bocetos.get(clave)
+                    if boceto is None:
+                        boceto = bocetos[clave] = Boceto()
+                    boceto.agregar(importe)
+                    boceto.agregar_mayor([importe, movimiento_id, dia.isoformat()])
+
+        _borrar(conexion, lote)
+        if bocetos:
+            conexion.execute(insert(DistribucionMensual.__table__), [
+                {**dict(zip(_CLAVE, clave)), **boceto.columnas()} for clave, boceto in bocetos.items()
+            ])
+        conexion.execute(insert(EstadoDistribucion.__table__), [
+            {"usuario_id": usuario_id, "moneda": MONEDA_BASE, "pendiente": False} for usuario_id in lote
+        ])
+
+
+def _completar_mayores(conexion, claves: List[tuple]) -> None:
+    """Vuelve a leer los movimientos más grandes de los bocetos cuya lista quedó incompleta."""
+    snapshot = obtener_snapshot()
+    t = DistribucionMensual.__table__
+    for usuario_id, tipo, categoria, mes in claves:
+        modelo, tablas = _TABLAS[tipo]
+        _, atributo_categoria, atributo_cantidad, atributo_fecha = _CAMPOS[modelo]
+        condicion = and_(
+            t.c.usuario_id == usuario_id, t.c.tipo == tipo, t.c.categoria == categoria, t.c.mes == mes
+        )
+        # Bloquea el boceto: un flush concurrente espera a que termine
+        if conexion.execute(select(t.c.conteo).where(condicion).with_for_update()).first() is None:
+            continue
+        boceto = Boceto()
+        siguiente = mes + relativedelta(months=1)
+        for tabla in tablas:
+            c = tabla.c
+            filas = conexion.execute(
+                select(c.id, c[atributo_cantidad], c[atributo_fecha], c.moneda).where(
+                    c.usuario_id == usuario_id,
+                    c[atributo_categoria] == categoria,
+                    c[atributo_fecha] >= mes,
+                    c[atributo_fecha] < siguiente,
+                )
+            )
+            for movimiento_id, valor, dia, moneda in filas:
+                importe = valor * snapshot.factor(moneda or MONEDA_BASE, MONEDA_BASE, dia)
+                boceto.agregar_mayor([importe, movimiento_id, dia.isoformat()])
+        conexion.execute(update(t).where(condicion).values(mayores=boceto.mayores, mayores_completo=True))
+
+
+# --- LECTURA ---
+
+def _leer(db, condiciones: list, categoria: Optional[str]) -> Dict[str, Boceto]:
+    t = DistribucionMensual.__table__
+    if categoria is not None:
+        condiciones = [*condiciones, t.c.categoria == categoria]
+    filas = ejecutar(db, DistribucionMensual, select(t).where(*condiciones))
+
+    incompletas = [tuple(getattr(f, k) for k in _CLAVE) for f in filas if not f.mayores_completo]
+    if incompletas:
+        with sesion_escritura(db) as escritura:
+            _completar_mayores(escritura.connection(), incompletas)
+            escritura.commit()
+            filas = ejecutar(escritura, DistribucionMensual, select(t).where(*condiciones))
+
+    por_categoria: Dict[str, Boceto] = {}
+    for fila in filas:
+        boceto = por_categoria.get(fila.categoria)
+        if boceto is None:
+            boceto = por_categoria[fila.categoria] = Boceto()
+        boceto.combinar(fila)
+    return por_categoria
+
+
+def _condiciones(tipo: str, desde: Optional[date], hasta: Optional[date]) -> list:
+    c = DistribucionMensual.__table__.c
+    condiciones = [c.tipo == tipo]
+    if desde is not None:
+        condiciones.append(c.mes >= _mes(desde))
+    if hasta is not None:
+        condiciones.append(c.mes <= _mes(hasta))
+    return condiciones
+
+
+def bocetos_usuario(
+    db, usuario_id: int, tipo: str, desde: Optional[date] = None, hasta: Optional[date] = None,
+    categoria: Optional[str] = None
+) -> Dict[str, Boceto]:
+    """
+    Bocetos del usuario combinados por categoría, de los meses de `desde` a `hasta`
+    (ambos incluidos). Si todavía no existen se construyen en el primario del shard.
+    """
+    e = EstadoDistribucion.__table__.c
+    estado = ejecutar(db, EstadoDistribucion, select(e.moneda, e.pendiente).where(e.usuario_id == usuario_id))
+    condiciones = [DistribucionMensual.__table__.c.usuario_id == usuario_id, *_condiciones(tipo, desde, hasta)]
+    if estado and not estado[0].pendiente and estado[0].moneda == MONEDA_BASE:
+        return _leer(db, condiciones, categoria)
+
+    # La sesión de lectura puede ser una réplica: se construyen y se leen en el primario
+    with sesion_escritura(db) as escritura:
+        construir(escritura.connection(), [usuario_id])
+        try:
+            escritura.commit()
+        except IntegrityError:
+            # Otra petición los construyó al mismo tiempo
+            escritura.rollback()
+        return _leer(escritura, condiciones, categoria)
+
+
+def _inventariar(conexion) -> None:
+    """
+    Marca como pendientes a los usuarios con movimientos y sin marcador, y a los construidos
+    en otra moneda base. Recorre todos los movimientos del shard: solo corre una vez por
+    shard y MONEDA_BASE.
+    """
+    i, e = InventarioDistribucion.__table__, EstadoDistribucion.__table__
+    inventario = conexion.execute(select(i.c.moneda).where(i.c.id == 1).with_for_update()).first()
+    if inventario is not None and inventario.moneda == MONEDA_BASE:
+        return  # Otra petición lo hizo mientras tanto
+
+    conexion.execute(update(e).where(e.c.moneda != MONEDA_BASE).values(pendiente=True))
+    tablas = [tabla for _, grupo in _TABLAS.values() for tabla in grupo]
+    con_movimientos = conexion.execute(union(*(select(t.c.usuario_id) for t in tablas))).scalars()
+    _marcar_sin_marcador(conexion, sorted(u for u in con_movimientos if u is not None))
+
+    valores = {"moneda": MONEDA_BASE, "fecha_ejecucion": datetime.now(timezone.utc)}
+    if inventario is None:
+        conexion.execute(insert(i).values(id=1, **valores))
+    else:
+        conexion.execute(update(i).where(i.c.id == 1).values(**valores))
+
+
+def _pendientes(db) -> List[int]:
+    """Usuarios del shard con bocetos por construir, según sus marcadores."""
+    e, i = EstadoDistribucion.__table__.c, InventarioDistribucion.__table__.c
+    pendientes = select(e.usuario_id).where(e.pendiente).order_by(e.usuario_id)
+    inventario = ejecutar(db, InventarioDistribucion, select(i.moneda).where(i.id == 1))
+    if inventario and inventario[0].moneda == MONEDA_BASE:
+        return [f.usuario_id for f in ejecutar(db, EstadoDistribucion, pendientes)]
+
+    with sesion_escritura(db) as escritura:
+        try:
+            _inventariar(escritura.connection())
+            escritura.commit()
+        except IntegrityError:
+            # Otra petición hizo el inventario al mismo tiempo
+            escritura.rollback()
+        return [f.usuario_id for f in ejecutar(escritura, EstadoDistribucion, pendientes)]
+
+
+def bocetos_shard(
+    db, tipo: str, desde: Optional[date] = None, hasta: Optional[date] = None, categoria: Optional[str] = None
+) -> Dict[str, Boceto]:
+    """Bocetos de todos los usuarios del shard de `db` combinados por categoría."""
+    faltan = _pendientes(db)
+    if faltan:
+        with sesion_escritura(db) as escritura:
+            construir(escritura.connection(), faltan)
+            escritura.commit()
+    return _leer(db, _condiciones(tipo, desde, hasta), categoria)
+
+
+def combinar_shards(partes: Iterable[Dict[str, Boceto]]) -> Dict[str, Boceto]:
+    """Suma por categoría los bocetos de varios shards."""
+    resultado: Dict[str, Boceto] = {}
+    for parte in partes:
+        for categoria, boceto in parte.items():
+            if categoria in resultado:
+                resultado[categoria].sumar(boceto)
+            else:
+                resultado[categoria] = boceto
+    return resultado
+
+
+# --- ACTUALIZACIÓN INCREMENTAL ---
+
+def _movimiento(obj, anterior: bool):
+    """((usuario_id, tipo, categoria, mes), (importe en MONEDA_BASE, id, fecha)) o None."""
+    tipo, categoria_attr, cantidad_attr, fecha_attr = _CAMPOS[type(obj)]
+    atributos = ("usuario_id", categoria_attr, cantidad_attr, fecha_attr, "moneda")
+    if anterior:
+        usuario_id, categoria, cantidad, fecha, moneda = valores_anteriores(obj, atributos)
+    else:
+        usuario_id, categoria, cantidad, fecha, moneda = (getattr(obj, a) for a in atributos)
+    if usuario_id is None or cantidad is None or fecha is None:
+        return None
+    importe = cantidad * obtener_snapshot().factor(moneda or MONEDA_BASE, MONEDA_BASE, fecha)
+    return (usuario_id, tipo, categoria or "", _mes(fecha)), (importe, obj.id, fecha)
+
+
+def aplicar_cambios(conexion, cambios: Dict[tuple, list]) -> None:
+    """Aplica {(usuario_id, tipo, categoria, mes): [(signo, importe, id, fecha), ...]} a los bocetos."""
+    e = EstadoDistribucion.__table__.c
+    usuarios = {clave[0] for clave in cambios}
+    marcadores = conexion.execute(
+        select(e.usuario_id, e.moneda, e.pendiente).where(e.usuario_id.in_(usuarios)).with_for_update()
+    ).all()
+    activos = {f.usuario_id for f in marcadores if not f.pendiente and f.moneda == MONEDA_BASE}
+    sin_marcador = usuarios - {f.usuario_id for f in marcadores}
+    if sin_marcador:
+        # Primeros movimientos: se construirán completos en la primera lectura
+        _marcar_sin_marcador(conexion, sorted(sin_marcador))
+    if not activos:
+        return
+
+    t = DistribucionMensual.__table__
+    meses = {clave[3] for clave in cambios if clave[0] in activos}
+    existentes = {
+        tuple(getattr(fila, k) for k in _CLAVE): fila
+        for fila in conexion.execute(
+            select(t).where(t.c.usuario_id.in_(activos), t.c.mes.in_(meses)).with_for_update()
+        )
+    }
+    for clave, movimientos in cambios.items():
+        if clave[0] not in activos:
+            continue
+        fila = existentes.get(clave)
+        boceto = Boceto.de_fila(fila) if fila is not None else Boceto()
+        boceto.aplicar(movimientos)
+
+        condicion = and_(*(t.c[k] == v for k, v in zip(_CLAVE, clave)))
+        if boceto.conteo <= 0:
+            if fila is not None:
+                conexion.execute(delete(t).where(condicion))
+        elif fila is None:
+            conexion.execute(insert(t).values(**dict(zip(_CLAVE, clave)), **boceto.columnas()))
+        else:
+            conexion.execute(update(t).where(condicion).values(**boceto.columnas()))
+
+
+@event.listens_for(Session, "after_flush")
+def _actualizar_distribuciones(session, flush_context):
+    # Como en el log de cambios: en after_flush los objetos nuevos ya tienen id y el
+    # historial de atributos todavía tiene los valores anteriores
+    cambios: Dict[tuple, list] = {}
+
+    def anotar(signo: int, movimiento) -> None:
+        if movimiento is not None:
+            clave, (importe, movimiento_id, fecha) = movimiento
+            cambios.setdefault(clave, []).append((signo, importe, movimiento_id, fecha))
+
+    for obj in session.new:
+        if type(obj) in _CAMPOS:
+            anotar(1, _movimiento(obj, anterior=False))
+    for obj in session.deleted:
+        if type(obj) in _CAMPOS:
+            anotar(-1, _movimiento(obj, anterior=True))
+    for obj in session.dirty:
+        if type(obj) in _CAMPOS and session.is_modified(obj):
+            antes, despues = _movimiento(obj, anterior=True), _movimiento(obj, anterior=False)
+            if antes != despues:
+                anotar(-1, antes)
+                anotar(1, despues)
+
+    if cambios:
+        aplicar_cambios(session.connection(), cambios)
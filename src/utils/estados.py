@@ -0,0 +1,179 @@
+"""
+Estados de cuenta mensuales: dónde se guardan y cómo se escriben (CSV y HTML imprimible).
+
+Los genera en bloque el job generar_estados. Las funciones de escritura corren en los
+procesos del pool, así que este módulo no toca la base de datos: recibe los totales
+por tipo ya convertidos a la moneda del estado.
+"""
+import csv
+import html
+import io
+import os
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+ESTADOS_DIR = Path(os.getenv("ESTADOS_DIR", "estados"))
+
+FORMATOS = {"csv": "text/csv; charset=utf-8", "html": "text/html; charset=utf-8"}
+
+# Subcarpetas de a lo sumo 1000 usuarios por periodo
+_USUARIOS_POR_CARPETA = 1000
+
+
+class DatosEstado(NamedTuple):
+    usuario_id: int
+    nombre: str
+    inversiones_por_tipo: Dict[str, float]
+    gastos_por_tipo: Dict[str, float]
+
+
+# --- RUTAS ---
+
+def _periodo(anio: int, mes: int) -> str:
+    return f"{anio:04d}-{mes:02d}"
+
+
+def ruta_estado(usuario_id: int, anio: int, mes: int, formato: str) -> Path:
+    carpeta = f"{usuario_id // _USUARIOS_POR_CARPETA:04d}"
+    return ESTADOS_DIR / _periodo(anio, mes) / carpeta / f"{usuario_id}.{formato}"
+
+
+def archivo_estado(usuario_id: int, anio: int, mes: int, formato: str) -> Optional[Path]:
+    """Ruta del estado ya generado, o None si no existe."""
+    ruta = ruta_estado(usuario_id, anio, mes, formato)
+    return ruta if ruta.is_file() else None
+
+
+def periodos_usuario(usuario_id: int) -> List[str]:
+    """Periodos ('aaaa-mm') con estado generado para el usuario, del más reciente al más antiguo."""
+    if not ESTADOS_DIR.is_dir():
+        return []
+    periodos = []
+    for directorio in sorted(ESTADOS_DIR.iterdir(), reverse=True):
+        try:
+            anio, mes = map(int, directorio.name.split("-"))
+        except ValueError:
+            continue
+        if archivo_estado(usuario_id, anio, mes, "csv") is not None:
+            periodos.append(directorio.name)
+    return periodos
+
+
+# --- CONTENIDO ---
+# Mismos cálculos que /analisis/resumen-mensual y /analisis/gastos-por-tipo
+
+def _por_tipo(totales: Dict[str, float]) -> List[Tuple[str, float, float]]:
+    total = sum(totales.values())
+    filas = [
+        (tipo, valor, round((valor / total * 100) if total > 0 else 0, 2))
+        for tipo, valor in totales.items()
+    ]
+    filas.sort(key=lambda fila: fila[1], reverse=True)
+    return filas
+
+
+def _resumen(datos: DatosEstado) -> Dict[str, float]:
+    total_inversiones = sum(datos.inversiones_por_tipo.values())
+    total_gastos = sum(datos.gastos_por_tipo.values())
+    balance = total_inversiones - total_gastos
+    porcentaje_ahorro = (balance / total_inversiones) * 100 if total_inversiones > 0 else 0.0
+    return {
+        "total_inversiones": total_inversiones,
+        "total_gastos": total_gastos,
+        "balance": balance,
+        "porcentaje_ahorro": round(porcentaje_ahorro, 2),
+    }
+
+
+def estado_csv(datos: DatosEstado, periodo: str, moneda: str) -> str:
+    salida = io.StringIO()
+    escritor = csv.writer(salida, lineterminator="\n")
+    escritor.writerow(["seccion", "concepto", "total", "porcentaje"])
+    escritor.writerow(["periodo", periodo, "", ""])
+    escritor.writerow(["moneda", moneda, "", ""])
+    for concepto, valor in _resumen(datos).items():
+        if concepto == "porcentaje_ahorro":
+            escritor.writerow(["resumen", concepto, "", f"{valor:.2f}"])
+        else:
+            escritor.writerow(["resumen", concepto, f"{valor:.2f}", ""])
+    for tipo, total, porcentaje in _por_tipo(datos.gastos_por_tipo):
+        escritor.writerow(["gasto", tipo, f"{total:.2f}", f"{porcentaje:.2f}"])
+    for tipo, total, porcentaje in _por_tipo(datos.inversiones_por_tipo):
+        escritor.writerow(["inversion", tipo, f"{total:.2f}", f"{porcentaje:.2f}"])
+    return salida.getvalue()
+
+
+_PLANTILLA_HTML = """<!DOCTYPE html>
+<html lang="es">
+<head>
+<meta charset="utf-8">
+<title>Estado de cuenta {periodo}</title>
+<style>
+  body {{ font-family: sans-serif; margin: 2em; color: #222; }}
+  table {{ border-collapse: collapse; width: 100%; margin-bottom: 1.5em; }}
+  th, td {{ border-bottom: 1px solid #ccc; padding: .3em .5em; text-align: left; }}
+  td.n {{ text-align: right; }}
+  @media print {{ body {{ margin: 0; }} }}
+</style>
+</head>
+<body>
+<h1>Estado de cuenta {periodo}</h1>
+<p>{nombre} · Moneda: {moneda}</p>
+<table>
+<tr><th>Inversiones</th><td class="n">{total_inversiones}</td></tr>
+<tr><th>Gastos</th><td class="n">{total_gastos}</td></tr>
+<tr><th>Balance</th><td class="n">{balance}</td></tr>
+<tr><th>Ahorro</th><td class="n">{porcentaje_ahorro} %</td></tr>
+</table>
+<h2>Gastos por tipo</h2>
+{gastos}
+<h2>Inversiones por tipo</h2>
+{inversiones}
+</body>
+</html>
+"""
+
+
+def _tabla_html(filas: List[Tuple[str, float, float]]) -> str:
+    if not filas:
+        return "<p>Sin movimientos.</p>"
+    cuerpo = "".join(
+        f'<tr><td>{html.escape(tipo)}</td><td class="n">{total:,.2f}</td><td class="n">{porcentaje:.2f} %</td></tr>'
+        for tipo, total, porcentaje in filas
+    )
+    return f"<table><tr><th>Tipo</th><th>Total</th><th>%</th></tr>{cuerpo}</table>"
+
+
+def estado_html(datos: DatosEstado, periodo: str, moneda: str) -> str:
+    resumen = _resumen(datos)
+    return _PLANTILLA_HTML.format(
+        periodo=periodo,
+        nombre=html.escape(datos.nombre),
+        moneda=moneda,
+        total_inversiones=f"{resumen['total_inversiones']:,.2f}",
+        total_gastos=f"{resumen['total_gastos']:,.2f}",
+        balance=f"{resumen['balance']:,.2f}",
+        porcentaje_ahorro=f"{resumen['porcentaje_ahorro']:.2f}",
+        gastos=_tabla_html(_por_tipo(datos.gastos_por_tipo)),
+        inversiones=_tabla_html(_por_tipo(datos.inversiones_por_tipo)),
+    )
+
+
+# --- ESCRITURA (en los procesos del pool) ---
+
+def _escribir(ruta: Path, contenido: str) -> None:
+    # Se escribe aparte y se renombra: una descarga nunca ve un archivo a medias
+    temporal = ruta.with_name(ruta.name + ".tmp")
+    temporal.write_text(contenido, encoding="utf-8")
+    os.replace(temporal, ruta)
+
+
+def escribir_lote(anio: int, mes: int, moneda: str, lote: List[DatosEstado]) -> int:
+    """Escribe el CSV y el HTML de cada usuario del lote; devuelve cuántos escribió."""
+    periodo = _periodo(anio, mes)
+    for datos in lote:
+        ruta_csv = ruta_estado(datos.usuario_id, anio, mes, "csv")
+        ruta_csv.parent.mkdir(parents=True, exist_ok=True)
+        _escribir(ruta_csv, estado_csv(datos, periodo, moneda))
+        _escribir(ruta_estado(datos.usuario_id, anio, mes, "html"), estado_html(datos, periodo, moneda))
+    return len(lote)
@@ -0,0 +1,55 @@
+"""
+Capa de lectura sin ORM para gastos e inversiones.
+
+Las rutas que solo leen no necesitan instancias de SQLModel: aquí se ejecuta un
+`select` de Core (columnas de la tabla, no atributos del modelo) directamente sobre la
+conexión de la sesión, así que no hay mapa de identidad, ni seguimiento de cambios,
+ni autoflush. Cada fila es una namedtuple (tupla con `__slots__ = ()`) con los campos
+del modelo de lectura, en su mismo orden; sirve tal cual para `respuesta_filas`.
+"""
+from collections import namedtuple
+from functools import lru_cache, partial
+from typing import List, Sequence, Type
+from pydantic import BaseModel
+from sqlalchemy import select, union_all
+
+
+@lru_cache(maxsize=None)
+def tipo_fila(modelo_lectura: Type[BaseModel]):
+    """Namedtuple con los campos de `modelo_lectura` (una por modelo, cacheada)."""
+    return namedtuple(f"Fila{modelo_lectura.__name__}", list(modelo_lectura.model_fields))
+
+
+def columnas_core(modelo_tabla, modelo_lectura: Type[BaseModel]) -> List:
+    """Columnas de la tabla (Core) en el orden de los campos de `modelo_lectura`."""
+    tabla = modelo_tabla.__table__
+    return [tabla.c[campo] for campo in modelo_lectura.model_fields]
+
+
+def consulta(modelo_tabla, modelo_lectura: Type[BaseModel], *condiciones):
+    """`select` de Core de las columnas de `modelo_lectura` con las condiciones dadas."""
+    return select(*columnas_core(modelo_tabla, modelo_lectura)).where(*condiciones)
+
+
+def _resultado(db, modelo_tabla, statement):
+    # connection() no hace flush y el resultado no pasa por el ORM
+    conexion = db.connection(bind_arguments={"mapper": modelo_tabla})
+    return conexion.execute(statement)
+
+
+def ejecutar(db, modelo_tabla, statement) -> list:
+    """Ejecuta un `select` de Core en la conexión que la sesión usa para `modelo_tabla`."""
+    return _resultado(db, modelo_tabla, statement).all()
+
+
+def leer_filas(db, modelo_lectura: Type[BaseModel], tablas: Sequence, condicion) -> list:
+    """
+    Filas de una o varias tablas con la misma forma (p. ej. una tabla y su archivo)
+    como namedtuples de `modelo_lectura`. `condicion(tabla)` devuelve el filtro de cada tabla.
+    """
+    partes = [consulta(tabla, modelo_lectura, condicion(tabla.__table__.c)) for tabla in tablas]
+    statement = partes[0] if len(partes) == 1 else union_all(*partes)
+    # Cada Row se convierte al vuelo (sin lista intermedia); tuple.__new__ evita
+    # la llamada en Python de namedtuple._make por fila
+    crear = partial(tuple.__new__, tipo_fila(modelo_lectura))
+    return list(map(crear, _resultado(db, tablas[0], statement)))
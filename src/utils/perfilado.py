@@ -0,0 +1,358 @@
+"""
+Perfilado bajo demanda de una sola petición.
+
+Una petición se perfila si trae la cabecera `X-Perfil` (o `?perfil=`) con:
+- `1`, y el token de la petición es de un admin; o
+- un token de perfilado emitido por un admin para ese usuario (POST /admin/perfiles/token),
+  para perfilar la llamada lenta de un usuario concreto.
+
+Mientras dura la petición:
+- un hilo toma muestras de la pila cada PERFIL_INTERVALO_MS y se queda con las de esta
+  petición: un endpoint async cuenta si corre en el event loop dentro de la tarea de la
+  petición (su pila pasa por este middleware); uno síncrono, si el hilo del threadpool lo
+  ejecuta con el contexto de la petición (el que anyio copia al hilo). Otras peticiones
+  simultáneas al mismo endpoint no entran en el perfil;
+- se anotan las sentencias SQL que ejecuta la petición, con su duración.
+
+Se escriben en PERFILES_DIR `<id>.speedscope.json` (abrir en https://www.speedscope.app)
+y `<id>.sql.json` (fuera del event loop). Sin la cabecera el middleware solo revisa si
+está y no hace nada más.
+"""
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+from jose import JWTError, jwt
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from src.dependencies import ADMIN_ROL, ALGORITHM, SECRET_KEY, usuario_opcional
+
+PERFILES_DIR = Path(os.getenv("PERFILES_DIR", "perfiles"))
+PERFIL_INTERVALO_MS = float(os.getenv("PERFIL_INTERVALO_MS", "2"))
+PERFILES_MAX = int(os.getenv("PERFILES_MAX", "200"))           # Los más antiguos se borran
+PERFILES_CONCURRENTES = int(os.getenv("PERFILES_CONCURRENTES", "2"))
+
+HEADER_PERFIL = b"x-perfil"
+_PARAMETRO_PERFIL = b"perfil="
+_AUDIENCIA_TOKEN = "perfil"
+_MAX_SQL = 2000
+_MAX_PARAMETROS = 500  # caracteres
+
+
+# --- TOKENS DE PERFILADO ---
+
+def emitir_token(usuario_id: int, minutos: int) -> Tuple[str, datetime]:
+    """Token que autoriza a perfilar las peticiones de `usuario_id` durante `minutos`."""
+    expira = datetime.now(timezone.utc) + timedelta(minutes=minutos)
+    token = jwt.encode(
+        {"aud": _AUDIENCIA_TOKEN, "sub": str(usuario_id), "exp": expira},
+        SECRET_KEY,
+        algorithm=ALGORITHM
+    )
+    return token, expira
+
+
+def _autorizado(valor: str, autorizacion: Optional[str]) -> Optional[dict]:
+    """Usuario de la petición si puede perfilarse, o None."""
+    usuario = usuario_opcional(autorizacion)
+    if usuario is None:
+        return None
+    if valor == "1":
+        return usuario if usuario["rol"] == ADMIN_ROL else None
+    try:
+        payload = jwt.decode(valor, SECRET_KEY, algorithms=[ALGORITHM], audience=_AUDIENCIA_TOKEN)
+    except JWTError:
+        return None
+    return usuario if payload.get("sub") == str(usuario["id"]) else None
+
+
+# --- CAPTURA ---
+
+class Perfil:
+    """Muestras y SQL de una petición en curso."""
+
+    def __init__(self, scope: dict, usuario: dict, marco=None):
+        self.id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S") + "-" + uuid.uuid4().hex[:8]
+        self.scope = scope
+        self.usuario = usuario
+        self.inicio = time.perf_counter()
+        self.fin: Optional[float] = None
+        self.estado: Optional[int] = None
+        self.frames: List[dict] = []
+        self._indices: Dict[tuple, int] = {}
+        self.muestras: List[List[int]] = []
+        self.pesos: List[float] = []
+        self.sql: List[dict] = []
+        # Hilo del event loop y marco del middleware en la tarea de la petición
+        self._hilo_loop = threading.get_ident()
+        self._marco = marco
+        self._endpoints: Dict[object, bool] = {}  # marco del endpoint -> es de esta petición
+        self._detener = threading.Event()
+        self._hilo = threading.Thread(target=self._muestrear, name=f"perfil-{self.id}", daemon=True)
+
+    def _indice(self, code) -> int:
+        clave = (code.co_filename, code.co_firstlineno, code.co_name)
+        indice = self._indices.get(clave)
+        if indice is None:
+            indice = self._indices[clave] = len(self.frames)
+            self.frames.append({
+                "name": getattr(code, "co_qualname", code.co_name),
+                "file": code.co_filename,
+                "line": code.co_firstlineno,
+            })
+        return indice
+
+    def _muestrear(self) -> None:
+        intervalo = PERFIL_INTERVALO_MS / 1000
+        propio = threading.get_ident()
+        anterior = time.perf_counter()
+        while not self._detener.wait(intervalo):
+            ahora = time.perf_counter()
+            endpoint = self.scope.get("endpoint")
+            codigo = getattr(endpoint, "__code__", None)
+            if codigo is None:
+                # Todavía no se resolvió la ruta
+                anterior = ahora
+                continue
+            for hilo, frame in sys._current_frames().items():
+                if hilo == propio:
+                    continue
+                pila = []
+                endpoint = None
+                while frame is not None:
+                    if endpoint is None and frame.f_code is codigo:
+                        endpoint = len(pila)
+                    pila.append(frame)
+                    frame = frame.f_back
+                if endpoint is not None and self._es_de_la_peticion(hilo, pila, endpoint):
+                    self.muestras.append([self._indice(f.f_code) for f in reversed(pila)])
+                    self.pesos.append((ahora - anterior) * 1000)
+            anterior = ahora
+
+    def _es_de_la_peticion(self, hilo: int, pila: list, endpoint: int) -> bool:
+        """Si la pila (del marco actual hacia afuera) que ejecuta el endpoint es de esta petición."""
+        if hilo == self._hilo_loop:
+            # Endpoint async: corre en la tarea de la petición, que pasa por el middleware
+            return any(f is self._marco for f in pila)
+        marco = pila[endpoint]
+        propio = self._endpoints.get(marco)
+        if propio is None:
+            # Endpoint síncrono: quien lo llama en el hilo del threadpool tiene el contexto
+            # copiado de la petición, con este perfil en _perfil_actual
+            propio = self._endpoints[marco] = any(
+                isinstance(valor, contextvars.Context) and valor.get(_perfil_actual) is self
+                for f in pila[endpoint + 1:]
+                for valor in list(f.f_locals.values())
+            )
+        return propio
+
+    def iniciar(self) -> None:
+        self._hilo.start()
+
+    def terminar(self, estado: Optional[int]) -> None:
+        self.fin = time.perf_counter()
+        self.estado = estado
+        self._detener.set()
+        self._hilo.join()
+        self._marco = None
+        self._endpoints.clear()
+
+    # --- Archivos ---
+
+    def _nombre(self) -> str:
+        return f"{self.scope.get('method', '')} {self.scope.get('path', '')}"
+
+    def speedscope(self) -> dict:
+        duracion = (self.fin - self.inicio) * 1000
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": self._nombre(),
+            "exporter": "FINANZAS_PROYECT",
+            "activeProfileIndex": 0,
+            "shared": {"frames": self.frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": self._nombre(),
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": duracion,
+                "samples": self.muestras,
+                "weights": self.pesos,
+            }],
+        }
+
+    def resumen(self) -> dict:
+        return {
+            "id": self.id,
+            "metodo": self.scope.get("method"),
+            "ruta": self.scope.get("path"),
+            "query": self.scope.get("query_string", b"").decode("latin-1"),
+            "usuario_id": self.usuario["id"],
+            "estado": self.estado,
+            "duracion_ms": round((self.fin - self.inicio) * 1000, 3),
+            "muestras": len(self.muestras),
+            "sql_total": len(self.sql),
+            "sql_ms": round(sum(s["duracion_ms"] for s in self.sql), 3),
+            "sql": self.sql,
+        }
+
+    def guardar(self) -> None:
+        PERFILES_DIR.mkdir(parents=True, exist_ok=True)
+        (PERFILES_DIR / f"{self.id}.speedscope.json").write_text(json.dumps(self.speedscope()), encoding="utf-8")
+        (PERFILES_DIR / f"{self.id}.sql.json").write_text(
+            json.dumps(self.resumen(), ensure_ascii=False, indent=2, default=str), encoding="utf-8"
+        )
+        _podar()
+
+
+def _podar() -> None:
+    perfiles = sorted(PERFILES_DIR.glob("*.sql.json"))
+    for viejo in perfiles[:max(0, len(perfiles) - PERFILES_MAX)]:
+        perfil_id = viejo.name[:-len(".sql.json")]
+        viejo.unlink(missing_ok=True)
+        (PERFILES_DIR / f"{perfil_id}.speedscope.json").unlink(missing_ok=True)
+
+
+# --- SQL ---
+# Los listeners solo están registrados mientras hay alguna petición perfilándose.
+# El contextvar llega también a los hilos del threadpool (y a las consultas en paralelo
+# por shard), así que solo se anota el SQL de la petición perfilada.
+
+_perfil_actual: contextvars.ContextVar[Optional[Perfil]] = contextvars.ContextVar("perfil_actual", default=None)
+_activos = 0
+_activos_lock = threading.Lock()
+
+
+def _antes_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    if _perfil_actual.get() is not None:
+        conn.info.setdefault("_perfil_inicio", []).append(time.perf_counter())
+
+
+def _despues_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    perfil = _perfil_actual.get()
+    inicios = conn.info.get("_perfil_inicio")
+    if perfil is None or not inicios:
+        return
+    duracion = (time.perf_counter() - inicios.pop()) * 1000
+    if len(perfil.sql) < _MAX_SQL:
+        perfil.sql.append({
+            "sql": statement,
+            "parametros": repr(parameters)[:_MAX_PARAMETROS],
+            "duracion_ms": round(duracion, 3),
+            "filas": cursor.rowcount,
+            "base": conn.engine.url.render_as_string(hide_password=True),
+        })
+
+
+def _activar_sql() -> bool:
+    global _activos
+    with _activos_lock:
+        if _activos >= PERFILES_CONCURRENTES:
+            return False
+        if _activos == 0:
+            event.listen(Engine, "before_cursor_execute", _antes_de_ejecutar)
+            event.listen(Engine, "after_cursor_execute", _despues_de_ejecutar)
+        _activos += 1
+        return True
+
+
+def _desactivar_sql() -> None:
+    global _activos
+    with _activos_lock:
+        _activos -= 1
+        if _activos == 0:
+            event.remove(Engine, "before_cursor_execute", _antes_de_ejecutar)
+            event.remove(Engine, "after_cursor_execute", _despues_de_ejecutar)
+
+
+# --- MIDDLEWARE ---
+
+def _valor_perfil(scope: dict) -> Optional[str]:
+    for nombre, valor in scope["headers"]:
+        if nombre == HEADER_PERFIL:
+            return valor.decode("latin-1")
+    query = scope.get("query_string", b"")
+    if _PARAMETRO_PERFIL in query:
+        valores = parse_qs(query.decode("latin-1")).get("perfil")
+        if valores:
+            return valores[0]
+    return None
+
+
+def _autorizacion(scope: dict) -> Optional[str]:
+    for nombre, valor in scope["headers"]:
+        if nombre == b"authorization":
+            return valor.decode("latin-1")
+    return None
+
+
+class MiddlewarePerfil:
+    """Middleware ASGI: perfila la petición solo si trae X-Perfil válido."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        valor = _valor_perfil(scope)
+        if valor is None:
+            return await self.app(scope, receive, send)
+
+        usuario = _autorizado(valor, _autorizacion(scope))
+        if usuario is None or not _activar_sql():
+            # Sin permiso o con demasiados perfiles en curso: la petición sigue sin perfilar
+            return await self.app(scope, receive, send)
+
+        perfil = Perfil(scope, usuario, sys._getframe())
+        estado = {}
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                estado["codigo"] = mensaje["status"]
+                mensaje.setdefault("headers", []).append((b"x-perfil-id", perfil.id.encode()))
+            await send(mensaje)
+
+        token = _perfil_actual.set(perfil)
+        perfil.iniciar()
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            perfil.terminar(estado.get("codigo"))
+            _perfil_actual.reset(token)
+            _desactivar_sql()
+            await run_in_threadpool(perfil.guardar)
+            print(f"🔬 Perfil {perfil.id} guardado ({perfil._nombre()}, {len(perfil.muestras)} muestras, {len(perfil.sql)} SQL)")
+
+
+# --- CONSULTA DE PERFILES ---
+
+def listar_perfiles() -> List[dict]:
+    """Resumen (sin las sentencias) de los perfiles guardados, del más reciente al más antiguo."""
+    if not PERFILES_DIR.is_dir():
+        return []
+    resultado = []
+    for archivo in sorted(PERFILES_DIR.glob("*.sql.json"), reverse=True):
+        try:
+            datos = json.loads(archivo.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+        datos.pop("sql", None)
+        resultado.append(datos)
+    return resultado
+
+
+def archivo_perfil(perfil_id: str, tipo: str) -> Optional[Path]:
+    """Ruta del archivo `speedscope` o `sql` de un perfil, o None si no existe."""
+    if not perfil_id.replace("-", "").isalnum():
+        return None
+    ruta = PERFILES_DIR / f"{perfil_id}.{tipo}.json"
+    return ruta if ruta.is_file() else None
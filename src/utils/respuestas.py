@@ -0,0 +1,67 @@
+import json
+import math
+from typing import Iterable, List, Sequence, Type
+from fastapi import Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional: sin él se usa json de la librería estándar
+    orjson = None
+
+
+def columnas_de(modelo_tabla, modelo_lectura: Type[BaseModel]) -> List:
+    """Columnas de `modelo_tabla` en el mismo orden que los campos de `modelo_lectura`."""
+    return [getattr(modelo_tabla, campo) for campo in modelo_lectura.model_fields]
+
+
+def _float_compatible(valor: float) -> bool:
+    # orjson y json.dumps escriben igual los floats salvo en notación exponencial
+    # (1e16 vs 1e+16) y en NaN/Infinity; esos casos se delegan a json.dumps.
+    return valor == 0 or 1e-4 <= abs(valor) < 1e16
+
+
+def _json_estandar(registros: list) -> bytes:
+    # Mismas opciones que fastapi.responses.JSONResponse
+    return json.dumps(
+        registros,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def filas_a_json(modelo_lectura: Type[BaseModel], filas: Iterable[Sequence]) -> bytes:
+    """
+    Codifica tuplas de columnas (en el orden de `modelo_lectura`) como una lista JSON
+    idéntica byte a byte a la que produce FastAPI con `response_model=List[modelo_lectura]`,
+    pero sin validar cada fila con pydantic.
+    """
+    campos = list(modelo_lectura.model_fields)
+    indices_float = [i for i, info in enumerate(modelo_lectura.model_fields.values()) if info.annotation is float]
+
+    registros = []
+    compatible = orjson is not None
+    for fila in filas:
+        if compatible:
+            for i in indices_float:
+                valor = fila[i]
+                if valor is not None and not _float_compatible(valor):
+                    compatible = False
+                    break
+        registros.append(dict(zip(campos, fila)))
+
+    if compatible:
+        return orjson.dumps(registros)
+    # json.dumps necesita fechas en texto, como las deja jsonable_encoder
+    for registro in registros:
+        for campo, valor in registro.items():
+            if hasattr(valor, "isoformat"):
+                registro[campo] = valor.isoformat()
+    return _json_estandar(registros)
+
+
+def respuesta_filas(modelo_lectura: Type[BaseModel], filas: Iterable[Sequence]) -> Response:
+    """Response JSON para listas grandes leídas como tuplas (ver `filas_a_json`)."""
+    return Response(content=filas_a_json(modelo_lectura, filas), media_type="application/json")
@@ -0,0 +1,305 @@
+from array import array
+from collections import OrderedDict
+from datetime import date, timedelta
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import LargeBinary, cast, event, func, literal, inspect as sa_inspect
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+from src.config.tipo_cambio import MONEDA_BASE, obtener_snapshot
+from src.models.gasto import Gasto
+from src.models.inversion import Inversion
+from src.models.serie_saldo import SerieSaldo
+from src.utils.agregados import grupos
+from src.utils.shards import sesion_escritura
+
+# Serie diaria de saldos acumulados por usuario (sumas prefijas), en MONEDA_BASE.
+# Con ella cualquier rango [desde, hasta] se resuelve con dos lecturas:
+# acumulado(hasta) - acumulado(desde - 1 día).
+# Se construye la primera vez que se consulta y después se actualiza en el mismo
+# flush que crea, modifica o elimina gastos e inversiones.
+#
+# Concurrencia: la construcción deja primero una fila pendiente (moneda vacía) y
+# luego suma los movimientos con esa fila bloqueada; cada escritura del usuario sube
+# `version` aunque la serie esté pendiente, y la construcción solo se guarda si la
+# versión no cambió mientras sumaba (si cambió, se repite).
+
+# modelo -> (posición dentro del par intercalado, atributo de cantidad, atributo de fecha)
+_CAMPOS = {
+    Inversion: (0, "cantidad_inversion", "fecha_inversion"),
+    Gasto: (1, "cantidad_gasto", "fecha_gasto"),
+}
+
+_MAX_SERIES_EN_CACHE = 1024
+_BYTES_DIA = 16                  # Dos float64 por día
+_INTENTOS_CONSTRUCCION = 3
+
+_tabla = SerieSaldo.__table__
+
+
+class Serie:
+    """Serie decodificada en memoria; `acumulado` y `rango` son O(1)."""
+
+    __slots__ = ("fecha_inicio", "valores", "moneda")
+
+    def __init__(self, fecha_inicio: Optional[date], valores: array, moneda: str):
+        self.fecha_inicio = fecha_inicio
+        self.valores = valores
+        self.moneda = moneda
+
+    @property
+    def dias(self) -> int:
+        return len(self.valores) // 2
+
+    def acumulado(self, fecha: date) -> Tuple[float, float]:
+        """(inversiones, gastos) acumulados hasta `fecha` inclusive."""
+        if not self.dias or fecha < self.fecha_inicio:
+            return 0.0, 0.0
+        i = min((fecha - self.fecha_inicio).days, self.dias - 1)
+        return self.valores[2 * i], self.valores[2 * i + 1]
+
+    def rango(self, desde: date, hasta: date) -> Tuple[float, float]:
+        """(inversiones, gastos) del rango [desde, hasta], ambos inclusive."""
+        inv_hasta, gastos_hasta = self.acumulado(hasta)
+        inv_antes, gastos_antes = self.acumulado(desde - timedelta(days=1))
+        return inv_hasta - inv_antes, gastos_hasta - gastos_antes
+
+
+def aplicar_deltas(
+    fecha_inicio: Optional[date],
+    valores: array,
+    deltas: Dict[date, List[float]]
+) -> Tuple[Optional[date], array]:
+    """
+    Suma `deltas` {fecha: [inversiones, gastos]} a la serie acumulada, extendiéndola
+    hacia atrás o hacia adelante si hace falta. Devuelve (fecha_inicio, valores).
+    """
+    fechas = sorted(f for f, d in deltas.items() if d[0] or d[1])
+    if not fechas:
+        return fecha_inicio, valores
+
+    if not valores:
+        fecha_inicio = fechas[0]
+    elif fechas[0] < fecha_inicio:
+        # Días anteriores al inicio: acumulado 0
+        faltantes = (fecha_inicio - fechas[0]).days
+        valores = array("d", bytes(16 * faltantes)) + valores
+        fecha_inicio = fechas[0]
+
+    necesarios = (fechas[-1] - fecha_inicio).days + 1
+    dias = len(valores) // 2
+    if necesarios > dias:
+        # Días posteriores al final: se repite el último acumulado
+        ultimo = valores[-2:] if valores else array("d", [0.0, 0.0])
+        valores.extend(ultimo * (necesarios - dias))
+
+    por_indice = {(f - fecha_inicio).days: deltas[f] for f in fechas}
+    inversiones = gastos = 0.0
+    for i in range(min(por_indice), len(valores) // 2):
+        delta = por_indice.get(i)
+        if delta:
+            inversiones += delta[0]
+            gastos += delta[1]
+        valores[2 * i] += inversiones
+        valores[2 * i + 1] += gastos
+    return fecha_inicio, valores
+
+
+def construir_serie(db, usuario_id: int) -> SerieSaldo:
+    """Calcula la serie completa del usuario a partir de sumas agrupadas por (moneda, fecha)."""
+    snapshot = obtener_snapshot()
+    deltas: Dict[date, List[float]] = {}
+    for modelo, (posicion, _, _) in _CAMPOS.items():
+        for _, moneda, fecha, total in grupos(db, modelo, usuario_id, por_dia=True):
+            delta = deltas.setdefault(fecha, [0.0, 0.0])
+            delta[posicion] += total * snapshot.factor(moneda, MONEDA_BASE, fecha)
+
+    fecha_inicio, valores = aplicar_deltas(None, array("d"), deltas)
+    return SerieSaldo(
+        usuario_id=usuario_id,
+        moneda=MONEDA_BASE,
+        fecha_inicio=fecha_inicio or date.today(),
+        datos=valores.tobytes()
+    )
+
+
+def _decodificar(fila: SerieSaldo) -> Serie:
+    valores = array("d")
+    valores.frombytes(fila.datos)
+    return Serie(fila.fecha_inicio if valores else None, valores, fila.moneda)
+
+
+_cache: "OrderedDict[int, Tuple[int, Serie]]" = OrderedDict()
+_cache_lock = Lock()
+
+
+def _construir(db, usuario_id: int) -> Tuple[Optional[int], Serie]:
+    """
+    Construye la serie en el primario del shard de `db` y la guarda con compare-and-set
+    sobre `version`. Devuelve (versión guardada, serie); la versión es None si escrituras
+    concurrentes impidieron guardarla en todos los intentos (la serie sí es correcta).
+    """
+    # La sesión de lectura puede ser una réplica: la serie se construye en el primario del shard
+    with sesion_escritura(db) as escritura:
+        if escritura.get(SerieSaldo, usuario_id) is None:
+            # Fila pendiente: desde aquí cada escritura del usuario sube su versión
+            escritura.add(SerieSaldo(usuario_id=usuario_id, moneda="", fecha_inicio=date.today(), datos=b""))
+            try:
+                escritura.commit()
+            except IntegrityError:
+                # Otra petición la creó al mismo tiempo
+                escritura.rollback()
+
+        for _ in range(_INTENTOS_CONSTRUCCION):
+            # El bloqueo detiene las escrituras del usuario mientras se suman sus movimientos
+            version = escritura.exec(
+                select(SerieSaldo.version).where(SerieSaldo.usuario_id == usuario_id).with_for_update()
+            ).one()
+            fila = construir_serie(escritura, usuario_id)
+            guardada = escritura.execute(
+                _tabla.update()
+                .where(_tabla.c.usuario_id == usuario_id, _tabla.c.version == version)
+                .values(moneda=fila.moneda, fecha_inicio=fila.fecha_inicio, datos=fila.datos, version=version + 1)
+            ).rowcount
+            if guardada:
+                escritura.commit()
+                return version + 1, _decodificar(fila)
+            # Una escritura concurrente cambió los movimientos mientras se sumaban
+            escritura.rollback()
+    return None, _decodificar(fila)
+
+
+def obtener_serie(db, usuario_id: int) -> Serie:
+    """
+    Devuelve la serie del usuario. Solo se lee el blob si cambió la versión
+    respecto de la copia en memoria; si no existe se construye en el primario.
+    """
+    cabecera = db.exec(
+        select(SerieSaldo.version, SerieSaldo.moneda).where(SerieSaldo.usuario_id == usuario_id)
+    ).first()
+
+    if cabecera is not None and cabecera.moneda == MONEDA_BASE:
+        with _cache_lock:
+            en_cache = _cache.get(usuario_id)
+            if en_cache is not None and en_cache[0] == cabecera.version:
+                _cache.move_to_end(usuario_id)
+                return en_cache[1]
+        fila = db.exec(select(SerieSaldo).where(SerieSaldo.usuario_id == usuario_id)).one()
+        version, serie = fila.version, _decodificar(fila)
+    else:
+        version, serie = _construir(db, usuario_id)
+        if version is None:
+            return serie
+
+    with _cache_lock:
+        _cache[usuario_id] = (version, serie)
+        _cache.move_to_end(usuario_id)
+        while len(_cache) > _MAX_SERIES_EN_CACHE:
+            _cache.popitem(last=False)
+    return serie
+
+
+# --- ACTUALIZACIÓN INCREMENTAL ---
+
+def valores_anteriores(obj, atributos) -> tuple:
+    """Valores de los atributos tal como estaban en la base antes de este flush."""
+    estado = sa_inspect(obj)
+    valores = []
+    for atributo in atributos:
+        historial = estado.attrs[atributo].history
+        if historial.deleted:
+            valores.append(historial.deleted[0])
+        elif historial.unchanged:
+            valores.append(historial.unchanged[0])
+        else:
+            valores.append(getattr(obj, atributo))
+    return tuple(valores)
+
+
+def _movimiento(obj, anterior: bool):
+    """(usuario_id, fecha, posición, importe en MONEDA_BASE) de un gasto/inversión, o None."""
+    posicion, cantidad_attr, fecha_attr = _CAMPOS[type(obj)]
+    atributos = ("usuario_id", cantidad_attr, fecha_attr, "moneda")
+    if anterior:
+        usuario_id, cantidad, fecha, moneda = valores_anteriores(obj, atributos)
+    else:
+        usuario_id, cantidad, fecha, moneda = (getattr(obj, a) for a in atributos)
+    if usuario_id is None or cantidad is None or fecha is None:
+        return None
+    factor = obtener_snapshot().factor(moneda or MONEDA_BASE, MONEDA_BASE, fecha)
+    return usuario_id, fecha, posicion, cantidad * factor
+
+
+@event.listens_for(Session, "before_flush")
+def _actualizar_series(session, flush_context, instances):
+    cambios = []  # (signo, movimiento)
+    for obj in session.new:
+        if type(obj) in _CAMPOS:
+            cambios.append((1, _movimiento(obj, anterior=False)))
+    for obj in session.deleted:
+        if type(obj) in _CAMPOS:
+            cambios.append((-1, _movimiento(obj, anterior=True)))
+    for obj in session.dirty:
+        if type(obj) in _CAMPOS and session.is_modified(obj):
+            antes, despues = _movimiento(obj, anterior=True), _movimiento(obj, anterior=False)
+            if antes != despues:
+                cambios.append((-1, antes))
+                cambios.append((1, despues))
+
+    deltas: Dict[int, Dict[date, List[float]]] = {}
+    for signo, movimiento in cambios:
+        if movimiento is None:
+            continue
+        usuario_id, fecha, posicion, importe = movimiento
+        delta = deltas.setdefault(usuario_id, {}).setdefault(fecha, [0.0, 0.0])
+        delta[posicion] += signo * importe
+
+    for usuario_id, por_fecha in deltas.items():
+        cabecera = session.execute(
+            select(SerieSaldo.moneda, SerieSaldo.fecha_inicio, func.length(SerieSaldo.datos).label("longitud"))
+            .where(SerieSaldo.usuario_id == usuario_id)
+            .with_for_update()
+        ).first()
+        if cabecera is None:
+            # Todavía no se ha consultado: se construirá completa en la primera lectura
+            continue
+        if cabecera.moneda != MONEDA_BASE:
+            # Pendiente de construir: basta con invalidar la construcción en curso
+            valores = {}
+        else:
+            valores = _parchear(session, usuario_id, cabecera.fecha_inicio, cabecera.longitud // _BYTES_DIA, por_fecha)
+        session.execute(
+            _tabla.update()
+            .where(_tabla.c.usuario_id == usuario_id)
+            .values(**valores, version=_tabla.c.version + 1)
+        )
+
+
+def _parchear(session, usuario_id: int, fecha_inicio: date, dias: int, deltas: Dict[date, List[float]]) -> dict:
+    """
+    Columnas a actualizar para sumar `deltas` a la serie guardada. Solo se lee y se
+    reescribe la cola desde el primer día afectado; la serie entera únicamente si
+    hay que extenderla hacia atrás.
+    """
+    fechas = [f for f, d in deltas.items() if d[0] or d[1]]
+    if not fechas:
+        return {}
+    primera = min(fechas)
+
+    if not dias or primera < fecha_inicio:
+        datos = session.execute(select(SerieSaldo.datos).where(SerieSaldo.usuario_id == usuario_id)).scalar_one()
+        valores = array("d")
+        valores.frombytes(datos)
+        nuevo_inicio, valores = aplicar_deltas(fecha_inicio if valores else None, valores, deltas)
+        return {"fecha_inicio": nuevo_inicio, "datos": valores.tobytes()}
+
+    # La cola empieza en el primer día afectado (o en el último guardado, para extenderla)
+    desde = min((primera - fecha_inicio).days, dias - 1)
+    offset = desde * _BYTES_DIA
+    cola = array("d")
+    cola.frombytes(session.execute(
+        select(func.substr(SerieSaldo.datos, offset + 1, type_=LargeBinary)).where(SerieSaldo.usuario_id == usuario_id)
+    ).scalar_one())
+    _, cola = aplicar_deltas(fecha_inicio + timedelta(days=desde), cola, deltas)
+    prefijo = func.substr(_tabla.c.datos, 1, offset, type_=LargeBinary)
+    return {"datos": cast(prefijo.concat(literal(cola.tobytes(), LargeBinary)), LargeBinary)}
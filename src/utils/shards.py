@@ -0,0 +1,197 @@
+"""
+Particionado de gastos e inversiones por usuario en varias bases (shards).
+
+- El mapa usuario -> shard vive en la base principal (tabla shard_usuario) y cada
+  proceso lo cachea SHARD_MAPA_TTL segundos.
+- La sesión de un usuario manda sus movimientos (y la serie de saldos y el log de
+  cambios) a su shard; usuarios y mapa siguen en la base principal.
+- Las consultas de administración sobre todos los usuarios se lanzan en paralelo,
+  una sesión por shard, y el llamador combina los resultados.
+
+Sin DATABASE_SHARD_URLS hay un único shard, la base principal, y nada cambia.
+"""
+import contextvars
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Callable, Dict, List, Optional, Tuple, TypeVar
+from sqlalchemy import inspect
+from sqlalchemy.schema import CreateIndex, CreateTable
+from sqlmodel import Session
+from src.config.busqueda import inicializar_indice
+from src.config.db import engine, engines_consultas, opciones_pool_consultas, shard_engines, shard_urls
+from src.models.anomalia import AnomaliaGasto, EstadoAnomalias
+from src.models.cambio import CambioMovimiento, EstadoSync
+from src.models.distribucion import DistribucionMensual, EstadoDistribucion, InventarioDistribucion
+from src.models.gasto import Gasto, GastoArchivo
+from src.models.inversion import Inversion, InversionArchivo
+from src.models.item import Item
+from src.models.regla_categoria import ReglaCategoria
+from src.models.resumen_archivo import ResumenArchivo
+from src.models.serie_saldo import SerieSaldo
+from src.models.shard import ACTIVO, ShardUsuario
+
+T = TypeVar("T")
+
+SHARDING = bool(shard_urls)
+N_SHARDS = len(shard_engines)
+
+# Segundos que un proceso puede tardar en ver un cambio del mapa
+SHARD_MAPA_TTL = float(os.getenv("SHARD_MAPA_TTL", "2"))
+
+# Tablas que viven en cada shard; las demás quedan en la base principal
+TABLAS_SHARD = [
+    Gasto.__table__,
+    Inversion.__table__,
+    GastoArchivo.__table__,
+    InversionArchivo.__table__,
+    ResumenArchivo.__table__,
+    SerieSaldo.__table__,
+    CambioMovimiento.__table__,
+    EstadoSync.__table__,
+    AnomaliaGasto.__table__,
+    EstadoAnomalias.__table__,
+    DistribucionMensual.__table__,
+    EstadoDistribucion.__table__,
+    InventarioDistribucion.__table__,
+]
+
+_MAX_USUARIOS_EN_CACHE = 100_000
+
+_mapa: Dict[int, Tuple[int, str, float]] = {}
+_mapa_lock = Lock()
+_pool = ThreadPoolExecutor(max_workers=N_SHARDS, thread_name_prefix="shard")
+# Tantos hilos como conexiones en el pool de consultas: ninguno espera por una conexión
+_pool_consultas = ThreadPoolExecutor(
+    max_workers=opciones_pool_consultas()["pool_size"], thread_name_prefix="consulta"
+)
+
+
+# --- MAPA ---
+
+def leer_ubicacion(db, usuario_id: int) -> Tuple[int, str]:
+    """(shard, estado) del usuario según el mapa, sin caché. `db` es de la base principal."""
+    fila = db.get(ShardUsuario, usuario_id)
+    if fila is None:
+        return 0, ACTIVO
+    return fila.shard, fila.estado
+
+
+def ubicacion(usuario_id: int) -> Tuple[int, str]:
+    """(shard, estado) del usuario, usando la caché del proceso."""
+    if not SHARDING:
+        return 0, ACTIVO
+
+    ahora = time.monotonic()
+    with _mapa_lock:
+        en_cache = _mapa.get(usuario_id)
+    if en_cache is not None and en_cache[2] > ahora:
+        return en_cache[0], en_cache[1]
+
+    with Session(engine) as db:
+        shard, estado = leer_ubicacion(db, usuario_id)
+
+    with _mapa_lock:
+        if len(_mapa) >= _MAX_USUARIOS_EN_CACHE:
+            for clave, (_, _, vence) in list(_mapa.items()):
+                if vence <= ahora:
+                    del _mapa[clave]
+        _mapa[usuario_id] = (shard, estado, ahora + SHARD_MAPA_TTL)
+    return shard, estado
+
+
+def olvidar(usuario_id: int) -> None:
+    """Descarta la entrada en caché (el mapa cambió en este proceso)."""
+    with _mapa_lock:
+        _mapa.pop(usuario_id, None)
+
+
+def asignar_shard(db, usuario_id: int) -> int:
+    """Fija el shard de un usuario nuevo; `db` es una sesión de la base principal (sin commit)."""
+    shard = usuario_id % N_SHARDS
+    if SHARDING:
+        db.add(ShardUsuario(usuario_id=usuario_id, shard=shard))
+    return shard
+
+
+# --- SESIONES ---
+
+def sesion(shard: int, principal=None, consultas: bool = False) -> Session:
+    """
+    Sesión cuyos movimientos van al shard indicado y los usuarios, el mapa y las reglas
+    de categoría a `principal` (la base principal o una de sus réplicas).
+    Con `consultas` usa los pools de consultas paralelas de esas mismas bases.
+    El shard queda en `session.info["shard"]`.
+    """
+    principal = principal or engine
+    info = {"shard": shard, "principal": principal}
+    shard_engine = shard_engines[shard]
+    if consultas:
+        principal, shard_engine = engines_consultas[principal], engines_consultas[shard_engine]
+    if not SHARDING:
+        return Session(principal, info=info)
+    return Session(
+        bind=shard_engine,
+        binds={Item: principal, ShardUsuario: principal, ReglaCategoria: principal},
+        info=info
+    )
+
+
+def sesion_escritura(db) -> Session:
+    """Sesión nueva sobre el primario del mismo shard que `db` (que puede ser de réplica)."""
+    return sesion(db.info.get("shard", 0))
+
+
+def en_todos(funcion: Callable[[Session], T]) -> List[T]:
+    """
+    Ejecuta `funcion(sesion)` en todos los shards a la vez; resultados en orden de shard.
+    Las sesiones son del pool de consultas paralelas (ver src/config/db.py).
+    """
+    def ejecutar(shard: int) -> T:
+        with sesion(shard, consultas=True) as db:
+            return funcion(db)
+
+    if N_SHARDS == 1:
+        return [ejecutar(0)]
+    # Cada tarea lleva el contexto de la petición (p. ej. el perfilado de SQL)
+    futuros = [_pool.submit(contextvars.copy_context().run, ejecutar, shard) for shard in range(N_SHARDS)]
+    return [futuro.result() for futuro in futuros]
+
+
+def en_paralelo(db, *funciones: Callable[[Session], T]) -> List[T]:
+    """
+    Ejecuta las `funciones(sesion)` a la vez, cada una con su propia sesión (y conexión)
+    sobre las mismas bases que `db`; la primera usa `db`. Resultados en el mismo orden.
+    Las demás toman sus conexiones del pool de consultas paralelas, no del de peticiones.
+    """
+    def ejecutar(funcion: Callable[[Session], T]) -> T:
+        with sesion(db.info.get("shard", 0), db.info.get("principal"), consultas=True) as otra:
+            return funcion(otra)
+
+    futuros = [_pool_consultas.submit(contextvars.copy_context().run, ejecutar, f) for f in funciones[1:]]
+    return [funciones[0](db), *(futuro.result() for futuro in futuros)] if funciones else []
+
+
+# --- ESQUEMA ---
+
+def _crear_tablas(shard_engine) -> None:
+    # Sin claves foráneas: `item` no existe en los shards
+    with shard_engine.begin() as conn:
+        existentes = set(inspect(conn).get_table_names())
+        for tabla in TABLAS_SHARD:
+            if tabla.name in existentes:
+                continue
+            conn.execute(CreateTable(tabla, include_foreign_key_constraints=[]))
+            for indice in tabla.indexes:
+                conn.execute(CreateIndex(indice))
+
+
+def inicializar_shards() -> None:
+    """Crea las tablas de movimientos y el índice de texto en cada shard (después de create_all)."""
+    if not SHARDING:
+        return
+    for shard_engine in dict.fromkeys(shard_engines):
+        if shard_engine is not engine:
+            _crear_tablas(shard_engine)
+            inicializar_indice(shard_engine)
@@ -0,0 +1,49 @@
+"""
+Configuración común de las pruebas: bases SQLite temporales (principal + un segundo
+shard) fijadas en el entorno ANTES de importar la aplicación.
+"""
+import os
+import tempfile
+import uuid
+from pathlib import Path
+
+import pytest
+
+_TMP = Path(tempfile.mkdtemp(prefix="finanzas-tests-"))
+_PRINCIPAL = f"sqlite:///{_TMP / 'principal.db'}"
+
+os.environ["DATABASE_URL"] = _PRINCIPAL
+os.environ["DATABASE_SHARD_URLS"] = f"{_PRINCIPAL},sqlite:///{_TMP / 'shard1.db'}"
+os.environ.pop("DATABASE_REPLICA_URLS", None)
+os.environ["SHARD_MAPA_TTL"] = "0"
+os.environ["REGLAS_TTL"] = "0"
+os.environ["ESTADOS_DIR"] = str(_TMP / "estados")
+os.environ["PERFILES_DIR"] = str(_TMP / "perfiles")
+
+from fastapi.testclient import TestClient  # noqa: E402
+from src.main import app, encode_token  # noqa: E402
+
+
+def cabeceras(usuario_id: int, rol: str = "user") -> dict:
+    token = encode_token({"username": f"u{usuario_id}", "sub": str(usuario_id), "rol": rol, "email": "x@x.com"})
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture(scope="session")
+def client():
+    return TestClient(app)
+
+
+@pytest.fixture
+def usuario(client):
+    """Crea un usuario nuevo y devuelve (id, cabeceras de autenticación)."""
+    nombre = uuid.uuid4().hex[:12]
+    r = client.post("/items/", json={"nombre": nombre, "correo": f"{nombre}@x.com", "contraseña": "p"})
+    assert r.status_code == 200, r.text
+    usuario_id = r.json()["id"]
+    return usuario_id, cabeceras(usuario_id)
+
+
+@pytest.fixture
+def admin():
+    return cabeceras(0, "admin")
@@ -0,0 +1,22 @@
+from fastapi.testclient import TestClient
+
+from src.main import app
+
+
+def _login(client, usuario: str):
+    return client.post("/token", data={"username": usuario, "password": "incorrecta"})
+
+
+def test_login_fallido_no_bloquea_al_usuario_desde_otra_ip(client):
+    nombre = "victima"
+    client.post("/items/", json={"nombre": nombre, "correo": "victima@x.com", "contraseña": "secreta"})
+    atacante = TestClient(app, client=("203.0.113.7", 50000))
+    legitimo = TestClient(app, client=("198.51.100.20", 50000))
+
+    codigos = [_login(atacante, nombre).status_code for _ in range(6)]
+    assert codigos[:5] == [400] * 5
+    assert codigos[5] == 429
+
+    # Mismo usuario desde otra IP: su bucket está intacto
+    r = legitimo.post("/token", data={"username": nombre, "password": "secreta"})
+    assert r.status_code == 200
@@ -0,0 +1,87 @@
+import uuid
+from datetime import date, timedelta
+
+from sqlmodel import func, select
+
+from src.config.db import shard_engines
+from src.jobs import detectar_anomalias
+from src.models.anomalia import AnomaliaGasto
+from src.models.cambio import CambioMovimiento
+from src.utils import cambios
+from src.utils.cambios import UPSERT
+from src.utils.shards import N_SHARDS, sesion, ubicacion
+from conftest import cabeceras
+
+
+def _ejecutar() -> int:
+    """Corre el job en todos los shards; devuelve cuántos usuarios recalculó."""
+    return sum(detectar_anomalias.ejecutar(shard_engines[s])["usuarios"] for s in range(N_SHARDS))
+
+
+def _gastos_con_un_pico(client, h) -> int:
+    """Diez gastos habituales y uno muy por encima; devuelve el id del pico."""
+    inicio = date(2024, 1, 1)
+    for i in range(10):
+        r = client.post("/gastos/", json={
+            "tipo_gasto": "comida", "cantidad_gasto": 10 + i % 3, "fecha_gasto": (inicio + timedelta(days=i)).isoformat()
+        }, headers=h)
+        assert r.status_code == 201, r.text
+    r = client.post("/gastos/", json={
+        "tipo_gasto": "comida", "cantidad_gasto": 1000, "fecha_gasto": (inicio + timedelta(days=10)).isoformat()
+    }, headers=h)
+    return r.json()["id"]
+
+
+def _anomalias(usuario_id):
+    with sesion(ubicacion(usuario_id)[0]) as db:
+        return db.exec(select(AnomaliaGasto).where(AnomaliaGasto.usuario_id == usuario_id)).all()
+
+
+def test_incremental_solo_recalcula_usuarios_con_cambios(client, usuario, monkeypatch):
+    monkeypatch.setattr(cambios, "SYNC_MARGEN_SEGUNDOS", 0)
+    usuario_id, h = usuario
+    pico = _gastos_con_un_pico(client, h)
+    _ejecutar()
+    [anomalia] = _anomalias(usuario_id)
+    assert anomalia.gasto_id == pico
+
+    # Otro usuario con cambios: solo se recalcula él
+    nombre = uuid.uuid4().hex[:12]
+    otro = client.post("/items/", json={"nombre": nombre, "correo": f"{nombre}@x.com", "contraseña": "p"}).json()["id"]
+    pico_otro = _gastos_con_un_pico(client, cabeceras(otro))
+    assert _ejecutar() == 1
+    assert [a.gasto_id for a in _anomalias(otro)] == [pico_otro]
+    [igual] = _anomalias(usuario_id)
+    assert igual.fecha_deteccion == anomalia.fecha_deteccion
+
+    assert _ejecutar() == 0
+
+
+def test_cambio_confirmado_tarde_no_se_salta(client, usuario, monkeypatch):
+    """Un cambio de id menor que confirma después de que el job leyó el log se procesa en la siguiente ejecución."""
+    monkeypatch.setattr(cambios, "SYNC_MARGEN_SEGUNDOS", 0)
+    usuario_id, h = usuario
+    _ejecutar()
+    pico = _gastos_con_un_pico(client, h)
+
+    shard = ubicacion(usuario_id)[0]
+    with sesion(shard) as db:
+        # Se borran las anotaciones de los gastos: como si su transacción aún no confirmara
+        ultimo = db.exec(select(func.max(CambioMovimiento.id))).one()
+        for cambio in db.exec(select(CambioMovimiento).where(CambioMovimiento.usuario_id == usuario_id)).all():
+            db.delete(cambio)
+        db.commit()
+
+        # Otra transacción con un id mayor confirma antes y el job corre con el margen activo
+        monkeypatch.setattr(cambios, "SYNC_MARGEN_SEGUNDOS", 60)
+        db.add(CambioMovimiento(id=ultimo + 2, usuario_id=usuario_id, tipo="gasto", movimiento_id=pico, operacion=UPSERT))
+        db.commit()
+        detectar_anomalias.ejecutar(shard_engines[shard])
+
+        # La de id menor confirma tarde
+        db.add(CambioMovimiento(id=ultimo + 1, usuario_id=usuario_id, tipo="gasto", movimiento_id=pico, operacion=UPSERT))
+        db.commit()
+
+    monkeypatch.setattr(cambios, "SYNC_MARGEN_SEGUNDOS", 0)
+    assert detectar_anomalias.ejecutar(shard_engines[shard])["usuarios"] == 1
+    assert [a.gasto_id for a in _anomalias(usuario_id)] == [pico]
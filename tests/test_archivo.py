@@ -0,0 +1,57 @@
+from array import array
+from datetime import date, timedelta
+
+from sqlmodel import func, select
+
+from src.config.db import shard_engines
+from src.jobs import archivar_movimientos
+from src.models.gasto import Gasto, GastoArchivo
+from src.models.resumen_archivo import ResumenArchivo
+from src.utils import serie_saldo
+from src.utils.shards import sesion, ubicacion
+
+
+def _analisis(client, h):
+    return [
+        client.get("/analisis/resumen-general", headers=h).json(),
+        client.get("/analisis/resumen-general", params={"moneda": "EUR"}, headers=h).json(),
+        client.get("/analisis/resumen-mensual", params={"anio": 2015, "mes": 1}, headers=h).json(),
+        client.get("/analisis/gastos-por-tipo", params={"anio": 2015, "mes": 2}, headers=h).json(),
+        client.get("/analisis/rango", params={"desde": "2015-01-10", "hasta": "2015-02-03"}, headers=h).json(),
+        client.get("/analisis/rango", params={"desde": "2015-01-10", "hasta": "2015-02-03", "moneda": "EUR"}, headers=h).json(),
+    ]
+
+
+def _serie(usuario_id):
+    with sesion(ubicacion(usuario_id)[0]) as db:
+        fila = serie_saldo.construir_serie(db, usuario_id)
+    return fila.fecha_inicio, array("d", fila.datos)
+
+
+def test_resumen_por_mes_con_los_mismos_totales(client, usuario):
+    usuario_id, h = usuario
+    inicio = date(2015, 1, 1)
+    for i in range(45):
+        r = client.post("/gastos/", json={
+            "tipo_gasto": "comida", "cantidad_gasto": i + 1, "moneda": "MXN" if i % 3 else "USD",
+            "fecha_gasto": (inicio + timedelta(days=i)).isoformat()
+        }, headers=h)
+        assert r.status_code == 201, r.text
+    client.post("/gastos/", json={"tipo_gasto": "comida", "cantidad_gasto": 1}, headers=h)
+    antes, serie_antes = _analisis(client, h), _serie(usuario_id)
+
+    archivar_movimientos.ejecutar(shard_engines[ubicacion(usuario_id)[0]])
+
+    with sesion(ubicacion(usuario_id)[0]) as db:
+        assert db.exec(select(func.count()).select_from(GastoArchivo).where(GastoArchivo.usuario_id == usuario_id)).one() == 45
+        assert db.exec(select(func.count()).select_from(Gasto).where(Gasto.usuario_id == usuario_id)).one() == 1
+        resumen = db.exec(select(ResumenArchivo).where(ResumenArchivo.usuario_id == usuario_id)).all()
+    # Una fila por (mes, moneda), no una por día
+    assert sorted((r.fecha, r.moneda, r.movimientos) for r in resumen) == [
+        (date(2015, 1, 1), "MXN", 20), (date(2015, 1, 1), "USD", 11),
+        (date(2015, 2, 1), "MXN", 10), (date(2015, 2, 1), "USD", 4),
+    ]
+    assert sum(r.total for r in resumen) == sum(range(1, 46))
+
+    assert _analisis(client, h) == antes
+    assert _serie(usuario_id) == serie_antes
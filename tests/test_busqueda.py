@@ -0,0 +1,99 @@
+import uuid
+
+from sqlalchemy import create_engine, text
+from sqlmodel import SQLModel
+
+from src.config.busqueda import FTS_TABLA, inicializar_indice
+from src.models.gasto import Gasto
+from src.models.inversion import Inversion
+from src.routes.busqueda_router import _consulta, _select_mysql, _sql
+from src.utils.shards import sesion, ubicacion
+from conftest import cabeceras
+
+
+def _nuevo_usuario(client) -> int:
+    nombre = uuid.uuid4().hex[:12]
+    return client.post("/items/", json={"nombre": nombre, "correo": f"{nombre}@x.com", "contraseña": "p"}).json()["id"]
+
+
+def _gasto(client, h, descripcion, fecha="2025-03-01"):
+    r = client.post("/gastos/", json={
+        "tipo_gasto": "comida", "cantidad_gasto": 10, "descripcion": descripcion, "fecha_gasto": fecha
+    }, headers=h)
+    assert r.status_code == 201, r.text
+    return r.json()["id"]
+
+
+def _buscar(client, h, **params):
+    r = client.get("/buscar/", params=params, headers=h)
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def test_busca_por_prefijo_solo_en_los_movimientos_del_usuario(client, usuario):
+    usuario_id, h = usuario
+    pastor = _gasto(client, h, "Tacos al pastor")
+    taqueria = _gasto(client, h, "Taquería de la esquina", fecha="2024-12-01")
+    _gasto(client, h, "Pizza")
+    inversion = client.post("/inversiones/", json={
+        "tipo_inversion": "fondo", "cantidad_inversion": 5, "descripcion": "Fondo tacos y más", "fecha_inversion": "2025-03-02"
+    }, headers=h).json()["id"]
+    _gasto(client, cabeceras(_nuevo_usuario(client)), "tacos de otro usuario")
+
+    resultados = _buscar(client, h, q="tac")["resultados"]
+    assert sorted((r["tipo"], r["id"]) for r in resultados) == sorted([("gasto", pastor), ("inversion", inversion)])
+    assert [r["id"] for r in _buscar(client, h, q="taqueria")["resultados"]] == [taqueria]
+    assert [r["id"] for r in _buscar(client, h, q="tac", tipo="gasto")["resultados"]] == [pastor]
+    assert _buscar(client, h, q="ta", hasta="2025-01-01")["resultados"][0]["id"] == taqueria
+
+    pagina = _buscar(client, h, q="tac", por_pagina=1)
+    assert pagina["hay_mas"] and len(pagina["resultados"]) == 1
+    assert client.get("/buscar/", params={"q": "¿?"}, headers=h).status_code == 400
+
+
+def test_sqlite_filtra_por_usuario_dentro_del_match(client, usuario):
+    usuario_id, h = usuario
+    propio = _gasto(client, h, "gasolina")
+    otro = _nuevo_usuario(client)
+    while ubicacion(otro)[0] != ubicacion(usuario_id)[0]:
+        otro = _nuevo_usuario(client)
+    ajeno = _gasto(client, cabeceras(otro), "gasolina")
+
+    _, consulta = _consulta("sqlite", ["gasol"], usuario_id)
+    with sesion(ubicacion(usuario_id)[0]) as db:
+        # Solo la tabla FTS, sin cruzar con gasto: el usuario ya lo filtra el MATCH
+        rowids = db.exec(text(f"SELECT rowid FROM {FTS_TABLA} WHERE {FTS_TABLA} MATCH :c"), params={"c": consulta}).scalars().all()
+    assert rowids == [propio * 2]
+    assert ajeno * 2 not in rowids
+
+
+def test_sqlite_reconstruye_un_indice_sin_usuario(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'viejo.db'}")
+    SQLModel.metadata.create_all(engine, tables=[Gasto.__table__, Inversion.__table__])
+    with engine.begin() as conn:
+        conn.execute(text(f"CREATE VIRTUAL TABLE {FTS_TABLA} USING fts5(descripcion)"))
+        conn.execute(text(
+            f"CREATE TRIGGER gasto_fts_ai AFTER INSERT ON gasto BEGIN "
+            f"INSERT INTO {FTS_TABLA}(rowid, descripcion) VALUES (new.id * 2, new.descripcion); END"
+        ))
+        conn.execute(text("INSERT INTO gasto (id, tipo_gasto, cantidad_gasto, fecha_gasto, descripcion, moneda, usuario_id) "
+                          "VALUES (1, 'c', 1, '2025-01-01', 'cine', 'MXN', 7)"))
+
+    inicializar_indice(engine)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO gasto (id, tipo_gasto, cantidad_gasto, fecha_gasto, descripcion, moneda, usuario_id) "
+                          "VALUES (2, 'c', 1, '2025-01-02', 'cine', 'MXN', 7)"))
+        _, consulta = _consulta("sqlite", ["cine"], 7)
+        rowids = conn.execute(text(f"SELECT rowid FROM {FTS_TABLA} WHERE {FTS_TABLA} MATCH :c ORDER BY rowid"), {"c": consulta}).scalars().all()
+    assert rowids == [2, 4]
+
+
+def test_mysql_ordena_cada_tabla_por_separado():
+    sql = _sql("mysql", _select_mysql, ["gasto", "inversion"], None, None)
+    partes = sql.split(" UNION ALL ")
+    assert len(partes) == 2
+    for tabla, parte in zip(("gasto", "inversion"), partes):
+        # El puesto se calcula dentro de cada tabla, con su propia puntuación
+        assert f"FROM {tabla} " in parte and "ROW_NUMBER() OVER (ORDER BY MATCH(descripcion)" in parte
+    assert sql.endswith("ORDER BY puesto, fecha DESC, id DESC LIMIT :limite OFFSET :offset")
+    assert _consulta("mysql", ["taco", "pastor"], 1)[1] == "+taco* +pastor*"
@@ -0,0 +1,122 @@
+import pytest
+
+from src.config.db import shard_engines
+from src.jobs import recategorizar_gastos
+from src.utils.categorias import MAX_REGLAS_REGEX, MAX_TEXTO_REGEX, Categorizador, validar_patron
+from src.models.regla_categoria import PALABRAS, REGEX, ReglaCategoria
+from src.utils.shards import ubicacion
+
+
+def _regla(client, h, **datos):
+    r = client.post("/reglas/", json=datos, headers=h)
+    assert r.status_code == 201, r.text
+    return r.json()["id"]
+
+
+def _tipo(client, h, **datos):
+    r = client.post("/gastos/", json={"cantidad_gasto": 10, **datos}, headers=h)
+    assert r.status_code == 201, r.text
+    return r.json()["tipo_gasto"]
+
+
+def test_palabras_y_regex_categorizan(client, usuario):
+    _, h = usuario
+    _regla(client, h, categoria="Transporte", patron="uber, Dídi")
+    _regla(client, h, categoria="servicios", tipo_patron="regex", patron=r"\bpago .*luz\b")
+
+    assert _tipo(client, h, tipo_gasto="varios", descripcion="Viaje en DIDI") == "transporte"
+    assert _tipo(client, h, tipo_gasto="banco", descripcion="Pago de la LUZ") == "servicios"
+    assert _tipo(client, h, tipo_gasto=" Comida  Rápida") == "comida rapida"
+
+
+def test_prioridad_y_rango_de_cantidad(client, usuario):
+    _, h = usuario
+    _regla(client, h, categoria="super", patron="walmart")
+    _regla(client, h, categoria="despensa grande", patron="walmart", cantidad_min=100, prioridad=5)
+
+    assert _tipo(client, h, tipo_gasto="x", descripcion="walmart", cantidad_gasto=50) == "super"
+    assert _tipo(client, h, tipo_gasto="x", descripcion="walmart", cantidad_gasto=150) == "despensa grande"
+
+
+def test_recategorizar_aplica_reglas_nuevas(client, usuario):
+    usuario_id, h = usuario
+    r = client.post("/gastos/", json={"tipo_gasto": "otros", "descripcion": "netflix", "cantidad_gasto": 9}, headers=h)
+    gasto_id = r.json()["id"]
+    _regla(client, h, categoria="suscripciones", patron="netflix")
+
+    resultado = recategorizar_gastos.ejecutar(shard_engines[ubicacion(usuario_id)[0]], usuario_id)
+    assert resultado["recategorizados"] == 1
+    assert client.get(f"/gastos/{gasto_id}", headers=h).json()["tipo_gasto"] == "suscripciones"
+
+
+@pytest.mark.parametrize("patron", [
+    r"(a+)+$",              # Cuantificadores anidados
+    r"(?:a?)*b",
+    r"(?:ab|a)*c",          # Alternativas dentro de una repetición
+    r"(a)\1",               # Referencia a un grupo
+    r"\w*\w*\w*c",          # Demasiadas repeticiones variables
+    r"(?:a.*){3}",
+    "x" * 201,
+])
+def test_rechaza_regex_con_backtracking_catastrofico(client, usuario, patron):
+    _, h = usuario
+    with pytest.raises(ValueError):
+        validar_patron(REGEX, patron)
+    r = client.post("/reglas/", json={"categoria": "c", "tipo_patron": "regex", "patron": patron}, headers=h)
+    assert r.status_code == 400
+
+
+@pytest.mark.parametrize("patron", [r"pago.*luz", r"^(uber|didi)\b", r"(?:a|b)+x", r"\d{2,4}", r"(?=.*gas)"])
+def test_acepta_regex_lineales(patron):
+    validar_patron(REGEX, patron)
+
+
+def test_limite_de_reglas_regex_por_usuario(client, usuario):
+    _, h = usuario
+    for i in range(MAX_REGLAS_REGEX):
+        _regla(client, h, categoria="c", tipo_patron="regex", patron=f"r{i}")
+    r = client.post("/reglas/", json={"categoria": "c", "tipo_patron": "regex", "patron": "otra"}, headers=h)
+    assert r.status_code == 400
+    # Las reglas de palabras no cuentan
+    _regla(client, h, categoria="c", patron="otra")
+
+
+def test_regex_solo_revisa_el_inicio_del_texto():
+    regla = ReglaCategoria(id=1, usuario_id=1, categoria="fin", tipo_patron=REGEX, patron="fin$")
+    categorizador = Categorizador([regla, ReglaCategoria(id=2, categoria="x", tipo_patron=PALABRAS, patron="nada")])
+    assert categorizador.regla("a fin", None) is regla
+    assert categorizador.regla("a" * MAX_TEXTO_REGEX + " fin", None) is None
+
+
+def _regla_local(i, categoria, patron, tipo_patron=REGEX, **datos):
+    return ReglaCategoria(id=i, usuario_id=1, categoria=categoria, tipo_patron=tipo_patron, patron=patron, **datos)
+
+
+@pytest.mark.parametrize("tipo_patron", [REGEX, PALABRAS])
+def test_reglas_solapadas_gana_la_de_mayor_prioridad(tipo_patron):
+    uber = _regla_local(1, "transporte", "uber", tipo_patron)
+    uber_eats = _regla_local(2, "comida", "uber eats", tipo_patron, prioridad=10)
+    assert Categorizador([uber, uber_eats]).regla("pago uber eats", None) is uber_eats
+    assert Categorizador([uber, uber_eats]).regla("pago uber", None) is uber
+
+
+def test_regex_que_abarca_el_texto_no_oculta_a_otras():
+    comida = _regla_local(1, "comida", "comida.*")
+    restaurante = _regla_local(2, "restaurante", "restaurante", prioridad=10)
+    assert Categorizador([comida, restaurante]).regla("comida restaurante centro", None) is restaurante
+
+
+def test_regla_fuera_de_rango_no_oculta_a_las_de_la_misma_posicion():
+    grande = _regla_local(1, "despensa", "super.*", cantidad_min=100, prioridad=10)
+    super_ = _regla_local(2, "super", "super")
+    categorizador = Categorizador([grande, super_])
+    assert categorizador.regla("super centro", 50) is super_
+    assert categorizador.regla("super centro", 150) is grande
+
+
+def test_solapadas_por_api(client, usuario):
+    _, h = usuario
+    _regla(client, h, categoria="transporte", tipo_patron="regex", patron="uber")
+    _regla(client, h, categoria="comida", tipo_patron="regex", patron="uber eats", prioridad=10)
+    assert _tipo(client, h, tipo_gasto="app", descripcion="Uber Eats pizza") == "comida"
+    assert _tipo(client, h, tipo_gasto="app", descripcion="Uber al centro") == "transporte"
@@ -0,0 +1,56 @@
+from itertools import cycle
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+
+from src.config.db import crear_engine, engine
+from src.main import app
+from src.routes import db_session
+
+
+@pytest.fixture
+def replica(monkeypatch):
+    replica = crear_engine("sqlite://")
+    monkeypatch.setattr(db_session, "replica_engines", [replica])
+    monkeypatch.setattr(db_session, "_replicas", cycle([replica]))
+    return replica
+
+
+def _principal_de_lectura(cabeceras: dict):
+    """Engine de la base principal que usaría una ruta de lectura con estas cabeceras."""
+    request = Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in cabeceras.items()],
+    })
+    dependencia = db_session.get_read_db(request)
+    session = next(dependencia)
+    try:
+        return session.info["principal"]
+    finally:
+        dependencia.close()
+
+
+def test_escritura_marca_al_cliente_y_no_al_worker(usuario, replica):
+    _, h = usuario
+    client = TestClient(app)  # Cliente propio: guarda la cookie de la escritura
+    r = client.post("/gastos/", json={"tipo_gasto": "comida", "cantidad_gasto": 10}, headers=h)
+    assert r.status_code == 201
+    hasta = r.headers[db_session.HEADER_PRIMARIO_HASTA]
+    assert client.cookies[db_session.COOKIE_PRIMARIO_HASTA] == hasta
+
+    # La marca viaja con el cliente (cookie o cabecera), no en memoria del proceso
+    assert _principal_de_lectura({"cookie": f"{db_session.COOKIE_PRIMARIO_HASTA}={hasta}"}) is engine
+    assert _principal_de_lectura({db_session.HEADER_PRIMARIO_HASTA: hasta}) is engine
+    assert _principal_de_lectura({}) is replica
+    # Una marca vencida vuelve a leer de la réplica
+    assert _principal_de_lectura({db_session.HEADER_PRIMARIO_HASTA: "1"}) is replica
+
+
+def test_lecturas_no_marcan(client, usuario, replica):
+    _, h = usuario
+    r = client.get("/gastos/", headers=h)
+    assert r.status_code == 200
+    assert db_session.HEADER_PRIMARIO_HASTA not in r.headers
@@ -0,0 +1,89 @@
+import uuid
+from contextlib import contextmanager
+
+from sqlalchemy import delete, event, select
+from sqlalchemy.engine import Engine
+
+from src.config.db import shard_engines
+from src.jobs import recategorizar_gastos
+from src.models.distribucion import DistribucionMensual, EstadoDistribucion, InventarioDistribucion
+from src.utils.shards import N_SHARDS, sesion, ubicacion
+
+
+def _marcador(usuario_id):
+    with sesion(ubicacion(usuario_id)[0]) as db:
+        return db.get(EstadoDistribucion, usuario_id)
+
+
+def _conteo_global(client, admin, categoria):
+    r = client.get("/analisis/global/estadisticas", params={"categoria": categoria}, headers=admin)
+    assert r.status_code == 200, r.text
+    general = r.json().get("general")
+    return general["conteo"] if general else 0
+
+
+@contextmanager
+def _sql():
+    """Sentencias SQL ejecutadas en cualquier base mientras dura el bloque."""
+    sentencias = []
+
+    def anotar(conn, cursor, statement, parameters, context, executemany):
+        sentencias.append(statement)
+
+    event.listen(Engine, "before_cursor_execute", anotar)
+    try:
+        yield sentencias
+    finally:
+        event.remove(Engine, "before_cursor_execute", anotar)
+
+
+def test_primer_movimiento_deja_marcador_pendiente(client, usuario, admin):
+    usuario_id, h = usuario
+    categoria = f"cat{uuid.uuid4().hex[:8]}"
+    client.post("/gastos/", json={"tipo_gasto": categoria, "cantidad_gasto": 10}, headers=h)
+    assert _marcador(usuario_id).pendiente
+
+    assert _conteo_global(client, admin, categoria) == 1
+    assert not _marcador(usuario_id).pendiente
+
+    # Con los bocetos construidos la consulta global no vuelve a recorrer los movimientos
+    client.post("/gastos/", json={"tipo_gasto": categoria, "cantidad_gasto": 20}, headers=h)
+    with _sql() as sentencias:
+        assert _conteo_global(client, admin, categoria) == 2
+    assert not any("UNION" in s.upper() for s in sentencias)
+
+
+def test_inventario_marca_movimientos_anteriores(client, usuario, admin):
+    usuario_id, h = usuario
+    categoria = f"cat{uuid.uuid4().hex[:8]}"
+    client.post("/gastos/", json={"tipo_gasto": categoria, "cantidad_gasto": 10}, headers=h)
+    # Como un usuario con movimientos de antes de los marcadores
+    for shard in range(N_SHARDS):
+        with shard_engines[shard].begin() as conexion:
+            conexion.execute(delete(InventarioDistribucion.__table__))
+            conexion.execute(delete(EstadoDistribucion.__table__).where(
+                EstadoDistribucion.__table__.c.usuario_id == usuario_id
+            ))
+
+    assert _conteo_global(client, admin, categoria) == 1
+    assert not _marcador(usuario_id).pendiente
+    with sesion(ubicacion(usuario_id)[0]) as db:
+        assert db.get(InventarioDistribucion, 1) is not None
+
+
+def test_recategorizar_deja_pendientes_los_bocetos(client, usuario, admin):
+    usuario_id, h = usuario
+    antes, despues = f"cat{uuid.uuid4().hex[:8]}", f"cat{uuid.uuid4().hex[:8]}"
+    client.post("/gastos/", json={"tipo_gasto": antes, "cantidad_gasto": 10}, headers=h)
+    assert _conteo_global(client, admin, antes) == 1
+
+    r = client.post("/reglas/", json={"categoria": despues, "patron": antes}, headers=h)
+    assert r.status_code == 201, r.text
+    recategorizar_gastos.ejecutar(shard_engines[ubicacion(usuario_id)[0]], usuario_id)
+    assert _marcador(usuario_id).pendiente
+    with sesion(ubicacion(usuario_id)[0]) as db:
+        t = DistribucionMensual.__table__
+        assert db.execute(select(t).where(t.c.usuario_id == usuario_id)).first() is None
+
+    assert _conteo_global(client, admin, antes) == 0
+    assert _conteo_global(client, admin, despues) == 1
@@ -0,0 +1,40 @@
+import csv
+import io
+
+import pytest
+
+from src.jobs import generar_estados
+
+
+def _movimientos(client, h):
+    for tipo, cantidad, moneda, dia in [("comida", 100, "MXN", 3), ("comida", 50, "MXN", 20), ("renta", 10, "EUR", 5)]:
+        r = client.post("/gastos/", json={
+            "tipo_gasto": tipo, "cantidad_gasto": cantidad, "moneda": moneda, "fecha_gasto": f"2019-07-{dia:02d}"
+        }, headers=h)
+        assert r.status_code == 201, r.text
+    client.post("/inversiones/", json={"tipo_inversion": "sueldo", "cantidad_inversion": 1000, "fecha_inversion": "2019-07-01"}, headers=h)
+    # Fuera del mes: no cuentan
+    client.post("/gastos/", json={"tipo_gasto": "comida", "cantidad_gasto": 7, "fecha_gasto": "2019-08-01"}, headers=h)
+
+
+@pytest.mark.parametrize("procesos", [1, 2])
+def test_estado_del_mes_con_sus_totales(client, usuario, procesos):
+    usuario_id, h = usuario
+    _movimientos(client, h)
+
+    resultado = generar_estados.ejecutar(2019, 7, procesos=procesos)
+    assert resultado["usuarios"] >= 1
+
+    r = client.get("/analisis/estados/2019/7", params={"formato": "csv"}, headers=h)
+    assert r.status_code == 200
+    filas = {(f["seccion"], f["concepto"]): f for f in csv.DictReader(io.StringIO(r.text))}
+    mensual = client.get("/analisis/resumen-mensual", params={"anio": 2019, "mes": 7}, headers=h).json()
+    por_tipo = {g["tipo_gasto"]: g["total"] for g in client.get(
+        "/analisis/gastos-por-tipo", params={"anio": 2019, "mes": 7}, headers=h
+    ).json()}
+
+    assert float(filas["resumen", "total_inversiones"]["total"]) == 1000
+    assert float(filas["resumen", "total_gastos"]["total"]) == pytest.approx(mensual["total_gastos"], abs=0.01)
+    assert float(filas["gasto", "comida"]["total"]) == 150
+    assert float(filas["gasto", "renta"]["total"]) == pytest.approx(por_tipo["renta"], abs=0.01)
+    assert "2019-07" in client.get("/analisis/estados", headers=h).json()
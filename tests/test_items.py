@@ -0,0 +1,64 @@
+import pytest
+from sqlmodel import Session, select
+
+from src.config.db import engine
+from src.models.gasto import Gasto
+from src.models.regla_categoria import ReglaCategoria
+from src.models.shard import BORRANDO, ShardUsuario
+from src.routes import item_router
+from src.utils.shards import leer_ubicacion, sesion, ubicacion
+
+
+def _datos(client, h):
+    r = client.post("/gastos/", json={"tipo_gasto": "comida", "cantidad_gasto": 10, "descripcion": "uber"}, headers=h)
+    assert r.status_code == 201, r.text
+    r = client.post("/reglas/", json={"categoria": "transporte", "patron": "uber"}, headers=h)
+    assert r.status_code == 201, r.text
+
+
+def _quedan(usuario_id, shard):
+    with Session(engine) as db:
+        reglas = db.exec(select(ReglaCategoria).where(ReglaCategoria.usuario_id == usuario_id)).all()
+        mapa = db.get(ShardUsuario, usuario_id)
+    with sesion(shard) as db:
+        gastos = db.exec(select(Gasto).where(Gasto.usuario_id == usuario_id)).all()
+    return len(reglas), mapa, len(gastos)
+
+
+def test_eliminar_usuario_borra_sus_datos_y_sus_reglas(client, usuario, admin):
+    usuario_id, h = usuario
+    _datos(client, h)
+    shard = ubicacion(usuario_id)[0]
+
+    assert client.delete(f"/items/{usuario_id}", headers=admin).status_code == 204
+    assert _quedan(usuario_id, shard) == (0, None, 0)
+    assert client.delete(f"/items/{usuario_id}", headers=admin).status_code == 404
+
+
+def test_eliminar_a_medias_se_puede_repetir(client, usuario, admin, monkeypatch):
+    usuario_id, h = usuario
+    _datos(client, h)
+    shard = ubicacion(usuario_id)[0]
+
+    def fallar():
+        raise RuntimeError("shard caído")
+
+    def sesion_que_falla(*args, **kwargs):
+        db = sesion(*args, **kwargs)
+        db.commit = fallar
+        return db
+
+    monkeypatch.setattr(item_router, "sesion", sesion_que_falla)
+    with pytest.raises(RuntimeError):
+        client.delete(f"/items/{usuario_id}", headers=admin)
+    monkeypatch.undo()
+
+    # La cuenta queda marcada: no admite escrituras, pero sus datos siguen ahí
+    with Session(engine) as db:
+        assert leer_ubicacion(db, usuario_id) == (shard, BORRANDO)
+    r = client.post("/gastos/", json={"tipo_gasto": "comida", "cantidad_gasto": 1}, headers=h)
+    assert r.status_code == 410
+    assert _quedan(usuario_id, shard)[2] == 1
+
+    assert client.delete(f"/items/{usuario_id}", headers=admin).status_code == 204
+    assert _quedan(usuario_id, shard) == (0, None, 0)
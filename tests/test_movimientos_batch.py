@@ -0,0 +1,85 @@
+from src.config.db import shard_engines
+from src.jobs import archivar_movimientos
+from src.utils.shards import ubicacion
+
+
+def _crear_gasto(client, h, **datos):
+    r = client.post("/gastos/", json={"tipo_gasto": "comida", "cantidad_gasto": 10, **datos}, headers=h)
+    assert r.status_code == 201, r.text
+    return r.json()["id"]
+
+
+def _batch(client, h, operaciones, modo="todo_o_nada"):
+    return client.post("/movimientos/batch", json={"operaciones": operaciones, "modo": modo}, headers=h)
+
+
+def test_todo_o_nada_revierte_si_una_falla(client, usuario):
+    _, h = usuario
+    gasto_id = _crear_gasto(client, h)
+    r = _batch(client, h, [
+        {"accion": "crear", "tipo": "gasto", "datos": {"tipo_gasto": "a", "cantidad_gasto": 5}},
+        {"accion": "actualizar", "tipo": "gasto", "id": gasto_id, "datos": {"cantidad_gasto": 7}},
+        {"accion": "crear", "tipo": "gasto", "datos": {"cantidad_gasto": "x"}},
+    ])
+    assert r.status_code == 409
+    resultados = r.json()["detail"]["resultados"]
+    assert [x["ok"] for x in resultados] == [False, False, False]
+    assert resultados[2]["codigo"] == 400
+
+    gastos = client.get("/gastos/", headers=h).json()
+    assert [(g["id"], g["cantidad_gasto"]) for g in gastos] == [(gasto_id, 10)]
+
+
+def test_mejor_esfuerzo_aplica_las_validas(client, usuario):
+    _, h = usuario
+    gasto_id = _crear_gasto(client, h)
+    r = _batch(client, h, [
+        {"accion": "crear", "tipo": "inversion", "datos": {"tipo_inversion": "s", "cantidad_inversion": 50}},
+        {"accion": "actualizar", "tipo": "gasto", "id": gasto_id, "datos": {"cantidad_gasto": 7}},
+        {"accion": "crear", "tipo": "gasto", "datos": {"cantidad_gasto": "x"}},
+    ], modo="mejor_esfuerzo")
+    assert r.status_code == 200
+    cuerpo = r.json()
+    assert (cuerpo["aplicadas"], cuerpo["fallidas"]) == (2, 1)
+    assert cuerpo["resultados"][0]["id"] is not None
+
+    assert client.get(f"/gastos/{gasto_id}", headers=h).json()["cantidad_gasto"] == 7
+    assert len(client.get("/inversiones/", headers=h).json()) == 1
+
+
+def test_eliminar_inexistente_falla_con_404(client, usuario):
+    _, h = usuario
+    gasto_id = _crear_gasto(client, h)
+    operaciones = [
+        {"accion": "eliminar", "tipo": "gasto", "id": gasto_id},
+        {"accion": "eliminar", "tipo": "gasto", "id": 10**9},
+    ]
+
+    r = _batch(client, h, operaciones, modo="mejor_esfuerzo")
+    resultados = r.json()["resultados"]
+    assert resultados[0]["ok"] is True
+    assert (resultados[1]["ok"], resultados[1]["codigo"]) == (False, 404)
+
+    gasto_id = _crear_gasto(client, h)
+    operaciones[0]["id"] = gasto_id
+    r = _batch(client, h, operaciones)
+    assert r.status_code == 409
+    assert r.json()["detail"]["resultados"][1]["codigo"] == 404
+    # La eliminación válida se revirtió con el resto del batch
+    assert client.get(f"/gastos/{gasto_id}", headers=h).status_code == 200
+
+
+def test_eliminar_archivado_falla_con_409(client, usuario):
+    usuario_id, h = usuario
+    antiguo = _crear_gasto(client, h, fecha_gasto="2015-01-05")
+    _crear_gasto(client, h)  # El de id mayor nunca se archiva en SQLite
+    archivar_movimientos.ejecutar(shard_engines[ubicacion(usuario_id)[0]])
+
+    r = client.delete(f"/gastos/{antiguo}", headers=h)
+    assert r.status_code == 409
+
+    r = _batch(client, h, [{"accion": "eliminar", "tipo": "gasto", "id": antiguo}])
+    assert r.status_code == 409
+    resultado = r.json()["detail"]["resultados"][0]
+    assert (resultado["ok"], resultado["codigo"]) == (False, 409)
+    assert resultado["error"] == "El gasto está archivado y es de solo lectura"
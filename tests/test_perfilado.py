@@ -0,0 +1,110 @@
+import asyncio
+import json
+import threading
+import time
+
+import httpx
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.utils.perfilado import MiddlewarePerfil, archivo_perfil
+from conftest import cabeceras
+
+
+def _perfilado(respuesta):
+    return "x-perfil-id" in respuesta.headers
+
+
+def test_solo_perfila_con_permiso(client, usuario, admin):
+    usuario_id, h = usuario
+    assert not _perfilado(client.get("/gastos/", headers=h))
+    assert not _perfilado(client.get("/gastos/", headers={**h, "X-Perfil": "1"}))
+    assert not _perfilado(client.get("/gastos/", headers={**h, "X-Perfil": "no-es-un-token"}))
+
+    r = client.get("/admin/perfiles/", headers={**admin, "X-Perfil": "1"})
+    assert _perfilado(r)
+    assert archivo_perfil(r.headers["x-perfil-id"], "sql") is not None
+
+    token = client.post("/admin/perfiles/token", params={"usuario_id": usuario_id}, headers=admin).json()["token"]
+    r = client.get("/gastos/", params={"perfil": token}, headers=h)
+    assert _perfilado(r)
+    assert archivo_perfil(r.headers["x-perfil-id"], "speedscope") is not None
+    # El token es solo para ese usuario
+    assert not _perfilado(client.get("/gastos/", headers={**cabeceras(usuario_id + 1), "X-Perfil": token}))
+
+
+# --- Peticiones simultáneas al mismo endpoint ---
+
+def _ocupado(segundos: float) -> None:
+    fin = time.perf_counter() + segundos
+    while time.perf_counter() < fin:
+        pass
+
+
+def _trabajo_a(segundos: float) -> None:
+    _ocupado(segundos)
+
+
+def _trabajo_b(segundos: float) -> None:
+    _ocupado(segundos)
+
+
+_app = FastAPI()
+_app.add_middleware(MiddlewarePerfil)
+
+
+@_app.get("/lento")
+def _lento(marca: str):
+    (_trabajo_a if marca == "a" else _trabajo_b)(0.3)
+    return {}
+
+
+@_app.get("/lento-async")
+async def _lento_async(marca: str):
+    trabajo = _trabajo_a if marca == "a" else _trabajo_b
+    # Tramos más largos que el intervalo de cambio del GIL (5 ms), alternando con la otra tarea
+    for _ in range(10):
+        trabajo(0.03)
+        await asyncio.sleep(0)
+    return {}
+
+
+def _funciones_muestreadas(perfil_id: str) -> set:
+    datos = json.loads(archivo_perfil(perfil_id, "speedscope").read_text(encoding="utf-8"))
+    nombres = [f["name"] for f in datos["shared"]["frames"]]
+    [perfil] = datos["profiles"]
+    assert perfil["samples"]
+    return {nombres[i] for muestra in perfil["samples"] for i in muestra}
+
+
+def test_endpoint_sincrono_no_muestrea_otra_peticion(admin):
+    respuestas = {}
+
+    def pedir(marca, cabeceras_peticion):
+        respuestas[marca] = TestClient(_app).get("/lento", params={"marca": marca}, headers=cabeceras_peticion)
+
+    hilos = [
+        threading.Thread(target=pedir, args=("a", {**admin, "X-Perfil": "1"})),
+        threading.Thread(target=pedir, args=("b", {})),
+    ]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    funciones = _funciones_muestreadas(respuestas["a"].headers["x-perfil-id"])
+    assert "_trabajo_a" in funciones and "_trabajo_b" not in funciones
+
+
+def test_endpoint_async_no_muestrea_otra_tarea(admin):
+    async def pedir():
+        transporte = httpx.ASGITransport(app=_app)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://test") as cliente:
+            return await asyncio.gather(
+                cliente.get("/lento-async", params={"marca": "a"}, headers={**admin, "X-Perfil": "1"}),
+                cliente.get("/lento-async", params={"marca": "b"}),
+            )
+
+    perfilada, _ = asyncio.run(pedir())
+    funciones = _funciones_muestreadas(perfilada.headers["x-perfil-id"])
+    assert "_trabajo_a" in funciones and "_trabajo_b" not in funciones
@@ -0,0 +1,29 @@
+import pytest
+
+from src.config.db import engines_consultas, opciones_pool, opciones_pool_consultas
+from src.utils.shards import en_paralelo, en_todos, sesion
+
+
+@pytest.mark.parametrize("conexiones_max, workers, paralelas", [(100, 4, 8), (16, 8, 8), (10, 1, 8), (40, 3, 2)])
+def test_pools_no_superan_el_presupuesto(conexiones_max, workers, paralelas):
+    peticiones = opciones_pool(conexiones_max, workers, paralelas)
+    consultas = opciones_pool_consultas(conexiones_max, workers, paralelas)
+    assert peticiones["max_overflow"] == consultas["max_overflow"] == 0
+    assert peticiones["pool_size"] >= 1 and 1 <= consultas["pool_size"] <= paralelas
+    assert (peticiones["pool_size"] + consultas["pool_size"]) * workers <= conexiones_max
+
+
+def test_consultas_paralelas_usan_su_propio_pool():
+    with sesion(0) as db:
+        binds = en_paralelo(db, *(lambda s: s.get_bind() for _ in range(3)))
+        assert binds[0] is db.get_bind()
+        assert all(b is engines_consultas[db.get_bind()] for b in binds[1:])
+    assert all(b in engines_consultas.values() for b in en_todos(lambda s: s.get_bind()))
+
+
+def test_dashboard(client, usuario):
+    _, h = usuario
+    client.post("/gastos/", json={"tipo_gasto": "comida", "cantidad_gasto": 10}, headers=h)
+    r = client.get("/analisis/dashboard", headers=h)
+    assert r.status_code == 200
+    assert r.json()["resumen_general"]["total_gastos"] == 10
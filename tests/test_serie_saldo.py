@@ -0,0 +1,93 @@
+from array import array
+from datetime import date
+
+import pytest
+
+from src.models.gasto import Gasto
+from src.models.serie_saldo import SerieSaldo
+from src.utils import serie_saldo
+from src.utils.shards import sesion, ubicacion
+
+
+def _gasto(client, h, fecha, cantidad, **datos):
+    r = client.post("/gastos/", json={"tipo_gasto": "comida", "cantidad_gasto": cantidad, "fecha_gasto": fecha, **datos}, headers=h)
+    assert r.status_code == 201, r.text
+    return r.json()["id"]
+
+
+def _guardada_y_completa(usuario_id):
+    """(serie guardada, serie construida desde cero) del usuario."""
+    with sesion(ubicacion(usuario_id)[0]) as db:
+        fila = db.get(SerieSaldo, usuario_id)
+        completa = serie_saldo.construir_serie(db, usuario_id)
+        guardada = array("d")
+        guardada.frombytes(fila.datos)
+        esperada = array("d")
+        esperada.frombytes(completa.datos)
+        return (fila.fecha_inicio, list(guardada)), (completa.fecha_inicio, list(esperada))
+
+
+def _rango(client, h, desde, hasta, **params):
+    r = client.get("/analisis/rango", params={"desde": desde, "hasta": hasta, **params}, headers=h)
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def test_actualizacion_incremental_igual_a_construir_de_nuevo(client, usuario):
+    usuario_id, h = usuario
+    _gasto(client, h, "2025-03-01", 10)
+    medio = _gasto(client, h, "2025-03-10", 20)
+    _gasto(client, h, "2025-03-20", 30)
+    assert _rango(client, h, "2025-03-01", "2025-03-31")["total_gastos"] == 60
+
+    _gasto(client, h, "2025-03-05", 1)                  # En medio: solo se reescribe la cola
+    _gasto(client, h, "2025-04-02", 2)                  # Después del final: se extiende
+    _gasto(client, h, "2025-02-27", 4)                  # Antes del inicio: se reescribe completa
+    client.put(f"/gastos/{medio}", json={"cantidad_gasto": 25, "fecha_gasto": "2025-03-15"}, headers=h)
+    guardada, esperada = _guardada_y_completa(usuario_id)
+    assert guardada == esperada
+
+    client.delete(f"/gastos/{medio}", headers=h)
+    guardada, esperada = _guardada_y_completa(usuario_id)
+    assert guardada == esperada
+    assert _rango(client, h, "2025-03-01", "2025-03-31")["total_gastos"] == 41
+
+
+def test_escritura_durante_la_construccion_no_se_pierde(client, usuario, monkeypatch):
+    usuario_id, h = usuario
+    _gasto(client, h, "2025-03-01", 10)
+    construir = serie_saldo.construir_serie
+    intentos = []
+
+    def construir_con_escritura_concurrente(db, uid):
+        fila = construir(db, uid)
+        if not intentos:
+            # Otra petición guarda un gasto después de sumar y antes de guardar la serie
+            with sesion(ubicacion(uid)[0]) as otra:
+                otra.add(Gasto(tipo_gasto="comida", cantidad_gasto=5, fecha_gasto=date(2025, 3, 2), usuario_id=uid))
+                otra.commit()
+        intentos.append(fila)
+        return fila
+
+    monkeypatch.setattr(serie_saldo, "construir_serie", construir_con_escritura_concurrente)
+    assert _rango(client, h, "2025-03-01", "2025-03-31")["total_gastos"] == 15
+    assert len(intentos) == 2
+    monkeypatch.undo()
+
+    guardada, esperada = _guardada_y_completa(usuario_id)
+    assert guardada == esperada
+
+
+def test_rango_en_otra_moneda(client, usuario):
+    _, h = usuario
+    _gasto(client, h, "2025-03-01", 100)
+    _gasto(client, h, "2025-03-15", 50, moneda="USD")
+    client.post("/inversiones/", json={"tipo_inversion": "sueldo", "cantidad_inversion": 1000, "fecha_inversion": "2025-03-31"}, headers=h)
+
+    en_usd = _rango(client, h, "2025-03-01", "2025-03-31", moneda="usd")
+    assert en_usd["moneda"] == "USD"
+    general = client.get("/analisis/resumen-general", params={"moneda": "USD"}, headers=h).json()
+    assert en_usd["total_gastos"] == pytest.approx(general["total_gastos"])
+    assert en_usd["total_inversiones"] == pytest.approx(general["total_inversiones"])
+    assert _rango(client, h, "2025-03-16", "2025-03-31", moneda="USD")["total_gastos"] == 0
+    assert client.get("/analisis/rango", params={"desde": "2025-03-01", "hasta": "2025-03-31", "moneda": "xx"}, headers=h).status_code == 400
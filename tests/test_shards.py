@@ -0,0 +1,117 @@
+from datetime import date
+
+import pytest
+from sqlmodel import select
+
+from conftest import cabeceras
+from src.config.db import shard_engines
+from src.jobs import archivar_movimientos, rebalancear_shards
+from src.models.gasto import Gasto, GastoArchivo
+from src.models.inversion import Inversion, InversionArchivo
+from src.utils.shards import N_SHARDS, sesion, ubicacion
+
+pytestmark = pytest.mark.skipif(N_SHARDS < 2, reason="Requiere al menos dos shards")
+
+
+def _usuario_en(client, shard: int):
+    """Crea usuarios hasta obtener uno asignado a `shard`; devuelve (id, cabeceras)."""
+    while True:
+        r = client.post("/items/", json={"nombre": "s", "correo": "s@x.com", "contraseña": "p"})
+        usuario_id = r.json()["id"]
+        if ubicacion(usuario_id)[0] == shard:
+            return usuario_id, cabeceras(usuario_id)
+
+
+def _gasto(client, h, fecha, cantidad, descripcion="taco"):
+    r = client.post("/gastos/", json={"tipo_gasto": "comida", "cantidad_gasto": cantidad,
+                                      "fecha_gasto": fecha, "descripcion": descripcion}, headers=h)
+    assert r.status_code == 201, r.text
+    return r.json()["id"]
+
+
+def _ids(shard: int, modelo) -> set:
+    with sesion(shard) as db:
+        return set(db.exec(select(modelo.id)).all())
+
+
+def _estado(client, h):
+    return (
+        sorted((g["cantidad_gasto"], g["fecha_gasto"]) for g in client.get("/gastos/?incluir_archivo=true", headers=h).json()),
+        client.get("/analisis/resumen-general", headers=h).json(),
+        client.get("/analisis/rango", params={"desde": "2015-01-01", "hasta": "2030-12-31"}, headers=h).json(),
+        len(client.get("/buscar/", params={"q": "taco"}, headers=h).json()["resultados"]),
+    )
+
+
+def test_mover_usuario_conserva_sus_datos(client):
+    usuario_id, h = _usuario_en(client, 0)
+    for dia in range(1, 4):
+        _gasto(client, h, f"2025-03-0{dia}", 10 * dia)
+    client.post("/inversiones/", json={"tipo_inversion": "sueldo", "cantidad_inversion": 100, "fecha_inversion": "2025-03-01"}, headers=h)
+    antes = _estado(client, h)
+    token = client.get("/sync/", params={"since": 0}, headers=h).json()["token"]
+
+    resultado = rebalancear_shards.mover_usuario(usuario_id, 1, espera=0)
+
+    assert resultado["movido"] and ubicacion(usuario_id) == (1, "activo")
+    assert _estado(client, h) == antes
+    with sesion(0) as db:
+        assert db.exec(select(Gasto).where(Gasto.usuario_id == usuario_id)).first() is None
+    # El token de /sync era del shard anterior: descarga completa
+    assert client.get("/sync/", params={"since": token}, headers=h).json()["reset"] is True
+    assert client.post("/gastos/", json={"tipo_gasto": "x", "cantidad_gasto": 1}, headers=h).status_code == 201
+
+
+def test_usuario_migrando_no_puede_escribir(client):
+    usuario_id, h = _usuario_en(client, 0)
+    rebalancear_shards._fijar_ubicacion(usuario_id, 0, "migrando")
+    try:
+        r = client.post("/gastos/", json={"tipo_gasto": "x", "cantidad_gasto": 1}, headers=h)
+        assert r.status_code == 503 and "retry-after" in r.headers
+        assert client.get("/gastos/", headers=h).status_code == 200
+    finally:
+        rebalancear_shards._fijar_ubicacion(usuario_id, 0, "activo")
+
+
+def test_mover_y_despues_archivar(client):
+    """Los id de recientes y archivados del destino no se repiten tras mover a un usuario."""
+    # Un usuario del destino con gastos archivados
+    dueno_id, dueno = _usuario_en(client, 1)
+    for dia in range(1, 4):
+        _gasto(client, dueno, f"2015-01-0{dia}", dia)
+    _gasto(client, dueno, "2025-01-01", 100)
+    archivar_movimientos.ejecutar(shard_engines[1])
+    with sesion(1) as db:
+        archivados = db.exec(select(GastoArchivo.id).where(GastoArchivo.usuario_id == dueno_id)).all()
+    assert archivados
+
+    # Un usuario del origen cuyos gastos usan esos mismos id (y un gasto antiguo propio)
+    movido_id, movido = _usuario_en(client, 0)
+    with sesion(0) as db:
+        libres = [i for i in archivados if i not in _ids(0, Gasto) | _ids(0, GastoArchivo)]
+        for i in libres:
+            db.add(Gasto(id=i, tipo_gasto="comida", cantidad_gasto=7, fecha_gasto=date(2025, 2, 1), usuario_id=movido_id))
+        db.commit()
+    assert libres
+    _gasto(client, movido, "2014-06-01", 3)
+    _gasto(client, movido, "2025-02-02", 8)
+    client.post("/inversiones/", json={"tipo_inversion": "s", "cantidad_inversion": 5, "fecha_inversion": "2014-01-01"}, headers=movido)
+    antes = _estado(client, movido)
+
+    resultado = rebalancear_shards.mover_usuario(movido_id, 1, espera=0)
+    assert resultado["gasto"]["remapeados"] >= len(libres)
+    assert not _ids(1, Gasto) & _ids(1, GastoArchivo)
+    assert not _ids(1, Inversion) & _ids(1, InversionArchivo)
+    assert _estado(client, movido) == antes
+
+    # Cada dueño sigue viendo sus archivados por id
+    for i in archivados:
+        r = client.get(f"/gastos/{i}", headers=dueno)
+        assert r.status_code == 200 and r.json()["usuario_id"] == dueno_id
+
+    # Archivar el destino ya no choca con los id copiados, y los nuevos id tampoco
+    archivar_movimientos.ejecutar(shard_engines[1])
+    nuevo = _gasto(client, movido, "2025-03-01", 1)
+    assert nuevo not in _ids(1, GastoArchivo)
+    assert not _ids(1, Gasto) & _ids(1, GastoArchivo)
+    assert _estado(client, movido)[1]["total_gastos"] == antes[1]["total_gastos"] + 1
@@ -0,0 +1,77 @@
+from sqlmodel import func, select
+
+from src.models.cambio import CambioMovimiento
+from src.utils import cambios
+from src.utils.cambios import UPSERT
+from src.utils.shards import sesion, ubicacion
+
+
+def _sync(client, h, since):
+    r = client.get("/sync/", params={"since": since}, headers=h)
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def _gasto(client, h, cantidad):
+    r = client.post("/gastos/", json={"tipo_gasto": "comida", "cantidad_gasto": cantidad}, headers=h)
+    assert r.status_code == 201, r.text
+    return r.json()["id"]
+
+
+def test_incremental_y_eliminados(client, usuario, monkeypatch):
+    monkeypatch.setattr(cambios, "SYNC_MARGEN_SEGUNDOS", 0)
+    _, h = usuario
+    primero = _gasto(client, h, 10)
+    inicial = _sync(client, h, 0)
+    assert inicial["reset"] and [g["id"] for g in inicial["gastos"]] == [primero]
+
+    segundo = _gasto(client, h, 20)
+    client.put(f"/gastos/{primero}", json={"cantidad_gasto": 15}, headers=h)
+    client.delete(f"/gastos/{segundo}", headers=h)
+    delta = _sync(client, h, inicial["token"])
+    assert not delta["reset"]
+    assert [(g["id"], g["cantidad_gasto"]) for g in delta["gastos"]] == [(primero, 15)]
+    assert delta["eliminados"] == [{"tipo": "gasto", "id": segundo}]
+    assert _sync(client, h, delta["token"])["gastos"] == []
+
+
+def test_cambio_confirmado_tarde_no_se_pierde(client, usuario, monkeypatch):
+    """Dos transacciones intercaladas: la de id menor confirma después de servir la de id mayor."""
+    monkeypatch.setattr(cambios, "SYNC_MARGEN_SEGUNDOS", 0)
+    usuario_id, h = usuario
+    gasto_a = _gasto(client, h, 10)
+    gasto_b = _gasto(client, h, 20)
+    token = _sync(client, h, 0)["token"]
+
+    monkeypatch.setattr(cambios, "SYNC_MARGEN_SEGUNDOS", 60)
+    with sesion(ubicacion(usuario_id)[0]) as db:
+        ultimo = db.exec(select(func.max(CambioMovimiento.id))).one()
+
+        def anotar(id_cambio, gasto_id):
+            db.add(CambioMovimiento(id=id_cambio, usuario_id=usuario_id, tipo="gasto", movimiento_id=gasto_id, operacion=UPSERT))
+            db.commit()
+
+        # B obtiene el id ultimo + 2 y confirma primero
+        anotar(ultimo + 2, gasto_b)
+        primera = _sync(client, h, token)
+        assert [g["id"] for g in primera["gastos"]] == [gasto_b]
+        # A obtuvo ultimo + 1 antes, pero confirma después de la sincronización anterior
+        anotar(ultimo + 1, gasto_a)
+
+    segunda = _sync(client, h, primera["token"])
+    assert {g["id"] for g in segunda["gastos"]} == {gasto_a, gasto_b}
+
+    # Pasado el margen el token avanza y ya no se repiten
+    monkeypatch.setattr(cambios, "SYNC_MARGEN_SEGUNDOS", 0)
+    tercera = _sync(client, h, segunda["token"])
+    assert tercera["token"] > segunda["token"]
+    assert _sync(client, h, tercera["token"])["gastos"] == []
+
+
+def test_descarga_completa_no_adelanta_el_token_sobre_cambios_recientes(client, usuario, monkeypatch):
+    usuario_id, h = usuario
+    _gasto(client, h, 10)
+    reciente = _sync(client, h, 0)
+    monkeypatch.setattr(cambios, "SYNC_MARGEN_SEGUNDOS", 0)
+    confirmado = _sync(client, h, 0)
+    assert reciente["token"] < confirmado["token"]
@@ -0,0 +1,85 @@
+import os
+from datetime import date
+
+import pytest
+from sqlalchemy import insert
+
+from src.config import tipo_cambio
+from src.config.tipo_cambio import SnapshotTasas, obtener_snapshot
+from src.models.gasto import Gasto
+from src.utils.agregados import grupos
+from src.utils.shards import sesion, ubicacion
+
+_TASAS = {
+    "MXN": ([date(2025, 1, 1), date(2025, 2, 1)], [0.05, 0.04]),
+    "EUR": ([date(2025, 1, 1)], [1.1]),
+}
+
+
+def test_convierte_cada_grupo_con_la_tasa_de_su_fecha():
+    snapshot = SnapshotTasas(_TASAS)
+    assert snapshot.por_mes
+    totales = snapshot.convertir_por_clave([
+        ("a", "MXN", date(2025, 1, 1), 100.0),
+        ("a", "MXN", date(2025, 2, 1), 100.0),
+        ("a", "USD", date(2025, 2, 1), 1.0),
+        ("b", "EUR", date(2024, 6, 1), 10.0),      # Anterior al archivo: primera tasa
+    ], "USD")
+    assert totales == {"a": pytest.approx(5 + 4 + 1), "b": pytest.approx(11)}
+    assert snapshot.convertir_grupos([("EUR", date(2025, 3, 1), 1.0)], "MXN") == pytest.approx(1.1 / 0.04)
+    assert not SnapshotTasas({"MXN": ([date(2025, 1, 15)], [0.05])}).por_mes
+
+
+def test_moneda_sin_tasa_se_omite_con_un_aviso(capsys):
+    snapshot = SnapshotTasas(_TASAS)
+    filas = [(None, "XYZ", date(2025, 1, 1), 50.0), (None, "USD", date(2025, 1, 1), 2.0), (None, "XYZ", date(2025, 2, 1), 5.0)]
+    assert snapshot.convertir_por_clave(filas, "USD") == {None: 2.0}
+    assert capsys.readouterr().out.count("XYZ") == 1
+
+
+def test_snapshot_se_recarga_si_cambia_el_archivo(tmp_path, monkeypatch):
+    archivo = tmp_path / "tasas.csv"
+    archivo.write_text("fecha,moneda,tasa\n2025-01-01,MXN,0.05\n", encoding="utf-8")
+    monkeypatch.setattr(tipo_cambio, "TIPOS_CAMBIO_PATH", archivo)
+    monkeypatch.setattr(tipo_cambio, "_snapshot", None)
+
+    primero = obtener_snapshot()
+    assert obtener_snapshot() is primero
+    assert primero.tasa("MXN", date(2025, 5, 1)) == 0.05
+
+    archivo.write_text("fecha,moneda,tasa\n2025-01-01,MXN,0.05\n2025-05-01,MXN,0.06\n", encoding="utf-8")
+    mtime = archivo.stat().st_mtime + 10
+    os.utime(archivo, (mtime, mtime))
+    segundo = obtener_snapshot()
+    assert segundo is not primero
+    assert segundo.tasa("MXN", date(2025, 5, 1)) == 0.06
+
+
+def test_grupos_por_mes_y_moneda_desconocida_en_el_analisis(client, usuario):
+    usuario_id, h = usuario
+    for dia in range(1, 29):
+        client.post("/gastos/", json={
+            "tipo_gasto": "comida", "cantidad_gasto": 1, "moneda": "EUR", "fecha_gasto": f"2025-03-{dia:02d}"
+        }, headers=h)
+    client.post("/gastos/", json={"tipo_gasto": "comida", "cantidad_gasto": 1, "moneda": "EUR", "fecha_gasto": "2025-04-02"}, headers=h)
+
+    with sesion(ubicacion(usuario_id)[0]) as db:
+        filas = grupos(db, Gasto, usuario_id)
+        assert sorted((m, f, t) for _, m, f, t in filas) == [("EUR", date(2025, 3, 1), 28), ("EUR", date(2025, 4, 1), 1)]
+        assert len(grupos(db, Gasto, usuario_id, por_dia=True)) == 29
+
+    snapshot = obtener_snapshot()
+    esperado = 28 * snapshot.factor("EUR", "MXN", date(2025, 3, 1)) + snapshot.factor("EUR", "MXN", date(2025, 4, 1))
+    r = client.get("/analisis/resumen-general", params={"moneda": "MXN"}, headers=h)
+    assert r.json()["total_gastos"] == pytest.approx(esperado, abs=0.01)
+
+    # Un gasto guardado en una moneda que ya no está en el archivo de tasas
+    with sesion(ubicacion(usuario_id)[0]) as db:
+        db.execute(insert(Gasto.__table__).values(
+            tipo_gasto="comida", cantidad_gasto=1000, fecha_gasto=date(2025, 3, 5), moneda="XYZ", usuario_id=usuario_id
+        ))
+        db.commit()
+    for ruta in ("/analisis/resumen-general", "/analisis/tendencia-mensual", "/analisis/gastos-por-tipo", "/analisis/dashboard"):
+        r = client.get(ruta, params={"moneda": "MXN"}, headers=h)
+        assert r.status_code == 200, (ruta, r.text)
+    assert client.get("/analisis/resumen-general", params={"moneda": "MXN"}, headers=h).json()["total_gastos"] == pytest.approx(esperado, abs=0.01)